@@ -2,15 +2,19 @@
 Bhoomika AI Assistant - API Routes
 """
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import os
-import tempfile
+import uuid
 
 import sys
 sys.path.append('..')
-from pipeline import get_ingestion_pipeline, get_retrieval_pipeline
+from config import INGEST_UPLOAD_CHUNK_SIZE
+from pipeline import get_ingestion_pipeline, get_retrieval_pipeline, get_ingestion_worker
+from storage.job_store import get_job_store
+from storage import get_knowledge_graph, get_persistence_manager
 from models import get_gemini_client
 
 
@@ -33,12 +37,18 @@ class IngestTextRequest(BaseModel):
     description: Optional[str] = None
 
 
+class IngestBatchRequest(BaseModel):
+    documents: List[IngestTextRequest]
+
+
 class StatsResponse(BaseModel):
     documents: int
     chunks: int
     vectors: int
     graph_nodes: int
     graph_edges: int
+    graph_cache: Optional[dict] = None
+    persistence: Optional[dict] = None
 
 
 @router.post("/chat")
@@ -50,9 +60,13 @@ async def chat(request: ChatRequest):
         retrieval = get_retrieval_pipeline()
         gemini = get_gemini_client()
         
-        # Retrieve relevant context
-        results = retrieval.retrieve(request.message)
-        context = retrieval.build_context(results)
+        # Retrieve relevant context off the event loop, never while ingestion mutates the stores
+        def run():
+            with get_persistence_manager().lock.read(), retrieval.sqlite_store.session_scope():
+                results = retrieval.retrieve(request.message)
+                return results, retrieval.build_context(results)
+        
+        results, context = await run_in_threadpool(run)
         
         if request.stream:
             # Streaming response
@@ -75,44 +89,55 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/ingest/file")
+@router.post("/ingest/file", status_code=202)
 async def ingest_file(
     file: UploadFile = File(...),
     title: Optional[str] = None,
     description: Optional[str] = None
 ):
     """
-    Ingest a document file (PDF, TXT, MD)
+    Queue a document file (PDF, TXT, MD) for ingestion.
+    Returns a job ID immediately; poll /ingest/jobs/{job_id} for progress.
     """
     try:
-        # Save uploaded file temporarily
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
+        worker = get_ingestion_worker()
+        job_id = uuid.uuid4().hex
+        filename = os.path.basename(file.filename)
+        path = worker.upload_path(job_id, filename)
         
-        try:
-            ingestion = get_ingestion_pipeline()
-            doc_id = ingestion.ingest_file(
-                tmp_path,
-                title=title or file.filename,
-                description=description
-            )
-            
-            return {
-                "success": True,
-                "document_id": doc_id,
-                "filename": file.filename,
-                "stats": ingestion.get_stats()
-            }
-        finally:
-            os.unlink(tmp_path)
+        # Stream the upload to disk instead of holding it in memory
+        with open(path, 'wb') as out:
+            while True:
+                block = await file.read(INGEST_UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                out.write(block)
+        
+        job = worker.submit(job_id, filename, path, title=title or filename, description=description)
+        
+        return {
+            "success": True,
+            "job_id": job.id,
+            "status": job.status,
+            "filename": filename,
+            "status_url": f"/api/ingest/jobs/{job.id}"
+        }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """
+    Status and per-stage progress of an ingestion job
+    """
+    job = get_job_store().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
 @router.post("/ingest/text")
 async def ingest_text(request: IngestTextRequest):
     """
@@ -120,17 +145,84 @@ async def ingest_text(request: IngestTextRequest):
     """
     try:
         ingestion = get_ingestion_pipeline()
-        doc_id = ingestion.ingest_text(
-            request.content,
-            title=request.title,
-            description=request.description
-        )
+        
+        # Share the job worker's single-writer lock, off the event loop. The version and
+        # stats are read before the lock is released, so a queued job can't replace them
+        def run():
+            with get_ingestion_worker().writer_lock, ingestion.sqlite_store.session_scope():
+                doc_id = ingestion.ingest_text(
+                    request.content,
+                    title=request.title,
+                    description=request.description
+                )
+                return doc_id, ingestion.last_version.to_dict(), ingestion.get_stats()
+        
+        doc_id, version, stats = await run_in_threadpool(run)
         
         return {
             "success": True,
             "document_id": doc_id,
             "title": request.title,
-            "stats": ingestion.get_stats()
+            "version": version,
+            "stats": stats
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ingest/batch")
+async def ingest_batch(request: IngestBatchRequest):
+    """
+    Ingest many text documents with shared embedding requests and one persist.
+    Failures are reported per document; the rest of the batch is still ingested.
+    """
+    try:
+        ingestion = get_ingestion_pipeline()
+        docs = [doc.model_dump() if hasattr(doc, "model_dump") else doc.dict() for doc in request.documents]
+        for doc in docs:
+            doc["text"] = doc.pop("content")
+        
+        def run():
+            with get_ingestion_worker().writer_lock, ingestion.sqlite_store.session_scope():
+                return ingestion.ingest_many(docs), ingestion.get_stats()
+        
+        results, stats = await run_in_threadpool(run)
+        failed = sum(1 for result in results if result["error"])
+        
+        return {
+            "success": failed == 0,
+            "ingested": len(results) - failed,
+            "failed": failed,
+            "results": results,
+            "stats": stats
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    """
+    Delete a document with its chunks, vectors and graph nodes
+    """
+    ingestion = get_ingestion_pipeline()
+    if ingestion.sqlite_store.get_document(doc_id) is None:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
+    
+    try:
+        def run():
+            with get_ingestion_worker().writer_lock, ingestion.sqlite_store.session_scope():
+                return ingestion.delete_document(doc_id), ingestion.get_stats()
+        
+        removed, stats = await run_in_threadpool(run)
+        
+        return {
+            "success": True,
+            "document_id": doc_id,
+            "chunks_removed": removed,
+            "stats": stats
         }
     
     except Exception as e:
@@ -150,6 +242,24 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/graph/stats")
+async def get_graph_stats(top_n: int = 10):
+    """
+    Knowledge graph structure (degree distribution, hubs, edges by relationship,
+    connected components) and per-query traversal sizes and latencies
+    """
+    try:
+        # The first call scans the graph; later calls read maintained counters.
+        # Either way, never while ingestion mutates the graph
+        def run():
+            with get_persistence_manager().lock.read():
+                return get_knowledge_graph().get_graph_stats(top_n)
+        
+        return await run_in_threadpool(run)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/health")
 async def health():
     """Health check endpoint"""
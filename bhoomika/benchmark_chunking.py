@@ -0,0 +1,132 @@
+"""
+Benchmark: Multi-granularity chunking throughput
+
+Compares the previous string-based EnhancedChunker (split, strip,
+re-join, then str.index to recover offsets) with the span-based chunker
+on synthetic multi-MB statutes, reports throughput in MB/s and checks
+that every chunk's offsets are exact (text[start:end] == chunk_text).
+
+Usage:
+    python benchmark_chunking.py
+    python benchmark_chunking.py --sizes-mb 1 4 16
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.chunk_types import ChunkType
+from pipeline.chunking import EnhancedChunker
+
+
+WORDS = ("land record mutation holder survey tehsildar revenue village "
+         "registration owner deed shall under section provided that").split()
+
+
+def make_statute(size_mb: float, seed: int = 11) -> str:
+    """Sections with short headings, clauses and continuation paragraphs"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts = []
+    length = 0
+    section = 1
+    while length < target:
+        paragraphs = [f"Section {section}. Definitions and procedure."]
+        for _ in range(rng.randint(2, 6)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 60)))
+            prefix = rng.choice(["", "", "however, ", "(a) ", "Therefore "])
+            paragraphs.append(prefix + sentence.capitalize() + ".")
+        block = "\n\n".join(paragraphs) + "\n\n"
+        parts.append(block)
+        length += len(block)
+        section += 1
+    return "".join(parts)
+
+
+class StringChunker:
+    """The previous EnhancedChunker: paragraphs as stripped strings"""
+
+    def chunk(self, text):
+        text = text.strip()
+        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+        if len(paragraphs) <= 1:
+            paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
+        merged = self._semantic_merge(paragraphs)
+        return {
+            ChunkType.SMALL: self._create_chunk_tuples(paragraphs, text),
+            ChunkType.MEDIUM: self._create_chunk_tuples(merged, text),
+            ChunkType.LARGE: [(text, 0, len(text))]
+        }
+
+    def _semantic_merge(self, paragraphs):
+        merged = []
+        i = 0
+        while i < len(paragraphs):
+            if i + 1 < len(paragraphs) and self._should_merge(paragraphs[i], paragraphs[i + 1]):
+                merged.append(paragraphs[i] + "  " + paragraphs[i + 1])
+                i += 2
+                continue
+            merged.append(paragraphs[i])
+            i += 1
+        return merged
+
+    def _should_merge(self, p1, p2):
+        if len(p1) < 100 or (p2 and p2[0].islower()):
+            return True
+        first_word = p2.split()[0].lower().rstrip('.,;:') if p2.split() else ""
+        return first_word in {'however', 'therefore', 'moreover', 'furthermore', 'additionally',
+                              'consequently', 'thus', 'hence', 'similarly', 'likewise',
+                              'meanwhile', 'nevertheless'}
+
+    def _create_chunk_tuples(self, chunks, full_text):
+        result = []
+        current_pos = 0
+        for chunk in chunks:
+            try:
+                start = full_text.index(chunk[:50], current_pos)
+            except ValueError:
+                start = current_pos
+            end = start + len(chunk)
+            result.append((chunk, start, end))
+            current_pos = end
+        return result
+
+
+def exact_offsets(text, chunks_by_type) -> bool:
+    return all(text[start:end] == chunk
+               for chunks in chunks_by_type.values()
+               for chunk, start, end in chunks)
+
+
+def timed(fn, text):
+    start = time.perf_counter()
+    result = fn(text)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark multi-granularity chunking")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 8], help="Statute sizes in MB")
+    args = parser.parse_args()
+
+    old = StringChunker()
+    new = EnhancedChunker()
+
+    print("=" * 78)
+    print(f"{'MB':>6} {'chunks':>8} {'old MB/s':>10} {'exact':>7} {'span MB/s':>10} {'exact':>7} {'speedup':>9}")
+    print("=" * 78)
+
+    for size_mb in args.sizes_mb:
+        text = make_statute(size_mb)
+        megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+
+        old_chunks, old_time = timed(old.chunk, text)
+        new_chunks, new_time = timed(new.generate_multi_granularity_chunks, text)
+
+        num_chunks = sum(len(chunks) for chunks in new_chunks.values())
+        print(f"{megabytes:>6.1f} {num_chunks:>8} {megabytes / old_time:>10.1f} "
+              f"{str(exact_offsets(text.strip(), old_chunks)):>7} {megabytes / new_time:>10.1f} "
+              f"{str(exact_offsets(text, new_chunks)):>7} {old_time / new_time:>8.1f}x")
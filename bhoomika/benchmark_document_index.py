@@ -0,0 +1,104 @@
+"""
+Benchmark: Document-level graph operations
+
+Compares document lookups that scan every node's document attribute
+(the previous get_document_chunks, on the networkx and CSR backends)
+with the maintained DocumentIndex, for listing a document's chunks,
+expanding retrieved chunks to their documents' LARGE context,
+re-ingesting a document and deleting one.
+
+Usage:
+    python benchmark_document_index.py
+    python benchmark_document_index.py --documents 2000 --chunks 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.graph_backends import open_graph
+from storage.knowledge_graph import DocumentIndex
+
+
+def document_chunk_ids(document: int, chunks: int):
+    ids = [f"doc{document}_chunk_{i}_{'S' if i % 3 else 'M'}" for i in range(chunks - 1)]
+    return ids + [f"doc{document}_chunk_{chunks}_L"]
+
+
+def build(backend: str, documents: int, chunks: int, tmp: str):
+    graph = open_graph(backend, os.path.join(tmp, f"{backend}.gpickle"))
+    index = DocumentIndex()
+    for document in range(documents):
+        chunk_ids = document_chunk_ids(document, chunks)
+        graph.add_edges((chunk_ids[i], chunk_ids[i + 1], 0.8, "sequential") for i in range(len(chunk_ids) - 1))
+        graph.set_document(chunk_ids, f"doc{document}")
+        index.set_document(f"doc{document}", chunk_ids)
+    return graph, index
+
+
+def per_call_us(fn, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        fn(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+def scan_large_context(graph, chunk_ids):
+    documents = dict.fromkeys(graph.node_document(chunk_id) for chunk_id in chunk_ids)
+    return [chunk for document in documents for chunk in graph.document_nodes(document) if chunk.endswith('_L')]
+
+
+def index_large_context(index, chunk_ids):
+    documents = dict.fromkeys(index.document_of(chunk_id) for chunk_id in chunk_ids)
+    return [chunk for document in documents for chunk in index.chunks_of(document) if chunk.endswith('_L')]
+
+
+def run(backend: str, documents: int, chunks: int, tmp: str):
+    graph, index = build(backend, documents, chunks, tmp)
+    rng = random.Random(7)
+    lookups = [f"doc{rng.randrange(documents)}" for _ in range(50)]
+    hits = [[f"doc{rng.randrange(documents)}_chunk_{rng.randrange(chunks - 1)}_{'S' if i % 3 else 'M'}"
+             for i in range(1, 11)] for _ in range(50)]
+    hits = [[chunk_id for chunk_id in query if graph.has_node(chunk_id)] for query in hits]
+    reingest = [(document, document_chunk_ids(int(document[3:]), chunks)) for document in lookups[:20]]
+    deletions = list(dict.fromkeys(lookups))[:20]
+    
+    rows = [
+        ("list chunks", per_call_us(graph.document_nodes, lookups), per_call_us(index.chunks_of, lookups)),
+        ("LARGE context", per_call_us(lambda query: scan_large_context(graph, query), hits),
+         per_call_us(lambda query: index_large_context(index, query), hits)),
+        ("re-ingest", per_call_us(lambda item: graph.set_document(item[1], item[0]), reingest),
+         per_call_us(lambda item: index.set_document(*item), reingest)),
+    ]
+    
+    # Deletion: find the chunks, then remove their nodes (node removal is the same for both)
+    start = time.perf_counter()
+    found = [graph.document_nodes(document) for document in deletions]
+    scan_time = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = [index.remove_document(document) for document in deletions]
+    index_time = time.perf_counter() - start
+    assert [sorted(chunk_ids) for chunk_ids in found] == [sorted(chunk_ids) for chunk_ids in indexed]
+    rows.append(("delete (find)", scan_time / len(deletions) * 1e6, index_time / len(deletions) * 1e6))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark document-level graph operations")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--chunks", type=int, default=100, help="Chunks per document")
+    args = parser.parse_args()
+    
+    print(f"{args.documents} documents x {args.chunks} chunks = {args.documents * args.chunks} nodes")
+    print("=" * 64)
+    print(f"{'backend':>9} {'operation':>14} {'scan us':>12} {'index us':>10} {'speedup':>10}")
+    print("=" * 64)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("networkx", "csr"):
+            for operation, scan_us, index_us in run(backend, args.documents, args.chunks, tmp):
+                print(f"{backend:>9} {operation:>14} {scan_us:>12.1f} {index_us:>10.1f} {scan_us / index_us:>9.0f}x")
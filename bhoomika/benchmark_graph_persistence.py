@@ -0,0 +1,93 @@
+"""
+Benchmark: Knowledge graph persistence per ingest
+
+Starts from a graph of existing documents, then ingests documents one
+at a time (sequential, keyword and semantic edges per document) and
+saves after each, as the persistence manager does. Reports the time and
+bytes written per save, and the load time afterwards, for:
+
+    networkx   whole-graph pickle on every save
+    snapshot   CSR arrays rewritten on every save (compaction forced)
+    log        CSR edge log: each save appends its mutations
+
+Usage:
+    python benchmark_graph_persistence.py
+    python benchmark_graph_persistence.py --documents 2000 --ingests 50
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import storage.csr_graph as csr_graph
+from storage.graph_backends import open_graph
+
+
+def document_edges(document: int, chunks: int, total_chunks: int, rng: random.Random):
+    chunk_ids = [f"doc{document}_chunk_{i}" for i in range(chunks)]
+    edges = [(chunk_ids[i], chunk_ids[i + 1], 0.8, "sequential") for i in range(chunks - 1)]
+    for _ in range(chunks * 2):
+        edges.append((rng.choice(chunk_ids), rng.choice(chunk_ids), 0.9, f"shared_concept:Keyword{rng.randrange(300)}"))
+    for _ in range(chunks):
+        other = rng.randrange(total_chunks)
+        edges.append((rng.choice(chunk_ids), f"doc{other // chunks}_chunk_{other % chunks}",
+                      round(rng.uniform(0.75, 1.0), 3), "semantic"))
+    return [edge for edge in edges if edge[0] != edge[1]]
+
+
+def run(mode: str, documents: int, ingests: int, chunks: int, tmp: str) -> dict:
+    rng = random.Random(13)
+    backend = "networkx" if mode == "networkx" else "csr"
+    path = os.path.join(tmp, mode, "knowledge_graph.gpickle")
+    os.makedirs(os.path.dirname(path))
+    
+    graph = open_graph(backend, path)
+    for document in range(documents):
+        graph.add_edges(document_edges(document, chunks, documents * chunks, rng))
+    graph.save()
+    
+    original = csr_graph.GRAPH_LOG_MIN_COMPACT_BYTES, csr_graph.GRAPH_LOG_COMPACT_RATIO
+    if mode == "snapshot":
+        csr_graph.GRAPH_LOG_MIN_COMPACT_BYTES, csr_graph.GRAPH_LOG_COMPACT_RATIO = 0, 0.0
+    try:
+        seconds, written = [], []
+        for document in range(documents, documents + ingests):
+            graph.add_edges(document_edges(document, chunks, documents * chunks, rng))
+            graph.save()
+            seconds.append(graph.last_save["seconds"])
+            written.append(graph.last_save["bytes"])
+    finally:
+        csr_graph.GRAPH_LOG_MIN_COMPACT_BYTES, csr_graph.GRAPH_LOG_COMPACT_RATIO = original
+    
+    edges = graph.number_of_edges()
+    start = time.perf_counter()
+    open_graph(backend, path)
+    load = time.perf_counter() - start
+    return {
+        "edges": edges,
+        "ms": 1000 * sum(seconds) / len(seconds),
+        "kb": sum(written) / len(written) / 1024,
+        "load": load
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark knowledge graph persistence per ingest")
+    parser.add_argument("--documents", type=int, default=1000, help="Documents already in the graph")
+    parser.add_argument("--ingests", type=int, default=30, help="Documents ingested (one save each)")
+    parser.add_argument("--chunks", type=int, default=60, help="Chunks per document")
+    args = parser.parse_args()
+    
+    print(f"{args.documents} documents x {args.chunks} chunks, then {args.ingests} ingests")
+    print("=" * 60)
+    print(f"{'mode':>9} {'edges':>9} {'ms/save':>9} {'KB/save':>10} {'load s':>8}")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("networkx", "snapshot", "log"):
+            result = run(mode, args.documents, args.ingests, args.chunks, tmp)
+            print(f"{mode:>9} {result['edges']:>9} {result['ms']:>9.1f} {result['kb']:>10.1f} {result['load']:>8.2f}")
@@ -0,0 +1,100 @@
+"""
+Benchmark: Knowledge graph storage backends
+
+Builds a synthetic chunk graph (sequential, semantic and keyword edges)
+in each backend and reports save time, bytes on disk, load time, Python
+heap held after loading and neighbor lookup latency. The CSR arrays are
+memory-mapped, so their pages are in the OS page cache, not the heap;
+sqlite reads rows on demand through its (src, dst) primary key.
+
+Usage:
+    python benchmark_graph_storage.py
+    python benchmark_graph_storage.py --nodes 200000 --degree 10
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.graph_backends import open_graph
+
+
+def make_edges(num_nodes: int, degree: int, seed: int = 3):
+    rng = random.Random(seed)
+    chunk_ids = [f"{i // 200:06d}_chunk_{i:08d}_M" for i in range(num_nodes)]
+    edges = [(chunk_ids[i], chunk_ids[i + 1], 0.8, "sequential") for i in range(num_nodes - 1)]
+    for _ in range(num_nodes * (degree - 2) // 2):
+        u, v = rng.randrange(num_nodes), rng.randrange(num_nodes)
+        if u != v:
+            relationship = "semantic" if rng.random() < 0.5 else f"shared_concept:Keyword{rng.randrange(500)}"
+            edges.append((chunk_ids[u], chunk_ids[v], round(rng.uniform(0.75, 1.0), 3), relationship))
+    return chunk_ids, edges
+
+
+def disk_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run(backend: str, chunk_ids, edges, tmp: str) -> dict:
+    graph_path = os.path.join(tmp, f"{backend}.gpickle")
+    graph = open_graph(backend, graph_path)
+    graph.add_edges(edges)
+    for start in range(0, len(chunk_ids), 200):
+        graph.set_document(chunk_ids[start:start + 200], f"doc_{start // 200}")
+    
+    start = time.perf_counter()
+    graph.save()
+    save_time = time.perf_counter() - start
+    del graph
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    graph = open_graph(backend, graph_path)
+    load_time = time.perf_counter() - start
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    rng = random.Random(5)
+    sample = [rng.choice(chunk_ids) for _ in range(2000)]
+    start = time.perf_counter()
+    for chunk_id in sample:
+        graph.neighbors(chunk_id)
+    lookup_time = (time.perf_counter() - start) / len(sample)
+    
+    location = {"networkx": graph_path, "csr": os.path.splitext(graph_path)[0] + "_csr",
+                "sqlite": os.path.splitext(graph_path)[0] + ".db"}[backend]
+    return {
+        "edges": graph.number_of_edges(),
+        "save": save_time,
+        "disk_mb": disk_bytes(location) / 1e6,
+        "load": load_time,
+        "heap_mb": heap / 1e6,
+        "lookup_us": lookup_time * 1e6
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark knowledge graph storage backends")
+    parser.add_argument("--nodes", type=int, default=50000)
+    parser.add_argument("--degree", type=int, default=8, help="Average edges per node")
+    parser.add_argument("--backends", nargs="+", default=["networkx", "csr", "sqlite"])
+    args = parser.parse_args()
+    
+    chunk_ids, edges = make_edges(args.nodes, args.degree)
+    print(f"{args.nodes} nodes, {len(edges)} edge insertions")
+    print("=" * 78)
+    print(f"{'backend':>10} {'edges':>10} {'save s':>8} {'disk MB':>9} {'load s':>8} {'heap MB':>9} {'lookup us':>10}")
+    print("=" * 78)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            result = run(backend, chunk_ids, edges, tmp)
+            print(f"{backend:>10} {result['edges']:>10} {result['save']:>8.2f} {result['disk_mb']:>9.1f} "
+                  f"{result['load']:>8.2f} {result['heap_mb']:>9.1f} {result['lookup_us']:>10.1f}")
@@ -0,0 +1,114 @@
+"""
+Benchmark: FTS5 lexical search latency
+
+Fills a fresh database with synthetic chunks (Zipf-distributed words, so
+there are very common, middling and rare terms, as in real text) through
+SQLiteStore.add_chunks_bulk, which indexes them, then times
+search_chunks for queries of each kind, with every query word ranked
+("all") and with words in more than LEXICAL_MAX_TERM_MATCHES chunks
+left out ("capped", the default).
+
+Usage:
+    python benchmark_lexical_search.py                    # 1M chunks
+    python benchmark_lexical_search.py --chunks 100000 --rebuild
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import LEXICAL_CANDIDATES, LEXICAL_MAX_TERM_MATCHES
+from storage.sqlite_store import SQLiteStore
+
+VOCABULARY = 50000
+WORDS_PER_CHUNK = 60
+CHUNKS_PER_DOCUMENT = 200
+
+
+def word(rank: int) -> str:
+    return f"w{rank}"
+
+
+def fill(store: SQLiteStore, chunks: int, rng: np.random.Generator) -> float:
+    """Ingest chunks as documents of CHUNKS_PER_DOCUMENT; returns seconds"""
+    start = time.perf_counter()
+    for document in range(-(-chunks // CHUNKS_PER_DOCUMENT)):
+        doc_id = f"doc{document}"
+        count = min(CHUNKS_PER_DOCUMENT, chunks - document * CHUNKS_PER_DOCUMENT)
+        ranks = np.minimum(rng.zipf(1.1, size=(count, WORDS_PER_CHUNK)), VOCABULARY)
+        with store.transaction():
+            store.add_document(doc_id=doc_id, filename=f"{doc_id}.txt")
+            store.add_chunks_bulk([{
+                "id": f"{doc_id}_chunk_{i}_S", "document_id": doc_id,
+                "content": " ".join(word(rank) for rank in row),
+                "chunk_index": i, "chunk_type": "S", "start_char": 0, "end_char": 0, "chunk_metadata": None
+            } for i, row in enumerate(ranks.tolist())])
+        if document % 500 == 499:
+            print(f"  {(document + 1) * CHUNKS_PER_DOCUMENT:>9} chunks, {time.perf_counter() - start:.0f}s", flush=True)
+    return time.perf_counter() - start
+
+
+def time_queries(store: SQLiteStore, queries: list, repeat: int, max_term_matches: int) -> dict:
+    latencies, matches = [], []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            results = store.search_chunks(query, LEXICAL_CANDIDATES, max_term_matches)
+            latencies.append((time.perf_counter() - start) * 1000)
+            matches.append(len(results))
+    latencies.sort()
+    return {
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "results": sum(matches) / len(matches)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FTS5 lexical search latency")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of each query set")
+    parser.add_argument("--rebuild", action="store_true", help="Also time rebuild_search_index")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        store = SQLiteStore(db_path)
+        print(f"Ingesting {args.chunks} chunks of {WORDS_PER_CHUNK} words...")
+        seconds = fill(store, args.chunks, rng)
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        print(f"✓ {args.chunks / seconds:.0f} chunks/s (indexed during ingest), database {size / 1e6:.0f} MB")
+
+        # Term frequency falls with Zipf rank: w1 is in nearly every chunk, w40000 in a few
+        query_sets = {
+            "rare (1 term)": [word(r) for r in range(30000, 30010)],
+            "middling (1 term)": [word(r) for r in range(300, 310)],
+            "common (1 term)": [word(r) for r in range(2, 12)],
+            "mixed (3 terms)": [f"{word(a)} {word(b)} {word(c)}"
+                                for a, b, c in zip(range(5, 15), range(500, 510), range(20000, 20010))],
+        }
+
+        print("=" * 72)
+        print(f"search_chunks, limit {LEXICAL_CANDIDATES}, {args.chunks} chunks")
+        print("=" * 72)
+        print(f"{'query':>20} {'terms':>10} {'p50 ms':>9} {'p95 ms':>9} {'results':>8}")
+        for name, queries in query_sets.items():
+            for mode, max_term_matches in (("all", args.chunks), ("capped", LEXICAL_MAX_TERM_MATCHES)):
+                time_queries(store, queries, 1, max_term_matches)  # Warm the page cache
+                result = time_queries(store, queries, args.repeat, max_term_matches)
+                print(f"{name:>20} {mode:>10} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['results']:>8.1f}")
+
+        if args.rebuild:
+            start = time.perf_counter()
+            indexed = store.rebuild_search_index()
+            print(f"\nrebuild_search_index: {indexed} chunks in {time.perf_counter() - start:.1f}s")
+
+        store.release()
+        store.engine.dispose()
@@ -0,0 +1,84 @@
+"""
+Benchmark: Neighborhood cache under skewed retrieval traffic
+
+Replays queries whose vector hits follow a skewed distribution (most
+hits land on a few hundred hot chunks) against a synthetic chunk graph,
+with a small ingest (new chunks linked into the graph) every --ingest-every
+queries. Reports graph scoring latency and cache hit rate with the cache
+disabled, starting cold, and warmed by precompute_neighborhoods from the
+retrieval counts of an earlier run.
+
+Usage:
+    python benchmark_neighborhood_cache.py
+    python benchmark_neighborhood_cache.py --nodes 200000 --hot 500 --queries 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.knowledge_graph import KnowledgeGraph
+from benchmark_graph_storage import make_edges
+from benchmark_graph_scoring import percentile
+
+
+def make_queries(chunk_ids, hot: int, count: int, hits: int, seed: int):
+    rng = random.Random(seed)
+    hot_chunks = chunk_ids[:hot]
+    return [{(rng.choice(hot_chunks) if rng.random() < 0.8 else rng.choice(chunk_ids)): rng.uniform(0.4, 0.9)
+             for _ in range(hits)} for _ in range(count)]
+
+
+def replay(graph: KnowledgeGraph, queries, chunk_ids, ingest_every: int, rng: random.Random):
+    latencies = []
+    for number, seeds in enumerate(queries):
+        if ingest_every and number % ingest_every == ingest_every - 1:
+            new_chunks = [f"ingest{number}_chunk_{i}" for i in range(20)]
+            graph.add_sequential_edges(new_chunks, f"ingest{number}")
+            graph.add_semantic_edges((chunk_id, rng.choice(chunk_ids), 0.8) for chunk_id in new_chunks)
+        start = time.perf_counter()
+        graph.personalized_pagerank(seeds)
+        graph.expand_cached(list(seeds), depth=2)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the graph neighborhood cache")
+    parser.add_argument("--nodes", type=int, default=50000)
+    parser.add_argument("--degree", type=int, default=8)
+    parser.add_argument("--hot", type=int, default=300, help="Chunks receiving 80%% of the vector hits")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--hits", type=int, default=10)
+    parser.add_argument("--ingest-every", type=int, default=50, help="Queries between small ingests (0 = none)")
+    args = parser.parse_args()
+    
+    chunk_ids, edges = make_edges(args.nodes, args.degree)
+    random.Random(1).shuffle(chunk_ids)
+    
+    print(f"{args.nodes} nodes, {args.queries} queries, {args.hot} hot chunks, ingest every {args.ingest_every}")
+    print("=" * 66)
+    print(f"{'cache':>10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'hit rate':>9} {'invalidated':>12}")
+    print("=" * 66)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("disabled", "cold", "warmed"):
+            graph = KnowledgeGraph(os.path.join(tmp, mode, "knowledge_graph.gpickle"))
+            graph.graph.add_edges(edges)
+            if mode == "disabled":
+                graph.neighborhood_cache.max_entries = 0
+            if mode == "warmed":
+                # Retrieval counts from an earlier day of traffic, then the offline precompute
+                for seeds in make_queries(chunk_ids, args.hot, args.queries, args.hits, seed=2):
+                    graph.neighborhood_cache.record_retrievals(seeds)
+                graph.precompute_neighborhoods(top_n=args.hot)
+            
+            queries = make_queries(chunk_ids, args.hot, args.queries, args.hits, seed=3)
+            latencies = replay(graph, queries, chunk_ids, args.ingest_every, random.Random(4))
+            stats = graph.neighborhood_cache.get_stats()
+            print(f"{mode:>10} {percentile(latencies, 0.5):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+                  f"{sum(latencies) / len(latencies):>8.2f} {stats['hit_rate']:>9.3f} {stats['invalidations']:>12}")
@@ -0,0 +1,85 @@
+"""
+Benchmark: Recall and latency of the PCA reduced-dimension search tier
+
+Compares the two-pass search (reduced scan + full-dimension re-scoring)
+against exact full-dimension search for several reduced dimensions.
+
+Usage:
+    python benchmark_projection.py                 # synthetic corpus
+    python benchmark_projection.py --stored        # vectors from data/faiss_index
+    python benchmark_projection.py --vectors 200000 --queries 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import EMBEDDING_DIMENSION, TOP_K_RESULTS
+from storage.simple_store import SimpleVectorStore
+
+
+def synthetic_corpus(num_vectors: int, num_queries: int, latent_dim: int = 96, seed: int = 0):
+    """Embeddings with low intrinsic dimension plus noise, like real text embeddings"""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((latent_dim, EMBEDDING_DIMENSION)).astype(np.float32)
+    latent = rng.standard_normal((num_vectors + num_queries, latent_dim)).astype(np.float32)
+    noise = 0.1 * rng.standard_normal((num_vectors + num_queries, EMBEDDING_DIMENSION)).astype(np.float32)
+    data = np.dot(latent, basis) + noise
+    return data[:num_vectors], data[num_vectors:]
+
+
+def run_benchmark(vectors: np.ndarray, queries: np.ndarray, dims, top_k: int = TOP_K_RESULTS):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        store.add_batch([f"chunk_{i}" for i in range(len(vectors))], vectors)
+
+        # Exact baseline
+        start = time.perf_counter()
+        exact = [{cid for cid, _ in store.search(q, top_k)} for q in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        print(f"\n{'dim':>6} {'recall@' + str(top_k):>10} {'ms/query':>10} {'speedup':>8} {'memory MB':>10}")
+        print(f"{vectors.shape[1]:>6} {1.0:>10.3f} {exact_ms:>10.2f} {1.0:>8.2f} {store.vectors.nbytes / 1e6:>10.1f}")
+
+        for dim in dims:
+            if store.fit_projection(dim) is None:
+                print(f"{dim:>6} {'skipped (too few vectors)':>30}")
+                continue
+
+            start = time.perf_counter()
+            approx = [{cid for cid, _ in store.search(q, top_k)} for q in queries]
+            approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+            print(f"{dim:>6} {recall:>10.3f} {approx_ms:>10.2f} {exact_ms / approx_ms:>8.2f} "
+                  f"{store.reduced_vectors.nbytes / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the reduced-dimension vector tier")
+    parser.add_argument("--stored", action="store_true", help="Use the persisted vector store")
+    parser.add_argument("--vectors", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512])
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Reduced-Dimension Tier: Recall vs Exact Search")
+    print("=" * 60)
+
+    if args.stored:
+        stored = SimpleVectorStore()
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(stored.vectors), min(args.queries, len(stored.vectors)), replace=False)
+        # Perturbed stored vectors stand in for queries
+        queries = stored.vectors[picks] + 0.05 * rng.standard_normal((len(picks), stored.vectors.shape[1]))
+        vectors = stored.vectors
+    else:
+        vectors, queries = synthetic_corpus(args.vectors, args.queries)
+
+    print(f"Corpus: {len(vectors)} vectors, {len(queries)} queries")
+    run_benchmark(vectors, queries.astype(np.float32), args.dims)
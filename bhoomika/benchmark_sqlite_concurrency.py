@@ -0,0 +1,142 @@
+"""
+Benchmark: SQLite reads during a concurrent ingest
+
+Reader threads fetch chunk contents (as chat retrieval does) while a
+writer thread keeps ingesting documents. Compares:
+
+  shared  - the previous setup: one Session for the whole process, on a
+            default (rollback journal) connection; every thread has to take
+            a lock around it to stay correct
+  pooled  - SQLiteStore now: one pooled engine with WAL, synchronous=NORMAL,
+            mmap and cache pragmas, and a session per thread
+
+Usage:
+    python benchmark_sqlite_concurrency.py
+    python benchmark_sqlite_concurrency.py --readers 8 --seconds 10
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from contextlib import nullcontext
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from storage.sqlite_store import SQLiteStore, Base
+
+PARAGRAPH = "The registrar shall record the transfer of immoveable property. " * 6
+
+
+def make_rows(doc_id: str, num_chunks: int) -> list:
+    return [{
+        "id": f"{doc_id}_chunk_{i}_S",
+        "document_id": doc_id,
+        "content": PARAGRAPH,
+        "chunk_index": i,
+        "chunk_type": "S",
+        "start_char": i * len(PARAGRAPH),
+        "end_char": (i + 1) * len(PARAGRAPH),
+        "chunk_metadata": None
+    } for i in range(num_chunks)]
+
+
+def make_store(mode: str, db_path: str) -> SQLiteStore:
+    if mode == "pooled":
+        return SQLiteStore(db_path)
+
+    # The store as it was: a single session on an engine without pragmas
+    store = SQLiteStore.__new__(SQLiteStore)
+    store.engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(store.engine)
+    store.session = sessionmaker(bind=store.engine)()
+    store._local = threading.local()
+    store.release = lambda: None
+    return store
+
+
+def ingest(store: SQLiteStore, doc_id: str, chunks: int):
+    with store.transaction():
+        store.add_document(doc_id=doc_id, filename=f"{doc_id}.txt")
+        store.add_chunks_bulk(make_rows(doc_id, chunks))
+
+
+def run(mode: str, tmp: str, documents: int, chunks: int, readers: int, seconds: float) -> dict:
+    store = make_store(mode, os.path.join(tmp, f"{mode}.db"))
+    guard = threading.Lock() if mode == "shared" else nullcontext()
+    for document in range(documents):
+        ingest(store, f"seed{document}", chunks)
+    chunk_ids = [f"seed{document}_chunk_{i}_S" for document in range(documents) for i in range(chunks)]
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    written = [0]
+    errors = []
+
+    def read(index: int):
+        rng = random.Random(index)
+        try:
+            while not stop.is_set():
+                sample = rng.sample(chunk_ids, 10)
+                start = time.perf_counter()
+                with guard:
+                    contents = store.get_multiple_chunk_contents(sample)
+                latencies[index].append(time.perf_counter() - start)
+                assert len(contents) == len(sample)
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            store.release()
+
+    def write():
+        try:
+            while not stop.is_set():
+                with guard:
+                    ingest(store, f"new{written[0]}", chunks)
+                written[0] += 1
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            store.release()
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    store.engine.dispose()
+    reads = sorted(latency for thread_latencies in latencies for latency in thread_latencies)
+    return {
+        "reads_per_sec": len(reads) / seconds,
+        "p50_ms": reads[len(reads) // 2] * 1000 if reads else 0.0,
+        "p95_ms": reads[int(len(reads) * 0.95)] * 1000 if reads else 0.0,
+        "docs_per_sec": written[0] / seconds,
+        "errors": len(errors)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SQLite reads during a concurrent ingest")
+    parser.add_argument("--documents", type=int, default=200, help="Documents stored before the run")
+    parser.add_argument("--chunks", type=int, default=50, help="Chunks per document")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"{args.readers} readers x 10 chunks per read, 1 writer x {args.chunks}-chunk documents, {args.seconds:.0f}s")
+    print("=" * 72)
+    print(f"{'mode':>8} {'reads/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'docs/s':>8} {'errors':>7}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("shared", "pooled"):
+            result = run(mode, tmp, args.documents, args.chunks, args.readers, args.seconds)
+            print(f"{mode:>8} {result['reads_per_sec']:>10.0f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['docs_per_sec']:>8.1f} {result['errors']:>7}")
@@ -0,0 +1,145 @@
+"""
+Benchmark: secondary indexes and row counters on the chunks table
+
+Fills a fresh database through SQLiteStore (documents of CHUNKS_PER_DOCUMENT
+chunks: one LARGE, MEDIUM_PER_DOCUMENT MEDIUM, the rest SMALL), then times
+the per-document and per-type chunk reads and the stats counts:
+
+  before  - chunks with only its primary key (and the section index), and
+            counts as ORM COUNT(*) queries
+  after   - ix_chunks_document_index (document_id, chunk_index) and
+            ix_chunks_type (chunk_type), and the maintained store_counters
+
+The query plans of both are printed.
+
+Usage:
+    python benchmark_sqlite_indexes.py                  # 1M chunks
+    python benchmark_sqlite_indexes.py --chunks 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from storage.sqlite_store import SQLiteStore, Chunk, Document
+
+CHUNKS_PER_DOCUMENT = 200
+MEDIUM_PER_DOCUMENT = 20
+INDEXES = {
+    "ix_chunks_document_index": "document_id, chunk_index",
+    "ix_chunks_type": "chunk_type"
+}
+
+PLANS = {
+    "get_chunks_by_document": "SELECT * FROM chunks WHERE document_id = 'doc1' AND tombstoned = 0 "
+                              "ORDER BY chunk_index",
+    "get_live_chunk_ids": "SELECT id FROM chunks WHERE document_id = 'doc1' AND tombstoned = 0",
+    "get_chunks_by_type": "SELECT * FROM chunks WHERE chunk_type = 'L' AND tombstoned = 0",
+}
+COUNT_PLANS = {
+    False: ("count_chunks (ORM)", "SELECT count(*) FROM (SELECT chunks.id FROM chunks WHERE tombstoned = 0)"),
+    True: ("count_chunks (counter)", "SELECT value FROM store_counters WHERE name = 'chunks'"),
+}
+
+
+def chunk_type(index: int) -> str:
+    if index == 0:
+        return "L"
+    return "M" if index <= MEDIUM_PER_DOCUMENT else "S"
+
+
+def fill(store: SQLiteStore, chunks: int) -> float:
+    start = time.perf_counter()
+    for document in range(chunks // CHUNKS_PER_DOCUMENT):
+        doc_id = f"doc{document}"
+        with store.transaction():
+            store.add_document(doc_id=doc_id, filename=f"{doc_id}.txt")
+            store.add_chunks_bulk([{
+                "id": f"{doc_id}_chunk_{i}_{chunk_type(i)}", "document_id": doc_id,
+                "content": f"Paragraph {i} of {doc_id}", "chunk_index": i, "chunk_type": chunk_type(i),
+                "start_char": 0, "end_char": 0, "chunk_metadata": None
+            } for i in range(CHUNKS_PER_DOCUMENT)])
+    return time.perf_counter() - start
+
+
+def timed(call, repeat: int) -> float:
+    """Median milliseconds of call()"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)[len(latencies) // 2]
+
+
+def measure(store: SQLiteStore, documents: int, indexed: bool, repeat: int) -> dict:
+    rng = random.Random(0)
+    doc_ids = [f"doc{rng.randrange(documents)}" for _ in range(repeat)]
+    queue = iter(doc_ids * 3)
+    session = store.session
+    if indexed:
+        count_chunks, count_documents = store.count_chunks, store.count_documents
+    else:
+        # The ORM counts count_chunks/count_documents ran before the counters
+        count_chunks = session.query(Chunk).filter(Chunk.tombstoned == False).count
+        count_documents = session.query(Document).count
+    return {
+        "get_chunks_by_document": timed(lambda: store.get_chunks_by_document(next(queue)), repeat),
+        "get_live_chunk_ids": timed(lambda: store.get_live_chunk_ids(next(queue)), repeat),
+        "get_chunks_by_type('L')": timed(lambda: store.get_chunks_by_type("L"), max(3, repeat // 10)),
+        "get_chunks_by_type('M')": timed(lambda: store.get_chunks_by_type("M"), 3),
+        "get_chunks_by_type('S')": timed(lambda: store.get_chunks_by_type("S"), 1),
+        "count_chunks": timed(count_chunks, repeat),
+        "count_documents": timed(count_documents, repeat),
+    }
+
+
+def print_plans(store: SQLiteStore, indexed: bool):
+    for name, sql in list(PLANS.items()) + [COUNT_PLANS[indexed]]:
+        plan = store.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        print(f"  {name}: " + "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chunks table indexes and row counters")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50, help="Calls per timed query")
+    args = parser.parse_args()
+    documents = args.chunks // CHUNKS_PER_DOCUMENT
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(os.path.join(tmp, "bench.db"))
+        print(f"Ingesting {documents} documents x {CHUNKS_PER_DOCUMENT} chunks...")
+        print(f"✓ {fill(store, args.chunks):.0f}s")
+
+        # A database from before the migration
+        for name in INDEXES:
+            store.session.execute(text(f"DROP INDEX {name}"))
+        store.session.commit()
+        print("\nBefore: query plans")
+        print_plans(store, indexed=False)
+        before = measure(store, documents, indexed=False, repeat=args.repeat)
+
+        start = time.perf_counter()
+        for name, columns in INDEXES.items():
+            store.session.execute(text(f"CREATE INDEX {name} ON chunks ({columns})"))
+        store.session.commit()
+        print(f"\nCreated indexes in {time.perf_counter() - start:.1f}s")
+        print("\nAfter: query plans")
+        print_plans(store, indexed=True)
+        after = measure(store, documents, indexed=True, repeat=args.repeat)
+
+        print("\n" + "=" * 64)
+        print(f"Median ms, {args.chunks} chunks in {documents} documents")
+        print("=" * 64)
+        print(f"{'call':>26} {'before':>10} {'after':>10} {'speedup':>9}")
+        for name in before:
+            print(f"{name:>26} {before[name]:>10.3f} {after[name]:>10.3f} {before[name] / after[name]:>8.1f}x")
+
+        store.release()
+        store.engine.dispose()
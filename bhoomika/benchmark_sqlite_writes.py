@@ -0,0 +1,91 @@
+"""
+Benchmark: Per-chunk commits vs single-transaction bulk inserts
+
+Compares SQLiteStore.add_chunk (one commit per chunk) with
+SQLiteStore.add_chunks_bulk (one executemany transaction) on a
+temporary database.
+
+Usage:
+    python benchmark_sqlite_writes.py
+    python benchmark_sqlite_writes.py --chunks 2000 --documents 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.sqlite_store import SQLiteStore
+
+
+def make_rows(doc_id: str, num_chunks: int) -> list:
+    paragraph = "The registrar shall record the transfer of immoveable property. " * 6
+    return [{
+        "id": f"{doc_id}_chunk_{i}_S",
+        "document_id": doc_id,
+        "content": paragraph,
+        "chunk_index": i,
+        "chunk_type": "S",
+        "start_char": i * len(paragraph),
+        "end_char": (i + 1) * len(paragraph),
+        "chunk_metadata": None
+    } for i in range(num_chunks)]
+
+
+def bench_per_chunk(store: SQLiteStore, doc_ids: list, num_chunks: int) -> float:
+    start = time.perf_counter()
+    for doc_id in doc_ids:
+        for row in make_rows(doc_id, num_chunks):
+            store.add_chunk(
+                chunk_id=row["id"],
+                document_id=row["document_id"],
+                content=row["content"],
+                chunk_index=row["chunk_index"],
+                chunk_type=row["chunk_type"],
+                start_char=row["start_char"],
+                end_char=row["end_char"]
+            )
+    return time.perf_counter() - start
+
+
+def bench_bulk(store: SQLiteStore, doc_ids: list, num_chunks: int) -> float:
+    rows = []
+    for doc_id in doc_ids:
+        rows.extend(make_rows(doc_id, num_chunks))
+
+    start = time.perf_counter()
+    store.add_chunks_bulk(rows)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SQLite chunk write paths")
+    parser.add_argument("--chunks", type=int, default=500, help="Chunks per document")
+    parser.add_argument("--documents", type=int, default=2, help="Documents per run")
+    args = parser.parse_args()
+
+    total = args.chunks * args.documents
+
+    print("=" * 60)
+    print(f"SQLite chunk writes: {args.documents} documents x {args.chunks} chunks")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(db_path=os.path.join(tmp, "bench.db"))
+
+        per_chunk_docs = [f"pc{i}" for i in range(args.documents)]
+        bulk_docs = [f"bk{i}" for i in range(args.documents)]
+        for doc_id in per_chunk_docs + bulk_docs:
+            store.add_document(doc_id=doc_id, filename=f"{doc_id}.txt")
+
+        per_chunk = bench_per_chunk(store, per_chunk_docs, args.chunks)
+        bulk = bench_bulk(store, bulk_docs, args.chunks)
+
+        print(f"add_chunk (commit per chunk): {per_chunk:8.3f}s  {total / per_chunk:10.0f} rows/sec")
+        print(f"add_chunks_bulk (1 commit):   {bulk:8.3f}s  {total / bulk:10.0f} rows/sec")
+        print(f"Speedup: {per_chunk / bulk:.1f}x")
+
+        store.session.close()
+        store.engine.dispose()
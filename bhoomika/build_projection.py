@@ -0,0 +1,59 @@
+"""
+Rebuild the reduced-dimension search tier of the vector store.
+
+Usage:
+    python build_projection.py              # fit with REDUCED_DIMENSION from config
+    python build_projection.py --dim 128    # fit a different reduced dimension
+    python build_projection.py --drop       # remove the tier, exact search only
+
+The PCA projection (projection.npz) and the reduced matrix
+(vectors_reduced.npy) are written next to vectors.npy.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import REDUCED_DIMENSION, PROJECTION_SAMPLE_SIZE
+from storage.simple_store import get_faiss_store
+
+
+def build_projection(dimension: int = REDUCED_DIMENSION, sample_size: int = PROJECTION_SAMPLE_SIZE):
+    store = get_faiss_store()
+    print(f"Vector store: {store.count()} vectors x {store.vectors.shape[1]} dims")
+
+    start = time.perf_counter()
+    fitted = store.fit_projection(dimension, sample_size)
+    elapsed = time.perf_counter() - start
+
+    if fitted is None:
+        print(f"Not enough vectors to fit a {dimension}-dim projection. Exact search stays in use.")
+        return
+
+    store.save()
+    print(f"✓ Fitted {fitted}-dim projection in {elapsed:.2f}s")
+    print(f"  Reduced matrix: {store.reduced_vectors.nbytes / 1e6:.1f} MB "
+          f"(full: {store.vectors.nbytes / 1e6:.1f} MB)")
+
+
+def drop_projection():
+    store = get_faiss_store()
+    store.drop_projection()
+    store.save()
+    print("✓ Reduced tier removed. Exact search in use.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the PCA reduced-dimension vector tier")
+    parser.add_argument("--dim", type=int, default=REDUCED_DIMENSION, help="Reduced dimension")
+    parser.add_argument("--sample", type=int, default=PROJECTION_SAMPLE_SIZE,
+                        help="Max vectors used to fit the projection")
+    parser.add_argument("--drop", action="store_true", help="Remove the reduced tier")
+    args = parser.parse_args()
+
+    if args.drop:
+        drop_projection()
+    else:
+        build_projection(args.dim, args.sample)
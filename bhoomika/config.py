@@ -25,8 +25,94 @@ GRAPH_PATH = os.path.join(DATA_DIR, "knowledge_graph.gpickle")
 # Retrieval Settings
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
+STRUCTURE_AWARE_CHUNKING = True  # Markdown headings ("# Act", "## Section N: Title") bound MEDIUM chunks
+STATUTE_SECTION_MAX_CHARS = 4000  # Longer sections fall back to paragraph merging
 TOP_K_RESULTS = 5
-GRAPH_EXPANSION_DEPTH = 2
+GRAPH_EXPANSION_DEPTH = 2  # k-hop expansion (get_related_chunks, cache precompute); retrieval scores with PageRank
+GRAPH_EXPANSION_FANOUT = (8, 4)  # Per hop: max neighbors followed from each frontier chunk (highest weight first)
+
+# Graph Scoring (personalized PageRank seeded by the vector hits)
+GRAPH_PPR_RESTART = 0.15  # Probability of jumping back to a seed at each step
+GRAPH_PPR_MAX_ITERATIONS = 10  # Mass moves at most one hop per iteration
+GRAPH_PPR_TIME_BUDGET_MS = 30.0  # Stop iterating once this much time is spent...
+GRAPH_PPR_TOLERANCE = 1e-4  # ...or once the L1 change of an iteration falls below this
+GRAPH_PPR_MIN_MASS = 1e-3  # Nodes holding less mass are not expanded (bounds the explored subgraph)
+GRAPH_RELATIONSHIP_WEIGHTS = {"sequential": 0.6, "semantic": 1.0, "shared_concept": 0.8}  # Scale edge weights by kind
+
+# Lexical Search (SQLite FTS5 index of chunk text, bm25 ranked)
+LEXICAL_CANDIDATES = 50  # bm25 matches fused into each retrieval
+LEXICAL_MAX_TERM_MATCHES = 100000  # Words in more chunks are left out of the query (bm25 is computed per match)
+LEXICAL_WEIGHT = 0.3  # Added to the fused score (0.7 vector + 0.3 graph) times the normalized bm25 score
+LEXICAL_PREFILTER = os.getenv("LEXICAL_PREFILTER", "0") == "1"  # Score vectors only among bm25 matches
+LEXICAL_PREFILTER_CANDIDATES = 500  # bm25 matches the prefiltered vector search scores (needs at least top_k * 2)
+
+# Graph Neighborhood Cache
+GRAPH_CACHE_MAX_ENTRIES = 20000  # LRU entries (PageRank adjacency rows and k-hop expansions)
+GRAPH_CACHE_PRECOMPUTE_TOP_N = int(os.getenv("GRAPH_CACHE_PRECOMPUTE_TOP_N", "500"))  # Most-retrieved chunks warmed at startup (0 = off)
+
+# Graph Statistics (/api/graph/stats)
+GRAPH_STATS_HUB_MIN_DEGREE = 32  # Chunks with at least this many edges are tracked as hubs
+GRAPH_STATS_RECENT_QUERIES = 1000  # Traversals kept for latency and size percentiles
+
+# Reduced-dimension search tier (PCA projection fitted on the stored vectors)
+REDUCED_DIMENSION = 256
+PROJECTION_RERANK_FACTOR = 8  # Candidates re-scored at full dimension = top_k * factor
+PROJECTION_SAMPLE_SIZE = 50000  # Max vectors used to fit the projection
+
+# Vector Store Maintenance (removed vectors are tombstoned until compaction)
+TOMBSTONE_COMPACT_RATIO = 0.2  # Compact the vector store when this share is tombstoned
+
+# PDF Extraction (process pool)
+PDF_EXTRACT_WORKERS = os.cpu_count() or 1
+PDF_PAGES_PER_TASK = 16  # Page range handed to one worker
+PDF_PARALLEL_MIN_PAGES = 32  # Smaller PDFs are extracted as a single task
+
+# Streaming Ingestion
+STREAM_QUEUE_SIZE = 4  # Documents buffered between two stages
+STREAM_EXTRACT_WORKERS = 2
+STREAM_EMBED_WORKERS = 2
+
+# Knowledge Graph Storage
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "csr")  # csr (memory-mapped arrays), sqlite (edge table shared by workers) or networkx (legacy pickle)
+GRAPH_DELTA_MAX_EDGES = 100000  # CSR: buffered edge changes before they are merged into the arrays
+GRAPH_LOG_COMPACT_RATIO = 0.5  # CSR: snapshot once the edge log grows past this fraction of the snapshot...
+GRAPH_LOG_MIN_COMPACT_BYTES = 8 * 1024 * 1024  # ...and past this size
+GRAPH_SQLITE_CACHE_ROWS = 50000  # SQLite: adjacency rows cached per worker (dropped when another worker writes)
+
+# Knowledge Graph Construction
+SEMANTIC_EDGE_THRESHOLD = 0.75  # Min cosine similarity for a semantic edge
+SEMANTIC_BLOCK_SIZE = 1024  # Rows per blocked similarity product (bounds memory to block x n)
+CROSS_DOC_SEMANTIC_K = int(os.getenv("CROSS_DOC_SEMANTIC_K", "0"))  # k-NN edges to other documents per chunk (0 = off)
+KEYWORD_MAX_DF_RATIO = 0.2  # Keywords in more than this share of a document's chunks are hubs, not links
+KEYWORD_MIN_DF_CAP = 8  # ...but never cap a keyword below this many chunks
+KEYWORD_GLOBAL_MAX_DF = 50  # Cross-document keyword edges only for keywords in at most this many chunks
+KEYWORD_CROSS_DOCUMENT = os.getenv("KEYWORD_CROSS_DOCUMENT", "0") == "1"  # Link chunks of different documents by shared keywords
+
+# Batch Ingestion
+INGEST_EMBED_BATCH_SIZE = 128  # Texts per embedding request, across documents
+
+# Ingestion Job Queue
+INGEST_UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")  # Uploads wait here until their job runs
+INGEST_UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read from the request per write
+INGEST_JOB_POLL_SECONDS = 2.0  # Worker re-checks for queued jobs at least this often
+INGEST_JOB_HEARTBEAT_SECONDS = 10.0  # A worker refreshes the heartbeat of its running jobs this often...
+INGEST_JOB_STALE_SECONDS = 60.0  # ...and jobs whose heartbeat is older are re-queued
+INGEST_WRITER_LOCK_PATH = os.path.join(DATA_DIR, "writer.lock")  # Held by the one server process that may write the stores
+
+# SQLite Connections (one pooled engine per process)
+SQLITE_POOL_SIZE = 8  # Pooled connections kept open
+SQLITE_POOL_OVERFLOW = 8  # Extra connections opened under load
+SQLITE_BUSY_TIMEOUT_SECONDS = 30  # Wait this long for the writer lock before failing
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the database file read through mmap
+SQLITE_CACHE_SIZE_KB = 16 * 1024  # Page cache per connection
+
+# Write-behind Persistence (vector store and knowledge graph)
+PERSIST_INTERVAL_SECONDS = 10.0  # Flush dirty stores at least this often
+PERSIST_MAX_DIRTY_OPS = 5000  # ...or as soon as this many mutations are unsaved
+
+# Document Text Storage (chunks reference spans of the stored text)
+DOCUMENT_TEXT_BLOCK_SIZE = 64 * 1024  # Characters per compressed block; spans only decompress the blocks they cover
+DOCUMENT_TEXT_COMPRESSION_LEVEL = 6  # zlib level
 
 # Server Configuration
 HOST = "0.0.0.0"
@@ -40,3 +126,4 @@ CORS_ORIGINS = [
 # Ensure directories exist
 os.makedirs(DOCUMENTS_DIR, exist_ok=True)
 os.makedirs(FAISS_INDEX_PATH, exist_ok=True)
+os.makedirs(INGEST_UPLOAD_DIR, exist_ok=True)
@@ -19,6 +19,7 @@ try:
     from config import DOCUMENTS_DIR, DATA_DIR
     from pipeline.ingestion import get_ingestion_pipeline
     from pipeline.chunking import chunk_document
+    from pipeline.streaming import StreamingIngestion
 except ImportError as e:
     print(f"Import Error: {e}")
     # Fallback for direct execution if config not found
@@ -41,54 +42,39 @@ def ingest_documents():
     print(f"Found {len(files)} documents: {files}")
     
     try:
-        pipeline = get_ingestion_pipeline()
+        streaming = StreamingIngestion()
     except Exception as e:
         print(f"Failed to initialize pipeline: {e}")
         return
 
-    for filename in files:
-        file_path = os.path.join(DOCUMENTS_DIR, filename)
-        try:
-            print(f"Processing: {filename}...")
-            
-            # Simple text ingestion for now (PDF parsing needs pypdf)
-            if filename.lower().endswith('.pdf'):
-                try:
-                    import pypdf
-                    reader = pypdf.PdfReader(file_path)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n"
-                except ImportError:
-                    print("Error: pypdf not installed. Run 'pip install pypdf'")
-                    continue
-                except Exception as e:
-                    print(f"Error reading PDF {filename}: {e}")
-                    continue
-            else:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
+    # Extract, chunk, embed, persist and graph stages run concurrently
+    file_paths = [os.path.join(DOCUMENTS_DIR, f) for f in files]
+    results = streaming.ingest_files(file_paths)
 
-            if not text.strip():
-                print(f"Skipping empty file: {filename}")
-                continue
+    for result in results:
+        filename = os.path.basename(result["source"])
+        if result["error"]:
+            print(f"Failed to process {filename} at stage '{result['failed_stage']}': {result['error']}")
+            continue
 
-            # Ingest
-            doc_id = pipeline.ingest_text(
-                text=text,
-                title=filename,
-                description=f"Imported from {filename}"
-            )
-            print(f"Successfully ingested {filename} as ID: {doc_id}")
-            
-            # Move to processed
-            shutil.move(file_path, os.path.join(PROCESSED_DIR, filename))
-            print(f"Moved {filename} to processed directory.")
-            
-        except Exception as e:
-            print(f"Failed to process {filename}: {e}")
-            import traceback
-            traceback.print_exc()
+        timings = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["extract_timings"].items())
+        if result["status"] == "unchanged":
+            print(f"Unchanged, skipped {filename} (ID: {result['document_id']})")
+        else:
+            print(f"Successfully ingested {filename} as ID: {result['document_id']} ({result['status']}: "
+                  f"+{result['chunks_added']} / -{result['chunks_removed']} chunks{', ' + timings if timings else ''})")
+
+        # Move to processed
+        shutil.move(result["source"], os.path.join(PROCESSED_DIR, filename))
+        print(f"Moved {filename} to processed directory.")
+
+    # Per-stage throughput
+    stats = streaming.get_stats()
+    print(f"\nPipeline finished in {stats['wall_seconds']:.2f}s")
+    for stage, counters in stats["stages"].items():
+        print(f"  {stage:<8} {counters['items']:>4} docs  {counters['errors']:>3} errors  "
+              f"busy {counters['busy_seconds']:>7.2f}s  blocked {counters['blocked_seconds']:>7.2f}s  "
+              f"{counters['items_per_second']:>8.2f} docs/s")
 
 if __name__ == "__main__":
     ingest_documents()
@@ -6,18 +6,18 @@ Uses Local SentenceTransformers (BAAI/bge-large-en-v1.5) (1024 dim).
 """
 import os
 import sys
-import uuid
 import json
+import hashlib
 import shutil
 import pickle
 import time
 import numpy as np
 from typing import List, Tuple, Dict, Any
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sqlalchemy import create_engine, Column, String, Text, Integer, DateTime, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from sentence_transformers import SentenceTransformer
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,6 +26,7 @@ DOCUMENTS_DIR = os.path.join(DATA_DIR, "documents")
 PROCESSED_DIR = os.path.join(DATA_DIR, "processed")
 FAISS_INDEX_PATH = os.path.join(DATA_DIR, "faiss_index")
 SQLITE_DB_PATH = os.path.join(DATA_DIR, "bhoomika.db")
+JOURNAL_PATH = os.path.join(DATA_DIR, "ingest_journal.json")
 
 # Model Config
 from dotenv import load_dotenv
@@ -37,6 +38,11 @@ EMBEDDING_MODEL = "BAAI/bge-large-en-v1.5"
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
 BATCH_SIZE = 16 
+CHECKPOINT_BATCHES = 8  # Save vectors and the journal every N batches
+
+# PDF Extraction Config
+PDF_EXTRACT_WORKERS = os.cpu_count() or 1
+PDF_PAGES_PER_TASK = 16
 
 # --- DATABASE SETUP ---
 Base = declarative_base()
@@ -92,9 +98,57 @@ class TextChunker:
             
         return chunks
 
+# --- PDF EXTRACTION ---
+def _extract_page_range(filepath: str, start: int, end: int) -> List[Tuple[int, str]]:
+    import pypdf
+    reader = pypdf.PdfReader(filepath)
+    return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, end)]
+
+def extract_pdfs(filepaths: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract PDFs in a process pool, splitting each file into page ranges.
+    Returns filepath -> {text, pages: [(page_number, start, end)], timings, error}.
+    """
+    import pypdf
+    tasks, results = [], {}
+    for path in filepaths:
+        t0 = time.perf_counter()
+        results[path] = {'pages': [], 'timings': {}, 'error': None}
+        try:
+            num_pages = len(pypdf.PdfReader(path).pages)
+            tasks.extend((path, s, min(s + PDF_PAGES_PER_TASK, num_pages))
+                         for s in range(0, num_pages, PDF_PAGES_PER_TASK))
+        except Exception as e:
+            results[path]['error'] = str(e)
+        results[path]['timings']['open'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(PDF_EXTRACT_WORKERS, len(tasks)))) as pool:
+        futures = {pool.submit(_extract_page_range, *task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path]['pages'].extend(future.result())
+            except Exception as e:
+                results[path]['error'] = str(e)
+            results[path]['timings']['extract'] = time.perf_counter() - t0
+
+    for path, result in results.items():
+        t0 = time.perf_counter()
+        parts, spans, offset = [], [], 0
+        for page_number, page_text in sorted(result['pages']):
+            spans.append((page_number, offset, offset + len(page_text)))
+            parts.append(page_text)
+            offset += len(page_text) + 1
+        result['text'] = '\n'.join(parts)
+        result['pages'] = spans
+        result['timings']['assemble'] = time.perf_counter() - t0
+    return results
+
 # --- EMBEDDING ---
 class LocalEmbeddings:
     def __init__(self):
+        from sentence_transformers import SentenceTransformer
         print(f"Loading local model {EMBEDDING_MODEL}...")
         self.model = SentenceTransformer(EMBEDDING_MODEL)
 
@@ -116,6 +170,7 @@ class SimpleVectorStore:
         self.id_to_chunk = {}
         self.current_id = 0
         self._load()
+        self.chunk_ids = set(self.id_to_chunk.values())
 
     def _load(self):
         if os.path.exists(self.index_path) and os.path.exists(self.id_map_path):
@@ -149,18 +204,153 @@ class SimpleVectorStore:
         for cid in valid_ids:
             internal_id = self.current_id
             self.id_to_chunk[internal_id] = cid
+            self.chunk_ids.add(cid)
             self.current_id += 1
 
     def save(self):
+        # Write to temp files and rename, so a crash never leaves a torn index
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        np.save(self.index_path, self.vectors)
-        with open(self.id_map_path, 'wb') as f:
+        with open(self.index_path + ".tmp", 'wb') as f:
+            np.save(f, self.vectors)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.id_map_path + ".tmp", 'wb') as f:
             pickle.dump({
                 'id_to_chunk': self.id_to_chunk,
                 'current_id': self.current_id
             }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.index_path + ".tmp", self.index_path)
+        os.replace(self.id_map_path + ".tmp", self.id_map_path)
+
+# --- CHECKPOINT JOURNAL ---
+class IngestJournal:
+    """
+    Per-file, per-batch progress of the bulk ingestion, kept in JSON.
+
+    files[filename] = {doc_id, content_hash, status, num_chunks,
+    batches_done, error}. Status is in_progress, done or failed.
+    Rewritten atomically after every checkpoint.
+    """
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get('files', {})
+
+    def get(self, filename: str, content_hash: str) -> Dict[str, Any]:
+        """Entry for a file; a changed file starts a fresh entry"""
+        entry = self.files.get(filename)
+        if entry is None or entry.get('content_hash') != content_hash:
+            entry = {'content_hash': content_hash, 'status': 'in_progress', 'batches_done': 0}
+            self.files[filename] = entry
+        return entry
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files, 'updated_at': datetime.utcnow().isoformat()}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
 
 # --- MAIN INGESTION ---
+def ingest_file(filename: str, text: str, session, chunker, embedder, vector_store, journal) -> Dict[str, int]:
+    """
+    Ingest one file batch by batch, resuming from the journal.
+
+    IDs are derived from the filename and text, so a rerun addresses the
+    same document and chunk rows. Every batch is reconciled against both
+    stores: chunks already in SQLite and the vector store are skipped,
+    rows missing from either store (e.g. after a crash between the SQLite
+    commit and the vector save) are filled in.
+    """
+    content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    entry = journal.get(filename, content_hash)
+    doc_id = entry.setdefault('doc_id', hashlib.sha256(f"{filename}\0{content_hash}".encode('utf-8')).hexdigest()[:32])
+    entry['status'] = 'in_progress'
+    entry.pop('error', None)
+
+    if session.get(Document, doc_id) is None:
+        session.add(Document(id=doc_id, filename=filename, title=filename, doc_type='pdf'))
+        session.commit()
+
+    raw_chunks = chunker.chunk_text(text)
+    entry['num_chunks'] = len(raw_chunks)
+    num_batches = (len(raw_chunks) + BATCH_SIZE - 1) // BATCH_SIZE
+    print(f"Created {len(raw_chunks)} chunks ({num_batches} batches, {entry['batches_done']} already done).")
+
+    stored_ids = {row[0] for row in session.query(Chunk.id).filter_by(document_id=doc_id)}
+    counts = {'embedded': 0, 'rows_added': 0, 'reconciled': 0}
+    pending_vectors = False
+
+    for batch_number in range(num_batches):
+        start = batch_number * BATCH_SIZE
+        batch = raw_chunks[start:start + BATCH_SIZE]
+        chunk_ids = [f"{doc_id}_{start + j}" for j in range(len(batch))]
+
+        missing_rows = [j for j, cid in enumerate(chunk_ids) if cid not in stored_ids]
+        missing_vectors = [j for j, cid in enumerate(chunk_ids) if cid not in vector_store.chunk_ids]
+        if not missing_rows and not missing_vectors:
+            continue
+        if batch_number < entry['batches_done']:
+            # Journal says done but a store lost part of it
+            counts['reconciled'] += len(set(missing_rows) | set(missing_vectors))
+
+        if missing_vectors:
+            print(f"  Embedding batch {batch_number + 1}/{num_batches} ({len(missing_vectors)} items)...")
+            embeddings = embedder.embed_batch([batch[j][0] for j in missing_vectors])
+            if len(embeddings) != len(missing_vectors):
+                raise RuntimeError(f"Embedding failed for batch {batch_number + 1}")
+            vector_store.add_batch([chunk_ids[j] for j in missing_vectors], embeddings)
+            counts['embedded'] += len(missing_vectors)
+            pending_vectors = True
+
+        for j in missing_rows:
+            session.add(Chunk(id=chunk_ids[j], document_id=doc_id, content=batch[j][0], chunk_index=start + j))
+            stored_ids.add(chunk_ids[j])
+        session.commit()
+        counts['rows_added'] += len(missing_rows)
+
+        # Checkpoint: vectors first, then the journal that vouches for them
+        if (batch_number + 1) % CHECKPOINT_BATCHES == 0:
+            if pending_vectors:
+                vector_store.save()
+                pending_vectors = False
+            entry['batches_done'] = max(entry['batches_done'], batch_number + 1)
+            journal.save()
+
+    if pending_vectors:
+        vector_store.save()
+    entry['batches_done'] = num_batches
+    entry['status'] = 'done'
+    journal.save()
+    return counts
+
+
+def refresh_store_indexes():
+    """
+    Rows written here bypass SQLiteStore, which keeps the row counters read
+    by /api/stats and the full-text index of chunk text; recount and
+    reindex once ingestion is done. Uses the package only for this step, so
+    ingestion itself still runs where it cannot be imported.
+    """
+    try:
+        sys.path.append(BASE_DIR)
+        from storage.sqlite_store import SQLiteStore
+        store = SQLiteStore(SQLITE_DB_PATH)
+        counters = store.recount()
+        t0 = time.perf_counter()
+        indexed = store.rebuild_search_index()
+    except Exception as e:
+        print(f"Could not refresh row counters and search index: {e}")
+        print("Run: python migrate_db.py && python rebuild_search_index.py")
+        return
+    print(f"Recounted {counters['documents']} documents, {counters['chunks']} chunks; "
+          f"indexed {indexed} chunks for search in {time.perf_counter() - t0:.1f}s")
+
 def process_documents():
     print(f"Scanning {DOCUMENTS_DIR}...")
     files = [f for f in os.listdir(DOCUMENTS_DIR) if f.lower().endswith('.pdf')]
@@ -172,66 +362,55 @@ def process_documents():
     chunker = TextChunker()
     embedder = LocalEmbeddings()
     vector_store = SimpleVectorStore()
+    journal = IngestJournal()
+    failed = []
+    rows_added = 0
 
-    import pypdf
+    print(f"Extracting {len(files)} PDFs...")
+    extracted = extract_pdfs([os.path.join(DOCUMENTS_DIR, f) for f in files])
 
     for filename in files:
         print(f"Processing {filename}...")
         filepath = os.path.join(DOCUMENTS_DIR, filename)
         
         try:
-            reader = pypdf.PdfReader(filepath)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            result = extracted[filepath]
+            if result['error']:
+                raise RuntimeError(f"PDF extraction failed: {result['error']}")
+            text = result['text']
+            timings = ", ".join(f"{k} {v:.2f}s" for k, v in result['timings'].items())
+            print(f"  Extracted {len(result['pages'])} pages ({timings})")
             
             if not text.strip(): continue
 
-            doc_id = str(uuid.uuid4())
-            doc = Document(id=doc_id, filename=filename, title=filename, doc_type='pdf')
-            session.add(doc)
-            session.commit()
-
-            raw_chunks = chunker.chunk_text(text)
-            print(f"Created {len(raw_chunks)} chunks.")
-
-            all_embeddings = []
-            chunk_ids = []
-            
-            for i in range(0, len(raw_chunks), BATCH_SIZE):
-                batch = raw_chunks[i:i + BATCH_SIZE]
-                batch_texts = [c[0] for c in batch]
-                
-                print(f"  Embedding batch {i // BATCH_SIZE + 1} ({len(batch_texts)} items)...")
-                embeddings = embedder.embed_batch(batch_texts)
-                all_embeddings.extend(embeddings)
-                
-                for j, (chunk_text, _, _) in enumerate(batch):
-                    global_idx = i + j
-                    chunk_id = f"{doc_id}_{global_idx}"
-                    chunk = Chunk(
-                        id=chunk_id,
-                        document_id=doc_id,
-                        content=chunk_text,
-                        chunk_index=global_idx
-                    )
-                    session.add(chunk)
-                    chunk_ids.append(chunk_id)
-                session.commit()
-                # No sleep needed for local
-
-            print(f"Saving {len(all_embeddings)} vectors...")
-            vector_store.add_batch(chunk_ids, all_embeddings)
-            vector_store.save()
+            counts = ingest_file(filename, text, session, chunker, embedder, vector_store, journal)
+            rows_added += counts['rows_added']
+            reconciled = f", reconciled {counts['reconciled']}" if counts['reconciled'] else ""
+            print(f"  Embedded {counts['embedded']} chunks, added {counts['rows_added']} rows{reconciled}.")
 
             os.makedirs(PROCESSED_DIR, exist_ok=True)
             shutil.move(filepath, os.path.join(PROCESSED_DIR, filename))
             print("Done.")
 
         except Exception as e:
+            session.rollback()
+            entry = journal.files.get(filename)
+            if entry is not None:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+                journal.save()
+            failed.append(filename)
             print(f"Error processing {filename}: {e}")
             import traceback
             traceback.print_exc()
 
+    if rows_added:
+        session.close()
+        refresh_store_indexes()
+
+    if failed:
+        print(f"{len(failed)} file(s) failed; rerun to resume from the journal: {', '.join(failed)}")
+        sys.exit(1)
+
 if __name__ == "__main__":
     process_documents()
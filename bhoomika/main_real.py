@@ -1,17 +1,38 @@
 """
 Bhoomika AI Assistant - FastAPI Entry Point
 """
-from fastapi import FastAPI
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-from config import HOST, PORT, CORS_ORIGINS
+from config import HOST, PORT, CORS_ORIGINS, GRAPH_CACHE_PRECOMPUTE_TOP_N
 from api.routes import router
+from pipeline import get_ingestion_worker
+from storage import get_persistence_manager, get_knowledge_graph, get_sqlite_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume jobs queued or interrupted before the last shutdown. Fails if another
+    # server process already writes the stores: run one process (--workers 1)
+    worker = get_ingestion_worker()
+    # Warm the neighborhood cache for the most-retrieved chunks, off the request path
+    if GRAPH_CACHE_PRECOMPUTE_TOP_N > 0:
+        threading.Thread(target=get_knowledge_graph().precompute_neighborhoods,
+                         name="graph-precompute", daemon=True).start()
+    yield
+    worker.stop(timeout=30)
+    # Write out anything the background flusher has not saved yet
+    get_persistence_manager().close()
+
 
 app = FastAPI(
     title="Bhoomika AI Assistant",
     description="AI-powered legal assistant for Indian land and property rights",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -23,6 +44,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def release_sqlite_session(request: Request, call_next):
+    """Return the event loop thread's SQLite session to the pool after each request"""
+    try:
+        return await call_next(request)
+    finally:
+        get_sqlite_store().release()
+
+
 # Include API routes
 app.include_router(router, prefix="/api")
 
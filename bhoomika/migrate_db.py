@@ -3,12 +3,14 @@ Database Migration Script: Add chunk_type column to chunks table
 Run this to migrate existing database to support multi-granularity chunking
 """
 import sqlite3
+import json
+import zlib
 import os
 import sys
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import SQLITE_DB_PATH
+from config import SQLITE_DB_PATH, DOCUMENT_TEXT_BLOCK_SIZE, DOCUMENT_TEXT_COMPRESSION_LEVEL
 
 
 def migrate_database():
@@ -58,14 +60,148 @@ def migrate_database():
         else:
             print("✓ chunk_type column already exists in chunks table")
         
+        # Content-hash keys for incremental re-ingestion
+        cursor.execute("PRAGMA table_info(documents)")
+        doc_columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'content_hash' not in doc_columns:
+            print("Adding content_hash column to documents table...")
+            cursor.execute("ALTER TABLE documents ADD COLUMN content_hash VARCHAR(64)")
+            migrations_done.append("Added content_hash column to documents")
+        else:
+            print("✓ content_hash column already exists in documents table")
+        
+        cursor.execute("PRAGMA table_info(chunks)")
+        chunk_columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'content_hash' not in chunk_columns:
+            print("Adding content_hash column to chunks table...")
+            cursor.execute("ALTER TABLE chunks ADD COLUMN content_hash VARCHAR(64)")
+            migrations_done.append("Added content_hash column to chunks")
+        else:
+            print("✓ content_hash column already exists in chunks table")
+        
+        if 'tombstoned' not in chunk_columns:
+            print("Adding tombstoned column to chunks table...")
+            cursor.execute("ALTER TABLE chunks ADD COLUMN tombstoned BOOLEAN NOT NULL DEFAULT 0")
+            migrations_done.append("Added tombstoned column to chunks")
+        else:
+            print("✓ tombstoned column already exists in chunks table")
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_documents_filename ON documents (filename)")
+        
+        # Reference-based chunk storage: chunks.content becomes nullable
+        cursor.execute("PRAGMA table_info(chunks)")
+        chunk_columns = {col[1]: col for col in cursor.fetchall()}
+        
+        if chunk_columns['content'][3]:
+            print("Making chunks.content nullable...")
+            rebuild_chunks_table(cursor, list(chunk_columns))
+            migrations_done.append("Made chunks.content nullable")
+        else:
+            print("✓ chunks.content is already nullable")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS document_text_blocks (
+                document_id VARCHAR(50) NOT NULL REFERENCES documents (id),
+                block_index INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (document_id, block_index)
+            )
+        """)
+        
+        # Statute section index
+        cursor.execute("PRAGMA table_info(chunks)")
+        chunk_columns = [col[1] for col in cursor.fetchall()]
+        
+        for column, column_type in (('act_key', 'VARCHAR(200)'), ('section', 'VARCHAR(20)')):
+            if column not in chunk_columns:
+                print(f"Adding {column} column to chunks table...")
+                cursor.execute(f"ALTER TABLE chunks ADD COLUMN {column} {column_type}")
+                migrations_done.append(f"Added {column} column to chunks")
+            else:
+                print(f"✓ {column} column already exists in chunks table")
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_chunks_act_section ON chunks (act_key, section)")
+        
+        # Full-text index of chunk text (filled by rebuild_search_index.py)
+        if 'search_rowid' not in chunk_columns:
+            print("Adding search_rowid column to chunks table...")
+            cursor.execute("ALTER TABLE chunks ADD COLUMN search_rowid INTEGER")
+            migrations_done.append("Added search_rowid column to chunks")
+        else:
+            print("✓ search_rowid column already exists in chunks table")
+        
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                       "content, chunk_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')")
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts_vocab USING fts5vocab(chunks_fts, 'row')")
+        cursor.execute("SELECT COUNT(*) FROM chunks WHERE tombstoned = 0 AND chunk_type != 'L' AND search_rowid IS NULL")
+        unindexed = cursor.fetchone()[0]
+        
+        # Secondary indexes: a document's chunks in order, chunks by type
+        for name, columns in (('ix_chunks_document_index', 'document_id, chunk_index'), ('ix_chunks_type', 'chunk_type')):
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+            if cursor.fetchone() is None:
+                print(f"Creating index {name}...")
+                cursor.execute(f"CREATE INDEX {name} ON chunks ({columns})")
+                migrations_done.append(f"Created index {name} on chunks ({columns})")
+            else:
+                print(f"✓ {name} already exists")
+        
+        # Row counters read by the stats endpoint, reset from the tables
+        cursor.execute("CREATE TABLE IF NOT EXISTS store_counters (name VARCHAR(20) NOT NULL PRIMARY KEY, "
+                       "value INTEGER NOT NULL)")
+        cursor.execute("SELECT COUNT(*) FROM documents")
+        documents = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM chunks WHERE tombstoned = 0")
+        chunks = cursor.fetchone()[0]
+        cursor.execute("SELECT name, value FROM store_counters")
+        if dict(cursor.fetchall()) != {'documents': documents, 'chunks': chunks}:
+            cursor.executemany("INSERT OR REPLACE INTO store_counters (name, value) VALUES (?, ?)",
+                               [('documents', documents), ('chunks', chunks)])
+            migrations_done.append(f"Reset row counters: {documents} documents, {chunks} chunks")
+        else:
+            print("✓ Row counters are up to date")
+        
+        # Ingestion job claims: owning process and its heartbeat
+        cursor.execute("PRAGMA table_info(ingestion_jobs)")
+        job_columns = [col[1] for col in cursor.fetchall()]
+        if job_columns:
+            for column, column_type in (('owner', 'VARCHAR(100)'), ('heartbeat_at', 'DATETIME')):
+                if column not in job_columns:
+                    print(f"Adding {column} column to ingestion_jobs table...")
+                    cursor.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column} {column_type}")
+                    migrations_done.append(f"Added {column} column to ingestion_jobs")
+                else:
+                    print(f"✓ {column} column already exists in ingestion_jobs table")
+        
+        converted, references = convert_chunks_to_references(cursor)
+        if converted:
+            migrations_done.append(f"Stored text of {converted} documents, {references} chunks now reference it")
+        else:
+            print("✓ No documents left to convert to text references")
+        
+        indexed = index_statute_sections(cursor)
+        if indexed:
+            migrations_done.append(f"Indexed {indexed} chunks by statute section")
+        else:
+            print("✓ No chunks left to index by statute section")
+        
         if migrations_done:
             conn.commit()
             print("\n✓ Migration completed successfully!")
             for migration in migrations_done:
                 print(f"  - {migration}")
+            
+            # Reclaim the space of the dropped duplicate texts
+            conn.execute("VACUUM")
         else:
             print("\n✓ No migrations needed. Database is up to date.")
         
+        if unindexed:
+            print(f"\n! {unindexed} chunks are not in the full-text index. Run: python rebuild_search_index.py")
+        
     except Exception as e:
         print(f"✗ Migration failed: {e}")
         conn.rollback()
@@ -75,6 +211,117 @@ def migrate_database():
         conn.close()
 
 
+
+def rebuild_chunks_table(cursor, columns):
+    """SQLite cannot drop NOT NULL in place: copy chunks into a new table"""
+    cursor.execute("""
+        CREATE TABLE chunks_new (
+            id VARCHAR(100) NOT NULL PRIMARY KEY,
+            document_id VARCHAR(50) NOT NULL REFERENCES documents (id),
+            content TEXT,
+            chunk_index INTEGER,
+            chunk_type VARCHAR(10),
+            start_char INTEGER,
+            end_char INTEGER,
+            chunk_metadata TEXT,
+            content_hash VARCHAR(64),
+            tombstoned BOOLEAN NOT NULL DEFAULT 0,
+            act_key VARCHAR(200),
+            section VARCHAR(20),
+            search_rowid INTEGER
+        )
+    """)
+    column_list = ", ".join(columns)
+    cursor.execute(f"INSERT INTO chunks_new ({column_list}) SELECT {column_list} FROM chunks")
+    cursor.execute("DROP TABLE chunks")
+    cursor.execute("ALTER TABLE chunks_new RENAME TO chunks")
+
+
+def convert_chunks_to_references(cursor):
+    """
+    Store each document's text once, taken from its LARGE chunk, and turn
+    chunks that are exact spans of it into references (content NULL).
+    Chunks whose stored offsets do not match the text stay inline.
+    
+    Returns (documents converted, chunks turned into references).
+    """
+    cursor.execute("""
+        SELECT c.document_id, c.content, c.start_char FROM chunks c
+        WHERE c.chunk_type = 'L' AND c.tombstoned = 0 AND c.content IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM document_text_blocks b WHERE b.document_id = c.document_id)
+    """)
+    large_chunks = cursor.fetchall()
+    
+    converted, references = 0, 0
+    for document_id, large_text, start_char in large_chunks:
+        # Only whitespace preceded the LARGE chunk, so pad back to its offset
+        text = " " * (start_char or 0) + large_text
+        cursor.executemany(
+            "INSERT INTO document_text_blocks (document_id, block_index, data) VALUES (?, ?, ?)",
+            [(document_id, index, zlib.compress(text[start:start + DOCUMENT_TEXT_BLOCK_SIZE].encode('utf-8'),
+                                                DOCUMENT_TEXT_COMPRESSION_LEVEL))
+             for index, start in enumerate(range(0, len(text), DOCUMENT_TEXT_BLOCK_SIZE))]
+        )
+        
+        cursor.execute("""
+            SELECT id, content, start_char, end_char FROM chunks
+            WHERE document_id = ? AND tombstoned = 0 AND content IS NOT NULL
+        """, (document_id,))
+        chunk_ids = [(chunk_id,) for chunk_id, content, start, end in cursor.fetchall()
+                     if start is not None and end is not None and text[start:end] == content]
+        cursor.executemany("UPDATE chunks SET content = NULL WHERE id = ?", chunk_ids)
+        
+        converted += 1
+        references += len(chunk_ids)
+    
+    return converted, references
+
+
+
+def index_statute_sections(cursor):
+    """
+    Fill act_key / section (and the heading path in chunk_metadata) for
+    documents with stored text that have no indexed chunk yet.
+    
+    Returns the number of chunks indexed.
+    """
+    from pipeline.statutes import find_statute_sections, section_for_span, act_key
+    
+    cursor.execute("""
+        SELECT DISTINCT b.document_id FROM document_text_blocks b
+        WHERE NOT EXISTS (SELECT 1 FROM chunks c WHERE c.document_id = b.document_id AND c.act_key IS NOT NULL)
+    """)
+    document_ids = [row[0] for row in cursor.fetchall()]
+    
+    indexed = 0
+    for document_id in document_ids:
+        cursor.execute("SELECT data FROM document_text_blocks WHERE document_id = ? ORDER BY block_index",
+                       (document_id,))
+        text = "".join(zlib.decompress(row[0]).decode('utf-8') for row in cursor.fetchall())
+        sections = find_statute_sections(text)
+        if not sections:
+            continue
+        starts = [section.start for section in sections]
+        
+        cursor.execute("""
+            SELECT id, start_char, end_char, chunk_metadata FROM chunks
+            WHERE document_id = ? AND tombstoned = 0 AND chunk_type != 'L'
+        """, (document_id,))
+        updates = []
+        for chunk_id, start, end, chunk_metadata in cursor.fetchall():
+            section = section_for_span(sections, starts, start, end) if start is not None and end is not None else None
+            if section is None:
+                continue
+            metadata = json.loads(chunk_metadata) if chunk_metadata else {}
+            metadata.update(act=section.act, section=section.section, headings=section.headings)
+            updates.append((act_key(section.act), section.section, json.dumps(metadata), chunk_id))
+        
+        cursor.executemany("UPDATE chunks SET act_key = ?, section = ?, chunk_metadata = ? WHERE id = ?", updates)
+        indexed += len(updates)
+    
+    return indexed
+
+
 if __name__ == "__main__":
     print("="*60)
     print("Database Migration: Multi-Granularity Chunking Support")
@@ -2,3 +2,5 @@
 from .chunking import chunk_document, TextChunker
 from .ingestion import get_ingestion_pipeline, DocumentIngestion
 from .retrieval import get_retrieval_pipeline, HybridRetrieval
+from .streaming import StreamingIngestion, StreamItem
+from .jobs import get_ingestion_worker, IngestionWorker
@@ -5,20 +5,49 @@ Inspired by EduRank's pedagogical chunking strategy
 from typing import List, Tuple, Dict
 import sys
 import re
+import bisect
 sys.path.append('..')
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import CHUNK_SIZE, CHUNK_OVERLAP, STRUCTURE_AWARE_CHUNKING, STATUTE_SECTION_MAX_CHARS
 from models.chunk_types import ChunkType
+from .statutes import find_statute_sections, StatuteSection
+
+
+# Paragraph spans, trimmed of surrounding whitespace, found in one regex pass.
+# A paragraph is a run of text without a blank line ("\n\n"); the unrolled
+# pattern consumes whole lines at a time instead of single characters.
+_PARAGRAPH_RE = re.compile(r'\S[^\n]*(?:\n(?!\n)[^\n]*)*')
+_LINE_RE = re.compile(r'\S[^\n]*')
+_FIRST_WORD_RE = re.compile(r'\S+')
+
+# Transition words that make a paragraph continue the previous one
+_TRANSITION_WORDS = frozenset({
+    'however', 'therefore', 'moreover', 'furthermore',
+    'additionally', 'consequently', 'thus', 'hence',
+    'similarly', 'likewise', 'meanwhile', 'nevertheless'
+})
+
+Span = Tuple[int, int]
 
 
 class EnhancedChunker:
     """
     Multi-granularity text chunker with semantic paragraph merging
     Generates Small, Medium, and Large chunks for context-aware retrieval
+    
+    Chunking works on (start, end) spans of the original text: paragraphs
+    are found in one regex pass, merges combine spans, and chunk text is
+    only sliced out at the end, so offsets are exact.
+    
+    With structure_aware set, Markdown headings ("# Act", "## Section N: Title")
+    split paragraphs, and each section under a heading becomes one MEDIUM
+    chunk instead of being merged with its neighbours.
     """
     
-    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 structure_aware: bool = STRUCTURE_AWARE_CHUNKING):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.structure_aware = structure_aware
     
     def generate_multi_granularity_chunks(self, text: str) -> Dict[ChunkType, List[Tuple[str, int, int]]]:
         """
@@ -27,8 +56,17 @@ class EnhancedChunker:
         - MEDIUM: Semantically merged paragraphs (explanations)
         - LARGE: Full document (broad context)
         
-        Returns dict mapping ChunkType to list of (chunk_text, start_char, end_char)
+        Returns dict mapping ChunkType to list of (chunk_text, start_char, end_char),
+        with offsets into text (text[start_char:end_char] == chunk_text).
         """
+        spans_by_type = self.generate_multi_granularity_spans(text)
+        return {
+            chunk_type: [(text[start:end], start, end) for start, end in spans]
+            for chunk_type, spans in spans_by_type.items()
+        }
+    
+    def generate_multi_granularity_spans(self, text: str) -> Dict[ChunkType, List[Span]]:
+        """Same as generate_multi_granularity_chunks, as (start, end) spans only"""
         if not text or len(text.strip()) == 0:
             return {
                 ChunkType.SMALL: [],
@@ -36,44 +74,78 @@ class EnhancedChunker:
                 ChunkType.LARGE: []
             }
         
-        text = text.strip()
-        
         # Step 1: Split into paragraphs (SMALL chunks)
-        paragraphs = self._split_into_paragraphs(text)
-        small_chunks = self._create_chunk_tuples(paragraphs, text)
+        paragraphs = self._split_into_spans(text)
+        sections = find_statute_sections(text) if self.structure_aware else []
         
-        # Step 2: Semantic merging (MEDIUM chunks)
-        merged_paragraphs = self._semantic_merge(paragraphs)
-        medium_chunks = self._create_chunk_tuples(merged_paragraphs, text)
+        # Step 2: Semantic merging (MEDIUM chunks), within section boundaries if any
+        if sections:
+            paragraphs = self._split_at_headings(text, paragraphs, sections)
+            merged = self._section_spans(text, paragraphs, sections)
+        else:
+            merged = self._merge_spans(text, paragraphs)
         
-        # Step 3: Full document (LARGE chunk)
-        large_chunks = [(text, 0, len(text))]
+        # Step 3: Full document without surrounding whitespace (LARGE chunk)
+        large = [(paragraphs[0][0], paragraphs[-1][1])]
         
         return {
-            ChunkType.SMALL: small_chunks,
-            ChunkType.MEDIUM: medium_chunks,
-            ChunkType.LARGE: large_chunks
+            ChunkType.SMALL: paragraphs,
+            ChunkType.MEDIUM: merged,
+            ChunkType.LARGE: large
         }
     
-    def _split_into_paragraphs(self, text: str) -> List[str]:
+    def _split_into_spans(self, text: str) -> List[Span]:
         """
-        Split text into paragraphs based on double newlines.
+        Paragraph spans based on double newlines.
         This creates natural semantic boundaries.
         """
-        # Split on double newlines (paragraph boundaries)
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+        paragraphs = [match.span() for match in _PARAGRAPH_RE.finditer(text)]
         
         # If no double newlines, fall back to single newlines
         if len(paragraphs) <= 1:
-            paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
+            paragraphs = [match.span() for match in _LINE_RE.finditer(text)]
         
-        # If still no splits, treat as single paragraph
-        if len(paragraphs) == 0:
-            paragraphs = [text]
+        return [self._rstrip_span(text, start, end) for start, end in paragraphs]
+    
+    def _split_at_headings(self, text: str, paragraphs: List[Span], sections: List[StatuteSection]) -> List[Span]:
+        """Cut paragraphs where a heading starts mid-paragraph (no blank line before it)"""
+        starts = [section.start for section in sections]
+        result = []
+        for start, end in paragraphs:
+            for cut in starts[bisect.bisect_right(starts, start):bisect.bisect_left(starts, end)]:
+                piece = self._rstrip_span(text, start, cut)
+                if piece[1] > piece[0]:
+                    result.append(piece)
+                start = cut
+            result.append((start, end))
+        return result
+    
+    def _section_spans(self, text: str, paragraphs: List[Span], sections: List[StatuteSection]) -> List[Span]:
+        """
+        One MEDIUM span per heading, up to the next heading of any level (a
+        section's own text, without its subsections). Text before the first
+        heading and spans longer than STATUTE_SECTION_MAX_CHARS are merged by
+        paragraph.
+        """
+        starts = [section.start for section in sections]
+        groups = {}
+        for paragraph in paragraphs:
+            groups.setdefault(bisect.bisect_right(starts, paragraph[0]) - 1, []).append(paragraph)
         
-        return paragraphs
+        merged = []
+        for index, group in groups.items():
+            if index >= 0 and group[-1][1] - sections[index].start <= STATUTE_SECTION_MAX_CHARS:
+                merged.append((group[0][0], group[-1][1]))
+            else:
+                merged.extend(self._merge_spans(text, group))
+        return merged
     
-    def _semantic_merge(self, paragraphs: List[str]) -> List[str]:
+    def _rstrip_span(self, text: str, start: int, end: int) -> Span:
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+    
+    def _merge_spans(self, text: str, paragraphs: List[Span]) -> List[Span]:
         """
         Merge semantically related paragraphs using heuristic logic.
         
@@ -82,34 +154,29 @@ class EnhancedChunker:
         2. Merge if next paragraph starts with lowercase (continuation)
         3. Merge if next paragraph starts with conjunction/transition words
         
-        Future enhancement: Use LLM for semantic understanding
+        A merged chunk spans from the start of the first paragraph to the
+        end of the second. Future enhancement: Use LLM for semantic understanding
         """
         if len(paragraphs) <= 1:
-            return paragraphs
+            return list(paragraphs)
         
         merged = []
         i = 0
         
         while i < len(paragraphs):
-            current = paragraphs[i]
-            
             # Try to merge with next paragraph
-            if i + 1 < len(paragraphs):
-                next_p = paragraphs[i + 1]
-                
-                if self._should_merge(current, next_p):
-                    # Merge paragraphs with double space
-                    merged.append(current + "  " + next_p)
-                    i += 2
-                    continue
+            if i + 1 < len(paragraphs) and self._should_merge_spans(text, paragraphs[i], paragraphs[i + 1]):
+                merged.append((paragraphs[i][0], paragraphs[i + 1][1]))
+                i += 2
+                continue
             
             # No merge, add current paragraph
-            merged.append(current)
+            merged.append(paragraphs[i])
             i += 1
         
         return merged
     
-    def _should_merge(self, p1: str, p2: str) -> bool:
+    def _should_merge_spans(self, text: str, p1: Span, p2: Span) -> bool:
         """
         Determine if two paragraphs should be merged.
         
@@ -119,50 +186,26 @@ class EnhancedChunker:
         - p2 starts with transition words - related content
         """
         # Short paragraph heuristic
-        if len(p1) < 100:
+        if p1[1] - p1[0] < 100:
             return True
         
         # Lowercase continuation heuristic
-        if p2 and p2[0].islower():
+        if text[p2[0]].islower():
             return True
         
         # Transition word heuristic
-        transition_words = [
-            'however', 'therefore', 'moreover', 'furthermore',
-            'additionally', 'consequently', 'thus', 'hence',
-            'similarly', 'likewise', 'meanwhile', 'nevertheless'
-        ]
-        
-        first_word = p2.split()[0].lower().rstrip('.,;:') if p2.split() else ''
-        if first_word in transition_words:
-            return True
-        
-        return False
+        first_word = _FIRST_WORD_RE.match(text, p2[0], p2[1])
+        return bool(first_word) and first_word.group().lower().rstrip('.,;:') in _TRANSITION_WORDS
     
-    def _create_chunk_tuples(self, paragraphs: List[str], original_text: str) -> List[Tuple[str, int, int]]:
-        """
-        Create chunk tuples with (text, start_char, end_char) positions.
-        Positions are approximate based on finding text in original.
-        """
-        chunks = []
-        search_start = 0
-        
-        for para in paragraphs:
-            # Find paragraph position in original text
-            # Use first 50 chars for matching to handle minor whitespace differences
-            search_text = para[:50] if len(para) > 50 else para
-            
-            try:
-                start_pos = original_text.index(search_text, search_start)
-                end_pos = start_pos + len(para)
-                chunks.append((para, start_pos, end_pos))
-                search_start = end_pos
-            except ValueError:
-                # If exact match fails, use approximate position
-                chunks.append((para, search_start, search_start + len(para)))
-                search_start += len(para)
-        
-        return chunks
+    def _semantic_merge(self, paragraphs: List[str]) -> List[str]:
+        """String interface to _merge_spans for already split paragraphs"""
+        text = '\n\n'.join(paragraphs)
+        spans = []
+        offset = 0
+        for paragraph in paragraphs:
+            spans.append((offset, offset + len(paragraph)))
+            offset += len(paragraph) + 2
+        return [text[start:end] for start, end in self._merge_spans(text, spans)]
 
 
 class TextChunker:
@@ -2,20 +2,162 @@
 Document Ingestion Pipeline
 """
 import os
-import uuid
-from typing import List, Optional
-from pypdf import PdfReader
+import json
+import hashlib
+from contextlib import contextmanager
+from typing import List, Optional, Callable
 import sys
 sys.path.append('..')
-from config import DOCUMENTS_DIR
+from config import (DOCUMENTS_DIR, SEMANTIC_EDGE_THRESHOLD, SEMANTIC_BLOCK_SIZE, CROSS_DOC_SEMANTIC_K,
+                    INGEST_EMBED_BATCH_SIZE, STRUCTURE_AWARE_CHUNKING)
 from .chunking import chunk_document
+from .statutes import find_statute_sections, section_for_span, act_key
+from .pdf_extraction import PDFExtractor, ExtractedPDF
 from models import get_embeddings
-from storage import get_faiss_store, get_sqlite_store, get_knowledge_graph
+from storage import get_faiss_store, get_sqlite_store, get_knowledge_graph, get_persistence_manager
+
+
+class PreparedDocument:
+    """
+    A chunked document on its way through ingestion
+    """
+    
+    def __init__(self, doc_id: str, use_multi_granularity: bool = True):
+        self.doc_id = doc_id
+        self.use_multi_granularity = use_multi_granularity
+        self.chunk_rows = []
+        self.chunk_ids = []
+        self.chunk_texts = []
+        self.embed_chunk_ids = []
+        self.embed_chunk_texts = []
+        self.embeddings = []
+    
+    def add_chunk(self, row: dict, embed: bool = True):
+        self.chunk_rows.append(row)
+        self.chunk_ids.append(row["id"])
+        self.chunk_texts.append(row["content"])
+        if embed:
+            self.embed_chunk_ids.append(row["id"])
+            self.embed_chunk_texts.append(row["content"])
+    
+    def subset(self, chunk_ids) -> 'PreparedDocument':
+        """Copy restricted to the given chunk IDs, keeping document order"""
+        keep = set(chunk_ids)
+        embed = set(self.embed_chunk_ids)
+        subset = PreparedDocument(self.doc_id, self.use_multi_granularity)
+        for row in self.chunk_rows:
+            if row["id"] in keep:
+                subset.add_chunk(row, embed=row["id"] in embed)
+        return subset
+
+
+class DocumentVersion:
+    """
+    Result of looking a document up by content hash.
+    
+    status is one of:
+    - 'unchanged': the same text is already ingested; nothing is done
+    - 'updated':   an earlier version exists under the same filename; only
+                   new or changed chunks are embedded, removed ones are tombstoned
+    - 'created':   the document is new and indexed in full
+    """
+    
+    def __init__(self, doc_id: str, content_hash: str, status: str,
+                 previous_chunk_ids: Optional[List[str]] = None):
+        self.doc_id = doc_id
+        self.content_hash = content_hash
+        self.status = status
+        self.previous_chunk_ids = previous_chunk_ids or []
+        self.added_chunk_ids = []
+        self.kept_chunk_ids = []
+        self.removed_chunk_ids = []
+    
+    def to_dict(self) -> dict:
+        return {
+            "document_id": self.doc_id,
+            "status": self.status,
+            "chunks_added": len(self.added_chunk_ids),
+            "chunks_unchanged": len(self.kept_chunk_ids),
+            "chunks_removed": len(self.removed_chunk_ids)
+        }
+
+
+class BatchItem:
+    """
+    One document of an ingest_many() call and its per-stage outcome
+    """
+    
+    def __init__(self, doc: dict, use_multi_granularity: bool = True):
+        self.filepath = doc.get('filepath')
+        self.text = doc.get('text')
+        self.title = doc.get('title')
+        self.description = doc.get('description')
+        self.use_multi_granularity = doc.get('use_multi_granularity', use_multi_granularity)
+        self.filename = os.path.basename(self.filepath) if self.filepath else f"{self.title}.txt"
+        self.doc_type = 'txt'
+        self.extracted = None
+        self.version = None
+        self.prepared = None
+        self.new_chunks = None
+        self.duplicate_of = None  # Earlier item of the batch with the same text
+        self.error = None
+        self.failed_stage = None
+    
+    @property
+    def pending(self) -> bool:
+        """Still to be written: no error and not unchanged"""
+        return self.error is None and self.version is not None and self.version.status != 'unchanged'
+    
+    def read(self, ingestion: 'DocumentIngestion'):
+        if self.filepath:
+            self.text, extension, self.extracted = ingestion._read_file(self.filepath)
+            self.doc_type = extension[1:]
+            self.title = self.title or self.filename
+        elif not self.text or len(self.text.strip()) == 0:
+            raise ValueError("Empty text content")
+        elif not self.title:
+            raise ValueError("Text documents need a title")
+    
+    def fail(self, stage: str, error: Exception):
+        if self.error is None:
+            self.error = str(error)
+            self.failed_stage = stage
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Run a stage for this item, recording (not raising) its failure"""
+        try:
+            yield
+        except Exception as e:
+            self.fail(name, e)
+    
+    def result(self) -> dict:
+        result = {
+            "source": self.filepath or self.title,
+            "document_id": None,
+            "status": "failed",
+            "chunks_added": 0,
+            "chunks_unchanged": 0,
+            "chunks_removed": 0,
+            "error": self.error,
+            "failed_stage": self.failed_stage
+        }
+        if self.stored:
+            result.update(self.version.to_dict())
+        return result
+    
+    @property
+    def stored(self) -> bool:
+        """The document is in the stores (graph failures happen after it is stored)"""
+        return self.version is not None and (self.error is None or self.failed_stage == 'graph')
 
 
 class DocumentIngestion:
     """
     Pipeline for ingesting documents into the RAG system
+    
+    Documents and chunks are keyed by content hash, so re-ingesting a file
+    only touches the chunks that changed (see DocumentVersion).
     """
     
     def __init__(self):
@@ -23,9 +165,13 @@ class DocumentIngestion:
         self.faiss_store = get_faiss_store()
         self.sqlite_store = get_sqlite_store()
         self.knowledge_graph = get_knowledge_graph()
+        self.persistence = get_persistence_manager()
+        self.pdf_extractor = PDFExtractor()
+        self.last_version = None
     
     def ingest_file(self, filepath: str, title: Optional[str] = None, 
-                    description: Optional[str] = None, use_multi_granularity: bool = True) -> str:
+                    description: Optional[str] = None, use_multi_granularity: bool = True,
+                    on_stage: Optional[Callable[[str], None]] = None) -> str:
         """
         Ingest a single file into the RAG system.
         
@@ -34,19 +180,255 @@ class DocumentIngestion:
             title: Optional title
             description: Optional description
             use_multi_granularity: If True, use S/M/L chunking; if False, use legacy chunking
+            on_stage: Optional callback, called with the name of each stage
+                (extract, chunk, embed, persist, graph, save) as it starts
         
-        Returns document ID.
+        Returns document ID. Unchanged files return the existing document's ID.
         """
-        from models.chunk_types import ChunkType
-        from pipeline.chunking import chunk_document_multi_granularity
+        filename = os.path.basename(filepath)
+        self._notify(on_stage, 'extract')
+        text, extension, extracted = self._read_file(filepath)
+        
+        version = self._ingest_document(
+            text,
+            filename=filename,
+            filepath=filepath,
+            doc_type=extension[1:],
+            title=title or filename,
+            description=description,
+            use_multi_granularity=use_multi_granularity,
+            extracted=extracted,
+            on_stage=on_stage
+        )
+        return version.doc_id
+    
+    def ingest_text(self, text: str, title: str, description: Optional[str] = None,
+                    use_multi_granularity: bool = True) -> str:
+        """
+        Ingest raw text content.
+        
+        Args:
+            text: Text content
+            title: Document title
+            description: Optional description
+            use_multi_granularity: If True, use S/M/L chunking
+        
+        Returns document ID. Unchanged text returns the existing document's ID.
+        """
+        if not text or len(text.strip()) == 0:
+            raise ValueError("Empty text content")
+        
+        version = self._ingest_document(
+            text,
+            filename=f"{title}.txt",
+            doc_type='txt',
+            title=title,
+            description=description,
+            use_multi_granularity=use_multi_granularity
+        )
+        return version.doc_id
+    
+    def ingest_many(self, docs: List[dict], use_multi_granularity: bool = True) -> List[dict]:
+        """
+        Ingest many documents with shared embedding requests and a single persist.
+        
+        Each doc is a dict with either 'filepath' or 'text' + 'title', and
+        optionally 'title', 'description' and 'use_multi_granularity'.
+        
+        All documents are chunked first, then embedded in cross-document
+        batches of INGEST_EMBED_BATCH_SIZE texts, written to SQLite in one
+        transaction, and the vector store and graph are saved once at the end.
+        A failing document is reported with its error and the stage it failed
+        in; the rest of the batch still completes. A text repeated within the
+        batch is ingested once; the repeats are reported 'unchanged' with its
+        document ID once it is stored, or failed with it.
+        
+        Returns one result dict per input document, in order.
+        """
+        items = [BatchItem(doc, use_multi_granularity) for doc in docs]
+        
+        # Read, resolve versions and chunk
+        seen_hashes, seen_filenames = {}, set()  # Content hash -> first item with that text
+        for item in items:
+            with item.stage('extract'):
+                item.read(self)
+            if item.error:
+                continue
+            with item.stage('chunk'):
+                if item.filename in seen_filenames:
+                    raise ValueError(f"Duplicate filename in batch: {item.filename}")
+                seen_filenames.add(item.filename)
+                
+                version = self._resolve_version(item.text, item.filename)
+                if version.status != 'unchanged' and version.content_hash in seen_hashes:
+                    # Same text earlier in this batch: resolved once that item is written
+                    item.duplicate_of = seen_hashes[version.content_hash]
+                    continue
+                seen_hashes.setdefault(version.content_hash, item)
+                
+                if version.status != 'unchanged':
+                    item.prepared = self._prepare_chunks(version.doc_id, item.text,
+                                                         item.use_multi_granularity, item.extracted)
+                    item.new_chunks = self._diff_chunks(version, item.prepared)
+                item.version = version
+        
+        pending = [item for item in items if item.pending]
+        self._embed_many(pending)
+        
+        # One transaction for all document and chunk rows
+        pending = [item for item in items if item.pending]
+        try:
+            with self.sqlite_store.transaction():
+                self._write_many(pending)
+        except Exception:
+            # Isolate the failing document(s): retry each in its own transaction
+            for item in pending:
+                with item.stage('persist'):
+                    with self.sqlite_store.transaction():
+                        self._write_many([item])
+        
+        stored = [item for item in items if item.pending]
+        with self.persistence.lock:
+            for item in stored:
+                self._drop_removed_chunks(item.version)
+                self._add_vectors(item.new_chunks)
+            for item in stored:
+                with item.stage('graph'):
+                    self._link_chunks(item.prepared, item.new_chunks)
+        
+        for item in items:
+            first = item.duplicate_of
+            if first is None:
+                continue
+            if first.stored:
+                item.version = DocumentVersion(first.version.doc_id, first.version.content_hash, 'unchanged')
+            else:
+                item.fail(first.failed_stage, ValueError(
+                    f"Same text as {first.filepath or first.title}, which failed: {first.error}"))
+        
+        # Vector store and graph are flushed by the persistence manager
+        self.persistence.notify()
+        
+        return [item.result() for item in items]
+    
+    def _embed_many(self, items: List['BatchItem']):
+        """
+        Embed new chunks of all items in cross-document batches.
+        If a shared request fails, its documents are retried on their own,
+        so one bad document does not fail its neighbours.
+        """
+        texts, owners = [], []
+        for item in items:
+            texts.extend(item.new_chunks.embed_chunk_texts)
+            owners.extend([item] * len(item.new_chunks.embed_chunk_texts))
+        
+        vectors = {item: [] for item in items}
+        retry = []
+        for start in range(0, len(texts), INGEST_EMBED_BATCH_SIZE):
+            batch_owners = owners[start:start + INGEST_EMBED_BATCH_SIZE]
+            try:
+                embeddings = self._embed_texts(texts[start:start + INGEST_EMBED_BATCH_SIZE])
+            except Exception:
+                retry.extend(item for item in dict.fromkeys(batch_owners) if item not in retry)
+                continue
+            for item, embedding in zip(batch_owners, embeddings):
+                vectors[item].append(embedding)
         
+        for item in retry:
+            with item.stage('embed'):
+                texts = item.new_chunks.embed_chunk_texts
+                vectors[item] = [embedding for start in range(0, len(texts), INGEST_EMBED_BATCH_SIZE)
+                                 for embedding in self._embed_texts(texts[start:start + INGEST_EMBED_BATCH_SIZE])]
+        
+        for item in items:
+            if item.pending:
+                item.new_chunks.embeddings = vectors[item]
+    
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.embeddings.embed_batch(texts)
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+    
+    def _write_many(self, items: List['BatchItem']):
+        """SQLite writes for several documents (call inside a transaction)"""
+        rows = []
+        for item in items:
+            self._write_document(item.version, item.text, item.filename, item.filepath, item.doc_type,
+                                 item.title, item.description)
+            self._update_chunk_rows(item.version, item.prepared)
+            rows.extend(item.new_chunks.chunk_rows)
+        self.sqlite_store.add_chunks_bulk(rows)
+    
+    def _ingest_document(self, text: str, filename: str, filepath: Optional[str] = None,
+                         doc_type: Optional[str] = None, title: Optional[str] = None,
+                         description: Optional[str] = None, use_multi_granularity: bool = True,
+                         extracted: Optional[ExtractedPDF] = None,
+                         on_stage: Optional[Callable[[str], None]] = None) -> DocumentVersion:
+        """Ingest one document incrementally and persist the stores"""
+        self._notify(on_stage, 'chunk')
+        version = self._resolve_version(text, filename)
+        self.last_version = version
+        
+        # Same text already ingested: one indexed lookup, nothing else
+        if version.status == 'unchanged':
+            return version
+        
+        prepared = self._prepare_chunks(version.doc_id, text, use_multi_granularity, extracted)
+        new_chunks = self._diff_chunks(version, prepared)
+        
+        self._notify(on_stage, 'embed')
+        self._embed_chunks(new_chunks)
+        
+        self._notify(on_stage, 'persist')
+        with self.sqlite_store.transaction():
+            self._write_document(version, text, filename, filepath, doc_type, title, description)
+            self._update_chunk_rows(version, prepared)
+            self.sqlite_store.add_chunks_bulk(new_chunks.chunk_rows)
+        with self.persistence.lock:
+            self._drop_removed_chunks(version)
+            self._add_vectors(new_chunks)
+            
+            self._notify(on_stage, 'graph')
+            self._link_chunks(prepared, new_chunks)
+        
+        # Vector store and graph are flushed by the persistence manager (write-behind)
+        self._notify(on_stage, 'save')
+        self.persistence.notify()
+        
+        return version
+    
+    def delete_document(self, doc_id: str) -> int:
+        """
+        Delete a document with its chunks, vectors and graph nodes.
+        Returns the number of chunks removed (0 if the document is unknown).
+        """
+        with self.persistence.lock:
+            chunk_ids = self.knowledge_graph.remove_document(doc_id)
+            self.faiss_store.remove(chunk_ids)
+        self.sqlite_store.delete_document(doc_id)
+        self.persistence.notify()
+        return len(chunk_ids)
+    
+    def _notify(self, on_stage: Optional[Callable[[str], None]], stage: str):
+        if on_stage is not None:
+            on_stage(stage)
+    
+    def _read_file(self, filepath: str):
+        """
+        Extract text from a supported file.
+        
+        Returns (text, extension, extracted) where extracted is the
+        ExtractedPDF for PDFs and None otherwise.
+        """
         # Determine file type
-        filename = os.path.basename(filepath)
-        extension = os.path.splitext(filename)[1].lower()
+        extension = os.path.splitext(filepath)[1].lower()
         
         # Extract text based on file type
+        extracted = None
         if extension == '.pdf':
-            text = self._extract_pdf(filepath)
+            extracted = self._extract_pdf(filepath)
+            text = extracted.text
         elif extension in ['.txt', '.md']:
             with open(filepath, 'r', encoding='utf-8') as f:
                 text = f.read()
@@ -56,252 +438,318 @@ class DocumentIngestion:
         if not text or len(text.strip()) == 0:
             raise ValueError("No text content found in file")
         
-        # Generate document ID
-        doc_id = str(uuid.uuid4())[:8]
+        return text, extension, extracted
+    
+    def _resolve_version(self, text: str, filename: str) -> DocumentVersion:
+        """Look a document up by content hash, then by filename"""
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
         
-        # Store document metadata
-        self.sqlite_store.add_document(
-            doc_id=doc_id,
-            filename=filename,
-            filepath=filepath,
-            doc_type=extension[1:],
-            title=title or filename,
-            description=description
-        )
+        existing = self.sqlite_store.get_document_by_hash(content_hash)
+        if existing:
+            return DocumentVersion(existing.id, content_hash, 'unchanged')
+        
+        previous = self.sqlite_store.get_document_by_filename(filename)
+        if previous:
+            return DocumentVersion(previous.id, content_hash, 'updated',
+                                   self.sqlite_store.get_live_chunk_ids(previous.id))
+        
+        doc_id = hashlib.sha256(f"{filename}\0{content_hash}".encode('utf-8')).hexdigest()[:12]
+        return DocumentVersion(doc_id, content_hash, 'created')
+    
+    def _diff_chunks(self, version: DocumentVersion, prepared: PreparedDocument) -> PreparedDocument:
+        """
+        Split a prepared document against its previous version.
+        Returns the chunks that must be embedded and stored.
+        """
+        previous = set(version.previous_chunk_ids)
+        current = set(prepared.chunk_ids)
+        
+        version.added_chunk_ids = [cid for cid in prepared.chunk_ids if cid not in previous]
+        version.kept_chunk_ids = [cid for cid in prepared.chunk_ids if cid in previous]
+        version.removed_chunk_ids = [cid for cid in version.previous_chunk_ids if cid not in current]
+        
+        if version.status == 'created':
+            return prepared
+        return prepared.subset(version.added_chunk_ids)
+    
+    def _write_document(self, version: DocumentVersion, text: str, filename: str, filepath: Optional[str],
+                        doc_type: Optional[str], title: Optional[str], description: Optional[str]):
+        """Add the document row, or point an existing one at the new content, and store its text"""
+        if version.status == 'created':
+            self.sqlite_store.add_document(
+                doc_id=version.doc_id,
+                filename=filename,
+                filepath=filepath,
+                doc_type=doc_type,
+                title=title or filename,
+                description=description,
+                content_hash=version.content_hash
+            )
+        else:
+            self.sqlite_store.update_document(
+                version.doc_id,
+                content_hash=version.content_hash,
+                filepath=filepath,
+                title=title or filename,
+                description=description
+            )
+        self.sqlite_store.set_document_text(version.doc_id, text)
+    
+    def _update_chunk_rows(self, version: DocumentVersion, prepared: PreparedDocument):
+        """Tombstone removed chunk rows and move surviving ones to their new positions (inside the transaction)"""
+        if version.status != 'updated':
+            return
+        
+        kept = set(version.kept_chunk_ids)
+        self.sqlite_store.update_chunks_bulk([row for row in prepared.chunk_rows if row["id"] in kept])
+        self.sqlite_store.tombstone_chunks(version.removed_chunk_ids)
+    
+    def _drop_removed_chunks(self, version: DocumentVersion):
+        """Drop removed chunks from the vector store and graph (after the SQLite commit)"""
+        if version.status != 'updated':
+            return
+        
+        self.faiss_store.remove(version.removed_chunk_ids)
+        self.knowledge_graph.remove_chunks(version.removed_chunk_ids)
+        
+        # Sequential and keyword edges are rebuilt for the whole document
+        self.knowledge_graph.remove_edges_among(version.kept_chunk_ids)
+    
+    def _prepare_chunks(self, doc_id: str, text: str, use_multi_granularity: bool = True,
+                        extracted: Optional[ExtractedPDF] = None) -> PreparedDocument:
+        """Chunk a document's text into rows, without touching any store"""
+        from models.chunk_types import ChunkType
+        from pipeline.chunking import chunk_document_multi_granularity
+        
+        prepared = PreparedDocument(doc_id, use_multi_granularity)
+        seen_hashes = {}
         
         if use_multi_granularity:
             # Multi-granularity chunking
             chunks_by_type = chunk_document_multi_granularity(text)
             
-            all_chunk_ids = []
-            all_chunk_texts = []
-            embed_chunk_ids = []
-            embed_chunk_texts = []
-            
             chunk_counter = 0
             
             # Process each chunk type
             for chunk_type, chunks in chunks_by_type.items():
                 for chunk_text, start_char, end_char in chunks:
-                    chunk_id = f"{doc_id}_chunk_{chunk_counter}_{chunk_type.value}"
+                    chunk_hash = self._chunk_hash(chunk_text, chunk_type.value)
+                    chunk_id = f"{doc_id}_chunk_{self._chunk_key(chunk_hash, seen_hashes)}_{chunk_type.value}"
                     
-                    # Store chunk metadata
-                    self.sqlite_store.add_chunk(
-                        chunk_id=chunk_id,
-                        document_id=doc_id,
-                        content=chunk_text,
-                        chunk_index=chunk_counter,
-                        chunk_type=chunk_type.value,
-                        start_char=start_char,
-                        end_char=end_char
+                    prepared.add_chunk(
+                        self._chunk_row(
+                            chunk_id, doc_id, chunk_text, chunk_counter,
+                            chunk_type.value, start_char, end_char,
+                            self._page_metadata(extracted, start_char, end_char),
+                            chunk_hash
+                        ),
+                        # Only embed S and M chunks (L chunks are for context only)
+                        embed=chunk_type in [ChunkType.SMALL, ChunkType.MEDIUM]
                     )
                     
-                    all_chunk_ids.append(chunk_id)
-                    all_chunk_texts.append(chunk_text)
-                    
-                    # Only embed S and M chunks (L chunks are for context only)
-                    if chunk_type in [ChunkType.SMALL, ChunkType.MEDIUM]:
-                        embed_chunk_ids.append(chunk_id)
-                        embed_chunk_texts.append(chunk_text)
-                    
                     chunk_counter += 1
-            
-            # Generate embeddings for S and M chunks only
-            if embed_chunk_texts:
-                embeddings = self.embeddings.embed_batch(embed_chunk_texts)
-                self.faiss_store.add_batch(embed_chunk_ids, embeddings)
-            
-            # Build knowledge graph
-            self.knowledge_graph.add_sequential_edges(all_chunk_ids, doc_id)
-            
-            # Add keyword-based relations (deterministic)
-            self.knowledge_graph.add_keyword_relations(all_chunk_ids, all_chunk_texts, doc_id)
-            
-            # Add semantic edges for embedded chunks
-            if embed_chunk_texts and len(embed_chunk_texts) > 1:
-                self._add_semantic_edges(embed_chunk_ids, embeddings)
         
         else:
             # Legacy chunking (backward compatibility)
             chunks = chunk_document(text)
             
-            chunk_ids = []
-            chunk_texts = []
-            
             for i, (chunk_text, start_char, end_char) in enumerate(chunks):
-                chunk_id = f"{doc_id}_chunk_{i}"
-                chunk_ids.append(chunk_id)
-                chunk_texts.append(chunk_text)
+                chunk_hash = self._chunk_hash(chunk_text, 'M')
+                chunk_id = f"{doc_id}_chunk_{self._chunk_key(chunk_hash, seen_hashes)}"
                 
-                # Store chunk metadata
-                self.sqlite_store.add_chunk(
-                    chunk_id=chunk_id,
-                    document_id=doc_id,
-                    content=chunk_text,
-                    chunk_index=i,
-                    chunk_type='M',  # Default to medium
-                    start_char=start_char,
-                    end_char=end_char
-                )
-            
-            # Generate embeddings
-            embeddings = self.embeddings.embed_batch(chunk_texts)
-            
-            # Add to FAISS
-            self.faiss_store.add_batch(chunk_ids, embeddings)
-            
-            # Build graph
-            self.knowledge_graph.add_sequential_edges(chunk_ids, doc_id)
-            self._add_semantic_edges(chunk_ids, embeddings)
+                prepared.add_chunk(self._chunk_row(
+                    chunk_id, doc_id, chunk_text, i,
+                    'M', start_char, end_char,  # Default to medium
+                    self._page_metadata(extracted, start_char, end_char),
+                    chunk_hash
+                ))
+        
+        # Chunks that are exact spans of the text are stored as references to it
+        for row in prepared.chunk_rows:
+            row["content_ref"] = text[row["start_char"]:row["end_char"]] == row["content"]
         
-        # Persist all stores
-        self.faiss_store.save()
-        self.knowledge_graph.save()
+        if use_multi_granularity and STRUCTURE_AWARE_CHUNKING:
+            self._add_section_metadata(prepared, text)
         
-        return doc_id
+        return prepared
     
-    def ingest_text(self, text: str, title: str, description: Optional[str] = None,
-                    use_multi_granularity: bool = True) -> str:
+    def _add_section_metadata(self, prepared: PreparedDocument, text: str):
+        """Tag chunks inside a statute section with its act, number and heading path"""
+        sections = find_statute_sections(text)
+        starts = [section.start for section in sections]
+        
+        for row in prepared.chunk_rows:
+            section = section_for_span(sections, starts, row["start_char"], row["end_char"])
+            if section is None:
+                continue
+            
+            metadata = json.loads(row["chunk_metadata"]) if row["chunk_metadata"] else {}
+            metadata.update(act=section.act, section=section.section, headings=section.headings)
+            row["chunk_metadata"] = json.dumps(metadata)
+            row["act_key"] = act_key(section.act)
+            row["section"] = section.section
+    
+    def _embed_chunks(self, prepared: PreparedDocument):
+        """Generate embeddings (S and M chunks only for multi-granularity)"""
+        if prepared.embed_chunk_texts:
+            prepared.embeddings = self.embeddings.embed_batch(prepared.embed_chunk_texts)
+    
+    def _add_vectors(self, prepared: PreparedDocument):
+        if prepared.embeddings:
+            self.faiss_store.add_batch(prepared.embed_chunk_ids, prepared.embeddings)
+    
+    def _link_chunks(self, prepared: PreparedDocument, new_chunks: Optional[PreparedDocument] = None):
         """
-        Ingest raw text content.
+        Build knowledge graph edges for a stored document.
+        Semantic edges are only computed for pairs with a chunk in new_chunks
+        (defaults to all chunks); new chunks are compared with unchanged ones
+        through their stored vectors, and unchanged pairs keep their edges.
+        """
+        new_chunks = new_chunks or prepared
         
-        Args:
-            text: Text content
-            title: Document title
-            description: Optional description
-            use_multi_granularity: If True, use S/M/L chunking
+        self.knowledge_graph.add_sequential_edges(prepared.chunk_ids, prepared.doc_id)
         
-        Returns document ID.
+        # Add keyword-based relations (deterministic). LARGE chunks share
+        # nearly every keyword of their document, so they are left out.
+        if prepared.use_multi_granularity:
+            keyword_chunks = [(row['id'], row['content']) for row in prepared.chunk_rows
+                              if row['chunk_type'] != 'L']
+            self.knowledge_graph.add_keyword_relations(
+                [chunk_id for chunk_id, _ in keyword_chunks],
+                [text for _, text in keyword_chunks],
+                prepared.doc_id
+            )
+        
+        # Add semantic edges for embedded chunks
+        if new_chunks is prepared:
+            self._add_semantic_edges(prepared.embed_chunk_ids, prepared.embeddings)
+        elif new_chunks.embed_chunk_ids:
+            self._add_semantic_edges(*self._document_vectors(prepared, new_chunks),
+                                     new_chunk_ids=set(new_chunks.embed_chunk_ids))
+        
+        # Link to related chunks of other documents via the vector index
+        if CROSS_DOC_SEMANTIC_K > 0 and new_chunks.embed_chunk_ids:
+            self._add_cross_document_edges(new_chunks, exclude=set(prepared.embed_chunk_ids))
+    
+    def _document_vectors(self, prepared: PreparedDocument, new_chunks: PreparedDocument):
         """
-        from models.chunk_types import ChunkType
-        from pipeline.chunking import chunk_document_multi_granularity
+        Embedded chunk IDs of a re-ingested document in document order, with
+        fresh vectors for new chunks and stored ones for unchanged chunks.
+        """
+        import numpy as np
         
-        if not text or len(text.strip()) == 0:
-            raise ValueError("Empty text content")
+        new_vectors = dict(zip(new_chunks.embed_chunk_ids, new_chunks.embeddings))
+        kept_ids, kept_vectors = self.faiss_store.get_vectors(
+            [chunk_id for chunk_id in prepared.embed_chunk_ids if chunk_id not in new_vectors])
+        vectors = dict(zip(kept_ids, kept_vectors))
+        vectors.update(new_vectors)
         
-        doc_id = str(uuid.uuid4())[:8]
+        chunk_ids = [chunk_id for chunk_id in prepared.embed_chunk_ids if chunk_id in vectors]
+        return chunk_ids, np.asarray([vectors[chunk_id] for chunk_id in chunk_ids], dtype=np.float32)
+    
+    def _chunk_hash(self, chunk_text: str, chunk_type: str) -> str:
+        return hashlib.sha1(f"{chunk_type}\0{chunk_text}".encode('utf-8')).hexdigest()
+    
+    def _chunk_key(self, chunk_hash: str, seen_hashes: dict) -> str:
+        """Short content key for a chunk ID; repeated paragraphs get a counter"""
+        key = chunk_hash[:12]
+        occurrence = seen_hashes.get(key, 0)
+        seen_hashes[key] = occurrence + 1
+        return f"{key}_{occurrence}" if occurrence else key
+    
+    def _chunk_row(self, chunk_id: str, document_id: str, content: str, chunk_index: int,
+                   chunk_type: str, start_char: int, end_char: int,
+                   chunk_metadata: Optional[str] = None, content_hash: Optional[str] = None) -> dict:
+        """Build a row for SQLiteStore.add_chunks_bulk"""
+        return {
+            "id": chunk_id,
+            "document_id": document_id,
+            "content": content,
+            "chunk_index": chunk_index,
+            "chunk_type": chunk_type,
+            "start_char": start_char,
+            "end_char": end_char,
+            "chunk_metadata": chunk_metadata,
+            "content_hash": content_hash,
+            "act_key": None,
+            "section": None
+        }
+    
+    def _page_metadata(self, extracted: Optional[ExtractedPDF],
+                       start_char: int, end_char: int) -> Optional[str]:
+        """JSON chunk metadata with the PDF pages a chunk spans"""
+        if extracted is None or not extracted.page_spans:
+            return None
         
-        # Store document metadata
-        self.sqlite_store.add_document(
-            doc_id=doc_id,
-            filename=f"{title}.txt",
-            doc_type='txt',
-            title=title,
-            description=description
-        )
+        first_page, last_page = extracted.pages_for_span(start_char, end_char)
+        return json.dumps({"pages": [first_page, last_page]})
+    
+    def _extract_pdf(self, filepath: str) -> ExtractedPDF:
+        """Extract text from PDF (page ranges in parallel for large files)"""
+        extracted = self.pdf_extractor.extract(filepath)
+        if extracted.error:
+            raise ValueError(f"Failed to read PDF: {extracted.error}")
+        return extracted
+    
+    def _add_semantic_edges(self, chunk_ids: List[str], embeddings: List[List[float]],
+                            new_chunk_ids: Optional[set] = None):
+        """
+        Add semantic similarity edges between chunks of one document.
         
-        if use_multi_granularity:
-            # Multi-granularity chunking
-            chunks_by_type = chunk_document_multi_granularity(text)
-            
-            all_chunk_ids = []
-            all_chunk_texts = []
-            embed_chunk_ids = []
-            embed_chunk_texts = []
-            
-            chunk_counter = 0
-            
-            for chunk_type, chunks in chunks_by_type.items():
-                for chunk_text, start_char, end_char in chunks:
-                    chunk_id = f"{doc_id}_chunk_{chunk_counter}_{chunk_type.value}"
-                    
-                    self.sqlite_store.add_chunk(
-                        chunk_id=chunk_id,
-                        document_id=doc_id,
-                        content=chunk_text,
-                        chunk_index=chunk_counter,
-                        chunk_type=chunk_type.value,
-                        start_char=start_char,
-                        end_char=end_char
-                    )
-                    
-                    all_chunk_ids.append(chunk_id)
-                    all_chunk_texts.append(chunk_text)
-                    
-                    if chunk_type in [ChunkType.SMALL, ChunkType.MEDIUM]:
-                        embed_chunk_ids.append(chunk_id)
-                        embed_chunk_texts.append(chunk_text)
-                    
-                    chunk_counter += 1
-            
-            # Embed S and M chunks
-            if embed_chunk_texts:
-                embeddings = self.embeddings.embed_batch(embed_chunk_texts)
-                self.faiss_store.add_batch(embed_chunk_ids, embeddings)
-            
-            # Build graph
-            self.knowledge_graph.add_sequential_edges(all_chunk_ids, doc_id)
-            self.knowledge_graph.add_keyword_relations(all_chunk_ids, all_chunk_texts, doc_id)
-            
-            if embed_chunk_texts and len(embed_chunk_texts) > 1:
-                self._add_semantic_edges(embed_chunk_ids, embeddings)
+        chunk_ids are in document order. Only pairs with at least one chunk in
+        new_chunk_ids (defaults to all) are linked: pairs of unchanged chunks
+        keep the edges they already have.
         
-        else:
-            # Legacy chunking
-            chunks = chunk_document(text)
-            
-            chunk_ids = []
-            chunk_texts = []
-            
-            for i, (chunk_text, start_char, end_char) in enumerate(chunks):
-                chunk_id = f"{doc_id}_chunk_{i}"
-                chunk_ids.append(chunk_id)
-                chunk_texts.append(chunk_text)
-                
-                self.sqlite_store.add_chunk(
-                    chunk_id=chunk_id,
-                    document_id=doc_id,
-                    content=chunk_text,
-                    chunk_index=i,
-                    chunk_type='M',
-                    start_char=start_char,
-                    end_char=end_char
-                )
-            
-            embeddings = self.embeddings.embed_batch(chunk_texts)
-            self.faiss_store.add_batch(chunk_ids, embeddings)
-            self.knowledge_graph.add_sequential_edges(chunk_ids, doc_id)
-            self._add_semantic_edges(chunk_ids, embeddings)
-        
-        # Persist
-        self.faiss_store.save()
-        self.knowledge_graph.save()
-        
-        return doc_id
-    
-    def _extract_pdf(self, filepath: str) -> str:
-        """Extract text from PDF"""
-        reader = PdfReader(filepath)
-        text_parts = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
-        return '\n'.join(text_parts)
-    
-    def _add_semantic_edges(self, chunk_ids: List[str], embeddings: List[List[float]]):
-        """Add semantic similarity edges between chunks"""
+        Similarities are computed in row blocks of SEMANTIC_BLOCK_SIZE new
+        chunks, so memory is bounded by block x n and pairs are thresholded
+        with a mask + argwhere instead of a Python double loop. When every
+        chunk is new only the upper triangle is computed.
+        """
         import numpy as np
         
         if len(chunk_ids) < 2:
             return
         
-        # Calculate cosine similarity between embeddings
-        emb_matrix = np.array(embeddings)
+        emb_matrix = np.asarray(embeddings, dtype=np.float32)
         norms = np.linalg.norm(emb_matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
         normalized = emb_matrix / norms
-        similarity_matrix = np.dot(normalized, normalized.T)
-        
-        # Add edges for high similarity pairs
-        for i in range(len(chunk_ids)):
-            for j in range(i + 2, len(chunk_ids)):  # Skip adjacent chunks
-                similarity = similarity_matrix[i][j]
-                if similarity > 0.75:  # Threshold
-                    self.knowledge_graph.add_semantic_edge(
-                        chunk_ids[i], 
-                        chunk_ids[j], 
-                        float(similarity)
-                    )
+        
+        if new_chunk_ids is None:
+            is_new = np.ones(len(chunk_ids), dtype=bool)
+        else:
+            is_new = np.array([chunk_id in new_chunk_ids for chunk_id in chunk_ids], dtype=bool)
+        new_rows = np.flatnonzero(is_new)
+        all_new = bool(is_new.all())
+        
+        edges = []
+        for start in range(0, len(new_rows), SEMANTIC_BLOCK_SIZE):
+            rows = new_rows[start:start + SEMANTIC_BLOCK_SIZE]
+            # With unchanged chunks every column is scanned; otherwise columns from the block onward
+            first = int(rows[0]) if all_new else 0
+            similarities = np.dot(normalized[rows], normalized[first:].T)
+            
+            # Keep j >= i + 2 (skips self and adjacent chunks), and j <= i - 2 for unchanged j
+            offsets = np.arange(first, len(chunk_ids))[None, :] - rows[:, None]
+            linked = (offsets >= 2) | ((offsets <= -2) & ~is_new[first:][None, :])
+            for i, j in np.argwhere(linked & (similarities > SEMANTIC_EDGE_THRESHOLD)):
+                row, column = int(rows[i]), first + int(j)
+                edges.append((chunk_ids[min(row, column)], chunk_ids[max(row, column)], float(similarities[i, j])))
+        
+        self.knowledge_graph.add_semantic_edges(edges)
+    
+    def _add_cross_document_edges(self, chunks: PreparedDocument, exclude: set):
+        """
+        Add semantic edges from each new chunk to its CROSS_DOC_SEMANTIC_K
+        nearest chunks of other documents: one batched k-NN query, O(n * k) edges.
+        """
+        neighbors = self.faiss_store.search_batch(chunks.embeddings, CROSS_DOC_SEMANTIC_K, exclude=exclude)
+        self.knowledge_graph.add_semantic_edges(
+            (chunk_id, other_id, similarity)
+            for chunk_id, hits in zip(chunks.embed_chunk_ids, neighbors)
+            for other_id, similarity in hits
+            if similarity > SEMANTIC_EDGE_THRESHOLD
+        )
     
     def get_stats(self) -> dict:
         """Get ingestion statistics"""
@@ -310,7 +758,9 @@ class DocumentIngestion:
             "chunks": self.sqlite_store.count_chunks(),
             "vectors": self.faiss_store.count(),
             "graph_nodes": self.knowledge_graph.node_count(),
-            "graph_edges": self.knowledge_graph.edge_count()
+            "graph_edges": self.knowledge_graph.edge_count(),
+            "graph_cache": self.knowledge_graph.neighborhood_cache.get_stats(),
+            "persistence": self.persistence.get_stats()
         }
 
 
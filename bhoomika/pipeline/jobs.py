@@ -0,0 +1,226 @@
+"""
+Ingestion Job Worker
+Runs queued file ingestions one at a time in a background thread
+"""
+import os
+import shutil
+import time
+import threading
+from typing import Optional
+import sys
+sys.path.append('..')
+from config import (INGEST_UPLOAD_DIR, INGEST_JOB_POLL_SECONDS, INGEST_JOB_HEARTBEAT_SECONDS,
+                    INGEST_WRITER_LOCK_PATH)
+from .ingestion import DocumentIngestion, get_ingestion_pipeline
+from storage.job_store import JobStore, IngestionJob, get_job_store
+
+
+class StageTracker:
+    """Turns on_stage callbacks into per-stage progress on a job"""
+    
+    def __init__(self, job_store: JobStore, job: IngestionJob, progress: dict):
+        self.job_store = job_store
+        self.job = job
+        self.progress = progress
+        self.current = None
+        self.started = None
+    
+    def start_stage(self, stage: str):
+        self._finish_current()
+        self.current = stage
+        self.started = time.perf_counter()
+        self.progress[stage] = {"status": "running"}
+        self.job_store.update_progress(self.job, stage, self.progress)
+    
+    def finish(self, failed: bool = False):
+        """Close the running stage; stages never reached are marked skipped"""
+        self._finish_current("failed" if failed else "done")
+        for stage, state in self.progress.items():
+            if state["status"] == "pending":
+                state["status"] = "skipped"
+        self.job_store.update_progress(self.job, None, self.progress)
+    
+    def _finish_current(self, status: str = "done"):
+        if self.current is not None:
+            self.progress[self.current] = {
+                "status": status,
+                "seconds": round(time.perf_counter() - self.started, 3)
+            }
+            self.current = None
+
+
+class WriterLock:
+    """
+    Exclusive lock on a file, held for the life of the one process that
+    writes the stores. The lock is released by the OS if the process dies.
+    """
+    
+    def __init__(self, path: str = INGEST_WRITER_LOCK_PATH):
+        self.path = path
+        self._file = None
+    
+    def acquire(self) -> bool:
+        """Take the lock without waiting. False if another process holds it."""
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        f = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.truncate(0)
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+    
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # Closing the file drops the lock
+            self._file = None
+
+
+class IngestionWorker:
+    """
+    Single-writer ingestion worker.
+    
+    Uploads are queued in the job store and processed in order by one
+    thread, so concurrent uploads never interleave writes to the shared
+    vector store, SQLite session and knowledge graph. Other writers
+    (e.g. synchronous text ingestion) take writer_lock for the same reason.
+    
+    A second thread refreshes the heartbeat of the running job and puts
+    jobs of workers that died mid-run back in the queue.
+    
+    One server process only: every process holds its own in-memory vector
+    store and graph, and saving them overwrites the files written by the
+    others, so two writing processes lose each other's updates. start()
+    takes an exclusive lock on INGEST_WRITER_LOCK_PATH and raises if
+    another process holds it, which fails the startup of a second uvicorn
+    worker (run with --workers 1).
+    """
+    
+    def __init__(self, job_store: Optional[JobStore] = None,
+                 ingestion: Optional[DocumentIngestion] = None,
+                 upload_dir: str = INGEST_UPLOAD_DIR,
+                 poll_seconds: float = INGEST_JOB_POLL_SECONDS,
+                 heartbeat_seconds: float = INGEST_JOB_HEARTBEAT_SECONDS,
+                 lock_path: str = INGEST_WRITER_LOCK_PATH):
+        self.job_store = job_store or get_job_store()
+        self.ingestion = ingestion or get_ingestion_pipeline()
+        self.upload_dir = upload_dir
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.writer_lock = threading.Lock()
+        self.process_lock = WriterLock(lock_path)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._heartbeat_thread = None
+    
+    def start(self):
+        """Start the worker thread; jobs left running by dead workers are re-queued once their heartbeat is stale"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if not self.process_lock.acquire():
+            raise RuntimeError(
+                f"Another process holds {self.process_lock.path} and writes the stores; "
+                f"run a single server process (uvicorn --workers 1)")
+        self.job_store.requeue_interrupted()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+        self._thread.start()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="ingest-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the current job finishes"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout)
+            self._heartbeat_thread = None
+        self.process_lock.release()
+    
+    def upload_path(self, job_id: str, filename: str) -> str:
+        """
+        Where an upload is stored until its job runs. The original filename
+        is kept so re-uploads of the same file resolve to the same document.
+        """
+        job_dir = os.path.join(os.path.abspath(self.upload_dir), job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        return os.path.join(job_dir, os.path.basename(filename))
+    
+    def submit(self, job_id: str, filename: str, filepath: str,
+               title: Optional[str] = None, description: Optional[str] = None) -> IngestionJob:
+        """Queue an upload already written to filepath"""
+        job = self.job_store.create_job(filename, filepath, title, description, job_id=job_id)
+        self._wakeup.set()
+        return job
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            job = self.job_store.claim_next()
+            if job is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            self._process(job)
+    
+    def _heartbeat(self):
+        while not self._stopping.wait(self.heartbeat_seconds):
+            try:
+                self.job_store.heartbeat()
+                if self.job_store.requeue_interrupted():
+                    self._wakeup.set()
+            except Exception as e:
+                print(f"Error refreshing ingestion job heartbeat: {e}")
+    
+    def _process(self, job: IngestionJob):
+        tracker = StageTracker(self.job_store, job, job.to_dict()["stages"])
+        try:
+            with self.writer_lock:
+                doc_id = self.ingestion.ingest_file(
+                    job.filepath,
+                    title=job.title,
+                    description=job.description,
+                    on_stage=tracker.start_stage
+                )
+                result = {
+                    "version": self.ingestion.last_version.to_dict(),
+                    "stats": self.ingestion.get_stats()
+                }
+            tracker.finish()
+            self.job_store.complete_job(job, doc_id, result)
+        except Exception as e:
+            tracker.finish(failed=True)
+            self.job_store.fail_job(job, str(e))
+        finally:
+            self.ingestion.sqlite_store.release()
+            # Only uploads staged by upload_path() are ours to delete
+            job_dir = os.path.dirname(job.filepath or '')
+            if os.path.dirname(job_dir) == os.path.abspath(self.upload_dir):
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+
+# Singleton instance
+_worker = None
+
+def get_ingestion_worker() -> IngestionWorker:
+    """Shared worker, started on first use"""
+    global _worker
+    if _worker is None:
+        _worker = IngestionWorker()
+        _worker.start()
+    return _worker
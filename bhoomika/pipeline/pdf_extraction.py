@@ -0,0 +1,206 @@
+"""
+Parallel PDF Text Extraction
+Splits large PDFs into page ranges and extracts several files concurrently
+"""
+import time
+import atexit
+import bisect
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Dict, Optional
+from pypdf import PdfReader
+import sys
+sys.path.append('..')
+from config import PDF_EXTRACT_WORKERS, PDF_PAGES_PER_TASK, PDF_PARALLEL_MIN_PAGES
+
+
+def _extract_page_range(filepath: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF. Runs in a worker process."""
+    reader = PdfReader(filepath)
+    return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, end)]
+
+
+# One long-lived pool per process (per worker count), started on first use.
+# Workers are started with forkserver (spawn where it is unavailable), never
+# fork: the ingesting process runs threads and holds SQLite connections,
+# which a forked child would inherit mid-use.
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _start_method() -> str:
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def get_extraction_pool(max_workers: int = PDF_EXTRACT_WORKERS) -> ProcessPoolExecutor:
+    """Shared extraction pool; worker processes start as tasks arrive and are then reused"""
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers,
+                                       mp_context=multiprocessing.get_context(_start_method()))
+            _pools[max_workers] = pool
+        return pool
+
+
+def _discard_pool(max_workers: int, pool: ProcessPoolExecutor):
+    """Drop a broken pool (a worker died), so the next call starts a fresh one"""
+    with _pools_lock:
+        if _pools.get(max_workers) is pool:
+            del _pools[max_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extraction_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_extraction_pools)
+
+
+class ExtractedPDF:
+    """
+    Text of a PDF reassembled in page order.
+    
+    page_spans holds (page_number, start_char, end_char) for every page
+    that produced text, so chunk offsets can be mapped back to pages.
+    """
+    
+    def __init__(self, filepath: str, pages: List[Tuple[int, str]], timings: Dict[str, float],
+                 error: Optional[str] = None):
+        self.filepath = filepath
+        self.timings = timings
+        self.error = error
+        self.num_pages = len(pages)
+        self.text, self.page_spans = self._assemble(pages)
+        self.page_starts = [start for _, start, _ in self.page_spans]
+    
+    def _assemble(self, pages: List[Tuple[int, str]]):
+        """Join non-empty pages with newlines, recording each page's span"""
+        parts = []
+        spans = []
+        offset = 0
+        for page_number, page_text in sorted(pages):
+            if not page_text:
+                continue
+            if parts:
+                offset += 1  # Newline separator
+            parts.append(page_text)
+            spans.append((page_number, offset, offset + len(page_text)))
+            offset += len(page_text)
+        return '\n'.join(parts), spans
+    
+    def page_at(self, char_offset: int) -> Optional[int]:
+        """Page number containing a character offset of the assembled text"""
+        if not self.page_spans:
+            return None
+        index = max(bisect.bisect_right(self.page_starts, char_offset) - 1, 0)
+        return self.page_spans[index][0]
+    
+    def pages_for_span(self, start_char: int, end_char: int) -> Tuple[Optional[int], Optional[int]]:
+        """First and last page numbers covered by a character span"""
+        return self.page_at(start_char), self.page_at(max(start_char, end_char - 1))
+
+
+class PDFExtractor:
+    """
+    Process-pool PDF extractor.
+    
+    PDFs with at least min_parallel_pages pages are split into ranges of
+    pages_per_task pages; smaller PDFs are one task each. Tasks from all
+    files share the process's extraction pool (get_extraction_pool), so
+    several files are extracted concurrently and workers are not started
+    again for every call.
+    """
+    
+    def __init__(self, max_workers: int = PDF_EXTRACT_WORKERS,
+                 pages_per_task: int = PDF_PAGES_PER_TASK,
+                 min_parallel_pages: int = PDF_PARALLEL_MIN_PAGES):
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.min_parallel_pages = min_parallel_pages
+    
+    def extract(self, filepath: str) -> ExtractedPDF:
+        """Extract a single PDF"""
+        return self.extract_many([filepath])[filepath]
+    
+    def extract_many(self, filepaths: List[str]) -> Dict[str, ExtractedPDF]:
+        """
+        Extract several PDFs concurrently.
+        
+        Returns a dict of filepath -> ExtractedPDF. A file that fails is
+        returned with its error set and empty text; other files still complete.
+        """
+        timings = {path: {} for path in filepaths}
+        errors = {}
+        tasks = []
+        
+        # Stage 1: open each file and plan its page ranges
+        for path in filepaths:
+            start = time.perf_counter()
+            try:
+                num_pages = len(PdfReader(path).pages)
+                tasks.extend((path, s, e) for s, e in self._page_ranges(num_pages))
+            except Exception as e:
+                errors[path] = str(e)
+            timings[path]['open'] = time.perf_counter() - start
+        
+        # Stage 2: extract page ranges
+        pages = {path: [] for path in filepaths}
+        extract_start = time.perf_counter()
+        
+        if len(tasks) <= 1 or self.max_workers <= 1:
+            # Not worth a process pool
+            for path, s, e in tasks:
+                try:
+                    pages[path].extend(_extract_page_range(path, s, e))
+                except Exception as ex:
+                    errors[path] = str(ex)
+                timings[path]['extract'] = time.perf_counter() - extract_start
+        else:
+            pool = get_extraction_pool(self.max_workers)
+            try:
+                futures = {pool.submit(_extract_page_range, path, s, e): path for path, s, e in tasks}
+            except BrokenProcessPool:
+                _discard_pool(self.max_workers, pool)
+                pool = get_extraction_pool(self.max_workers)
+                futures = {pool.submit(_extract_page_range, path, s, e): path for path, s, e in tasks}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    pages[path].extend(future.result())
+                except BrokenProcessPool as ex:
+                    errors[path] = str(ex)
+                    _discard_pool(self.max_workers, pool)
+                except Exception as ex:
+                    errors[path] = str(ex)
+                # Wall time until the file's last range finished
+                timings[path]['extract'] = time.perf_counter() - extract_start
+        
+        # Stage 3: reassemble pages in order
+        results = {}
+        for path in filepaths:
+            start = time.perf_counter()
+            error = errors.get(path)
+            extracted = ExtractedPDF(path, [] if error else pages[path], timings[path], error)
+            timings[path]['assemble'] = time.perf_counter() - start
+            results[path] = extracted
+        
+        return results
+    
+    def _page_ranges(self, num_pages: int) -> List[Tuple[int, int]]:
+        if num_pages < self.min_parallel_pages:
+            return [(0, num_pages)] if num_pages else []
+        return [(s, min(s + self.pages_per_task, num_pages))
+                for s in range(0, num_pages, self.pages_per_task)]
+
+
+def extract_pdf(filepath: str) -> ExtractedPDF:
+    """Convenience function to extract one PDF"""
+    return PDFExtractor().extract(filepath)
@@ -1,17 +1,20 @@
 """
-Hybrid Retrieval Pipeline (Vector + Graph)
+Hybrid Retrieval Pipeline (Vector + Graph + Lexical)
 """
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 import sys
 sys.path.append('..')
-from config import TOP_K_RESULTS, GRAPH_EXPANSION_DEPTH
+from config import (TOP_K_RESULTS, LEXICAL_CANDIDATES, LEXICAL_WEIGHT, LEXICAL_PREFILTER,
+                    LEXICAL_PREFILTER_CANDIDATES)
 from models import get_embeddings
 from storage import get_faiss_store, get_sqlite_store, get_knowledge_graph
+from .statutes import parse_citations
 
 
 class HybridRetrieval:
     """
-    Hybrid retrieval combining vector similarity and graph traversal
+    Hybrid retrieval combining vector similarity, graph traversal and
+    bm25 matches from the full-text index of chunk text
     """
     
     def __init__(self):
@@ -20,21 +23,40 @@ class HybridRetrieval:
         self.sqlite_store = get_sqlite_store()
         self.knowledge_graph = get_knowledge_graph()
     
-    def retrieve(self, query: str, top_k: int = TOP_K_RESULTS) -> List[Dict]:
+    def retrieve(self, query: str, top_k: int = TOP_K_RESULTS, prefilter: Optional[bool] = None) -> List[Dict]:
         """
         Retrieve relevant chunks using hybrid approach.
+        With prefilter (default LEXICAL_PREFILTER), vector similarity is only
+        computed for chunks matching the query terms, when there are enough.
         Returns list of {chunk_id, content, score, source}
         """
-        # Step 1: Vector search
+        if prefilter is None:
+            prefilter = LEXICAL_PREFILTER
+        # Step 0: Explicit citations ("Section 17 Registration Act") are answered
+        # from the section index, before any embedding call
+        cited = self.retrieve_cited_sections(query, top_k)
+        if cited:
+            return cited
+        
+        # Step 1: Lexical (bm25) and vector search
+        lexical_results = self.sqlite_store.search_chunks(
+            query, max(LEXICAL_CANDIDATES, LEXICAL_PREFILTER_CANDIDATES) if prefilter else LEXICAL_CANDIDATES)
         query_embedding = self.embeddings.embed_query(query)
-        vector_results = self.faiss_store.search(query_embedding, top_k * 2)
+        if prefilter and len(lexical_results) >= top_k * 2:
+            vector_results = self.faiss_store.search_among(
+                query_embedding, [chunk_id for chunk_id, _ in lexical_results], top_k * 2)
+        else:
+            vector_results = self.faiss_store.search(query_embedding, top_k * 2)
+        lexical_results = lexical_results[:LEXICAL_CANDIDATES]
         
-        # Step 2: Graph expansion
-        vector_chunk_ids = [chunk_id for chunk_id, _ in vector_results]
-        graph_neighbors = self.knowledge_graph.get_related_chunks(
-            vector_chunk_ids, 
-            depth=GRAPH_EXPANSION_DEPTH
+        # Step 2: Graph relevance: personalized PageRank with the vector hits'
+        # similarities as restart mass. Only mass that arrived over edges counts,
+        # scaled so the best-supported chunk gets 1.0.
+        graph_mass = self.knowledge_graph.personalized_pagerank(
+            {chunk_id: similarity for chunk_id, similarity in vector_results},
+            exclude_restart=True
         )
+        max_mass = max(graph_mass.values(), default=0.0)
         
         # Step 3: Score fusion
         scores = {}
@@ -47,22 +69,45 @@ class HybridRetrieval:
                 'source': 'vector'
             }
         
-        # Assign graph scores (proximity-based)
-        for neighbor_id in graph_neighbors:
-            if neighbor_id not in scores:
-                scores[neighbor_id] = {
+        # Assign graph scores to the vector hits and the best graph-only chunks
+        graph_only = sorted((chunk_id for chunk_id, mass in graph_mass.items() if mass > 0 and chunk_id not in scores),
+                            key=graph_mass.get, reverse=True)[:top_k * 2]
+        for chunk_id in list(scores) + graph_only:
+            graph_score = graph_mass.get(chunk_id, 0.0) / max_mass if max_mass > 0 else 0.0
+            if chunk_id not in scores:
+                scores[chunk_id] = {
                     'vector_score': 0.0,
-                    'graph_score': 0.3,  # Base graph score
+                    'graph_score': graph_score,
                     'source': 'graph'
                 }
-            else:
-                scores[neighbor_id]['graph_score'] = 0.2  # Boost for graph neighbors
-                scores[neighbor_id]['source'] = 'hybrid'
+            elif graph_score > 0:
+                scores[chunk_id]['graph_score'] = graph_score
+                scores[chunk_id]['source'] = 'hybrid'
+        
+        # Assign lexical scores (bm25 scaled so the best match gets 1.0) to the
+        # chunks so far and the best lexical-only matches
+        max_bm25 = lexical_results[0][1] if lexical_results else 0.0
+        lexical_only = 0
+        for chunk_id, bm25 in lexical_results:
+            lexical_score = bm25 / max_bm25 if max_bm25 > 0 else 0.0
+            if chunk_id in scores:
+                scores[chunk_id]['lexical_score'] = lexical_score
+                if scores[chunk_id]['source'] == 'vector':
+                    scores[chunk_id]['source'] = 'hybrid'
+            elif lexical_only < top_k * 2:
+                scores[chunk_id] = {
+                    'vector_score': 0.0,
+                    'graph_score': 0.0,
+                    'lexical_score': lexical_score,
+                    'source': 'lexical'
+                }
+                lexical_only += 1
         
         # Calculate final scores (weighted fusion)
         for chunk_id in scores:
             s = scores[chunk_id]
-            s['final_score'] = 0.7 * s['vector_score'] + 0.3 * s['graph_score']
+            s['final_score'] = (0.7 * s['vector_score'] + 0.3 * s['graph_score']
+                                + LEXICAL_WEIGHT * s.get('lexical_score', 0.0))
         
         # Step 4: Rank and get top-k
         ranked = sorted(scores.items(), key=lambda x: x[1]['final_score'], reverse=True)[:top_k]
@@ -85,6 +130,34 @@ class HybridRetrieval:
         
         return results
     
+    def retrieve_cited_sections(self, query: str, top_k: int = TOP_K_RESULTS) -> List[Dict]:
+        """
+        Chunks of the statute sections cited in the query, via the (act, section)
+        index. Whole-section chunks come first; paragraphs they already
+        contain are skipped. Returns [] if the query cites no indexed section.
+        """
+        chunks = {}
+        for act_keys, section in parse_citations(query):
+            for chunk in self.sqlite_store.get_section_chunks(act_keys, section):
+                chunks.setdefault(chunk.id, chunk)
+        
+        ranked = []
+        for chunk in sorted(chunks.values(), key=lambda chunk: chunk.chunk_type != 'M'):
+            if not any(other.document_id == chunk.document_id and other.start_char <= chunk.start_char
+                       and chunk.end_char <= other.end_char for other in ranked):
+                ranked.append(chunk)
+        ranked = ranked[:top_k]
+        if not ranked:
+            return []
+        
+        contents = self.sqlite_store.resolve_chunk_contents(ranked)
+        return [{
+            'chunk_id': chunk.id,
+            'content': contents[chunk.id],
+            'score': 1.0,
+            'source': 'citation'
+        } for chunk in ranked]
+    
     def build_context(self, results: List[Dict], max_tokens: int = 2000) -> str:
         """
         Build context string from retrieval results
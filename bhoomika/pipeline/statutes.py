@@ -0,0 +1,120 @@
+"""
+Statute Structure: Markdown Headings, Sections and Citations
+"""
+import re
+import bisect
+from typing import List, Optional, NamedTuple, Tuple
+
+# "# Registration Act, 1908" / "## Section 17: Documents of which registration is compulsory"
+_HEADING_RE = re.compile(r'^(#{1,6})[ \t]+(\S[^\n]*?)[ \t#]*$', re.M)
+_SECTION_HEADING_RE = re.compile(r'^(?:section|sec\.?|s\.|§)\s*(\d+[a-z]*)\b', re.I)
+
+# "Section 17 Registration Act", "s. 54 of the Transfer of Property Act, 1882",
+# "Registration Act 1908 section 17"
+_SECTION_REF = r'(?:section|sec\.?|s\.|§)\s*(\d+[a-z]*)\b'
+_ACT_REF = r'((?:[a-z][\w\-]*\s+){0,6}?act)\b'
+_CITATION_RE = re.compile(
+    _SECTION_REF + r'\s*,?\s*(?:(?:of|under|in)\s+)?(?:the\s+)?' + _ACT_REF + r'|'
+    + _ACT_REF + r'\s*,?\s*(?:\d{4}\s*)?,?\s*' + _SECTION_REF,
+    re.I
+)
+_YEAR_RE = re.compile(r'\b\d{4}\b')
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+class StatuteSection(NamedTuple):
+    """Text under one heading, up to the next heading of the same or a higher level"""
+    start: int
+    end: int
+    act: Optional[str]  # Title of the enclosing top-level heading
+    section: Optional[str]  # Section number ("17", "53a") of this heading or the nearest enclosing one
+    headings: List[str]  # Heading path, outermost first
+
+
+def act_key(title: str) -> str:
+    """Normalized act name used by the section index: lowercase, no year, no 'the'"""
+    words = _NON_WORD_RE.sub(' ', _YEAR_RE.sub(' ', title.lower())).split()
+    return ' '.join(word for word in words if word != 'the')
+
+
+def section_number(heading: str) -> Optional[str]:
+    match = _SECTION_HEADING_RE.match(heading)
+    return match.group(1).lower() if match else None
+
+
+def find_statute_sections(text: str) -> List[StatuteSection]:
+    """
+    Split text at Markdown headings, in heading order. A section runs to the
+    next heading of the same or a higher level, so it contains its
+    subsections ("### Explanation" under "## Section 17"), which inherit
+    its section number. Text before the first heading is not part of any
+    section. Section ends are trimmed of trailing whitespace.
+    """
+    sections = []
+    stack = []  # (level, title, section number)
+    open_sections = []  # Indexes into sections whose end is not found yet, one per stack entry
+    matches = list(_HEADING_RE.finditer(text))
+    
+    def close(index: int, end: int):
+        while end > sections[index].start and text[end - 1].isspace():
+            end -= 1
+        sections[index] = sections[index]._replace(end=end)
+    
+    for match in matches:
+        level, title = len(match.group(1)), match.group(2)
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+            close(open_sections.pop(), match.start())
+        number = section_number(title) or (stack[-1][2] if stack else None)
+        stack.append((level, title, number))
+        open_sections.append(len(sections))
+        
+        sections.append(StatuteSection(
+            start=match.start(),
+            end=len(text),
+            act=stack[0][1],
+            section=number,
+            headings=[heading for _, heading, _ in stack]
+        ))
+    
+    for index in open_sections:
+        close(index, len(text))
+    
+    return sections
+
+
+def section_for_span(sections: List[StatuteSection], starts: List[int],
+                     start: int, end: int) -> Optional[StatuteSection]:
+    """The innermost section containing [start, end), given starts = [s.start for s in sections]"""
+    i = bisect.bisect_right(starts, start) - 1
+    # Walk back to the enclosing sections; past a top-level heading nothing encloses the span
+    while i >= 0:
+        if end <= sections[i].end:
+            return sections[i]
+        if len(sections[i].headings) == 1:
+            return None
+        i -= 1
+    return None
+
+
+def parse_citations(query: str) -> List[Tuple[List[str], str]]:
+    """
+    Explicit section citations in a query.
+    
+    Returns (act key candidates, section number) pairs. The act phrase is
+    matched loosely ("what does the registration act ..."), so candidates are
+    its word suffixes ending in 'act', longest first.
+    """
+    citations = []
+    for match in _CITATION_RE.finditer(query):
+        if match.group(1):
+            section, act = match.group(1), match.group(2)
+        else:
+            act, section = match.group(3), match.group(4)
+        
+        words = act_key(act).split()
+        candidates = [' '.join(words[i:]) for i in range(len(words) - 1)]
+        if candidates:
+            citations.append((candidates, section.lower()))
+    
+    return citations
@@ -0,0 +1,333 @@
+"""
+Streaming Staged Ingestion Pipeline
+extract -> chunk -> embed -> persist -> graph, connected by bounded queues
+"""
+import os
+import time
+import queue
+import threading
+from typing import List, Dict, Optional, Iterable
+import sys
+sys.path.append('..')
+from config import STREAM_QUEUE_SIZE, STREAM_EXTRACT_WORKERS, STREAM_EMBED_WORKERS
+from .ingestion import DocumentIngestion, DocumentVersion, get_ingestion_pipeline
+
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+
+class StreamItem:
+    """
+    One document travelling through the stages.
+    
+    Created from either a filepath or raw text. A stage that fails sets
+    error; later stages pass the item through untouched so the failure is
+    reported at the end without stopping the other documents.
+    """
+    
+    def __init__(self, filepath: Optional[str] = None, text: Optional[str] = None,
+                 title: Optional[str] = None, description: Optional[str] = None,
+                 use_multi_granularity: bool = True):
+        self.filepath = filepath
+        self.text = text
+        self.title = title
+        self.description = description
+        self.use_multi_granularity = use_multi_granularity
+        self.doc_id = None
+        self.extension = None
+        self.extracted = None
+        self.extract_timings = {}
+        self.version = None
+        self.prepared = None
+        self.new_chunks = None
+        self.holds_filename = False  # Later items with this filename wait in the chunk stage
+        self.error = None
+        self.failed_stage = None
+    
+    @property
+    def source(self) -> str:
+        return self.filepath or self.title
+    
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.filepath) if self.filepath else f"{self.title}.txt"
+    
+    @property
+    def skipped(self) -> bool:
+        """Unchanged documents flow through the remaining stages untouched"""
+        return self.version is not None and self.version.status == 'unchanged'
+    
+    def result(self) -> Dict:
+        succeeded = self.error is None and self.version is not None
+        return {
+            "source": self.source,
+            "document_id": self.doc_id if self.error is None else None,
+            "status": self.version.status if succeeded else None,
+            "chunks": len(self.prepared.chunk_ids) if self.prepared and self.error is None else 0,
+            "chunks_added": len(self.version.added_chunk_ids) if succeeded else 0,
+            "chunks_removed": len(self.version.removed_chunk_ids) if succeeded else 0,
+            "error": self.error,
+            "failed_stage": self.failed_stage,
+            "extract_timings": self.extract_timings
+        }
+
+
+class StageStats:
+    """Throughput counters for one stage"""
+    
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # Time spent waiting on a full downstream queue
+        self._lock = threading.Lock()
+    
+    def record(self, busy: float, blocked: float, failed: bool):
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            if failed:
+                self.errors += 1
+    
+    def to_dict(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "items_per_second": round(self.items / self.busy_seconds, 2) if self.busy_seconds else 0.0
+        }
+
+
+class StreamingIngestion:
+    """
+    Staged ingestion pipeline with bounded queues and per-stage workers.
+    
+    Stages:
+    - extract: read the file / PDF text (CPU, disk)
+    - chunk:   multi-granularity chunking (CPU)
+    - embed:   embedding API calls (network), several workers
+    - persist: document row, chunk rows and vectors (disk), single writer
+    - graph:   knowledge graph edges, single writer
+    
+    Each queue holds at most queue_size documents, so a slow stage
+    applies backpressure upstream instead of buffering the whole corpus.
+    The vector store and knowledge graph are saved once at the end.
+    
+    Items with the same filename are versions of one document: the chunk
+    stage holds back a filename until the earlier item has left the graph
+    stage, so each version is resolved against the one written before it.
+    """
+    
+    def __init__(self, ingestion: Optional[DocumentIngestion] = None,
+                 queue_size: int = STREAM_QUEUE_SIZE,
+                 extract_workers: int = STREAM_EXTRACT_WORKERS,
+                 embed_workers: int = STREAM_EMBED_WORKERS):
+        self.ingestion = ingestion or get_ingestion_pipeline()
+        self.queue_size = queue_size
+        self.stages = [
+            ("extract", self._extract, extract_workers),
+            ("chunk", self._chunk, 1),
+            ("embed", self._embed, embed_workers),
+            ("persist", self._persist, 1),
+            ("graph", self._graph, 1),
+        ]
+        self.stats = {name: StageStats(name, workers) for name, _, workers in self.stages}
+        self.wall_seconds = 0.0
+        
+        # Version lookups (chunk stage) must not interleave with writes (persist and
+        # graph stages), and background flushes must not see a half-written state
+        self._store_lock = self.ingestion.persistence.lock
+        
+        # Filenames of items between the chunk stage and the end of the pipeline
+        self._in_flight = set()
+        self._in_flight_changed = threading.Condition()
+    
+    def run(self, items: Iterable[StreamItem]) -> List[Dict]:
+        """
+        Push items through all stages and return one result per item.
+        Items are consumed lazily, so a generator can feed the pipeline.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        start = time.perf_counter()
+        
+        for index, (name, func, workers) in enumerate(self.stages):
+            remaining = [workers]
+            lock = threading.Lock()
+            for _ in range(workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(name, func, queues[index], queues[index + 1], remaining, lock,
+                          self._downstream_workers(index)),
+                    name=f"ingest-{name}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        
+        # Feed the first stage from its own thread (blocks when the extract queue is full)
+        feeder = threading.Thread(target=self._feed, args=(items, queues[0]), name="ingest-feed", daemon=True)
+        feeder.start()
+        threads.append(feeder)
+        
+        # Drain the last queue
+        results = []
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            self._release_filename(item)
+            results.append(item.result())
+        
+        for thread in threads:
+            thread.join()
+        
+        # Persist once for the whole stream
+        self.ingestion.persistence.flush()
+        
+        self.wall_seconds = time.perf_counter() - start
+        return results
+    
+    def ingest_files(self, filepaths: List[str], use_multi_granularity: bool = True) -> List[Dict]:
+        """Convenience wrapper: stream a list of files"""
+        return self.run(
+            StreamItem(filepath=path, title=os.path.basename(path),
+                       description=f"Imported from {os.path.basename(path)}",
+                       use_multi_granularity=use_multi_granularity)
+            for path in filepaths
+        )
+    
+    def get_stats(self) -> Dict:
+        """Per-stage throughput counters of the last run"""
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "stages": {name: stats.to_dict() for name, stats in self.stats.items()}
+        }
+    
+    def _claim_filename(self, item: StreamItem):
+        """Wait until no earlier item with this filename is in the pipeline, then hold it"""
+        with self._in_flight_changed:
+            while item.filename in self._in_flight:
+                self._in_flight_changed.wait()
+            self._in_flight.add(item.filename)
+            item.holds_filename = True
+    
+    def _release_filename(self, item: StreamItem):
+        if item.holds_filename:
+            with self._in_flight_changed:
+                self._in_flight.discard(item.filename)
+                item.holds_filename = False
+                self._in_flight_changed.notify_all()
+    
+    def _feed(self, items: Iterable[StreamItem], inbox: queue.Queue):
+        try:
+            for item in items:
+                inbox.put(item)
+        finally:
+            for _ in range(self.stages[0][2]):
+                inbox.put(_DONE)
+    
+    def _downstream_workers(self, index: int) -> int:
+        """Number of end markers the next stage needs (1 for the output queue)"""
+        if index + 1 < len(self.stages):
+            return self.stages[index + 1][2]
+        return 1
+    
+    def _worker(self, name: str, func, inbox: queue.Queue, outbox: queue.Queue,
+                remaining: list, lock: threading.Lock, downstream_workers: int):
+        stats = self.stats[name]
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            
+            busy_start = time.perf_counter()
+            if item.error is None:
+                try:
+                    func(item)
+                except Exception as e:
+                    item.error = str(e)
+                    item.failed_stage = name
+            busy = time.perf_counter() - busy_start
+            
+            put_start = time.perf_counter()
+            outbox.put(item)
+            stats.record(busy, time.perf_counter() - put_start, item.failed_stage == name)
+        
+        self.ingestion.sqlite_store.release()
+        
+        # The last worker of a stage closes the next queue
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                for _ in range(downstream_workers):
+                    outbox.put(_DONE)
+    
+    # Stages
+    def _extract(self, item: StreamItem):
+        if item.filepath:
+            item.text, item.extension, item.extracted = self.ingestion._read_file(item.filepath)
+            if item.extracted is not None:
+                item.extract_timings = item.extracted.timings
+        else:
+            if not item.text or len(item.text.strip()) == 0:
+                raise ValueError("Empty text content")
+            item.extension = '.txt'
+    
+    def _chunk(self, item: StreamItem):
+        self._claim_filename(item)
+        with self._store_lock:
+            item.version = self.ingestion._resolve_version(item.text, item.filename)
+        item.doc_id = item.version.doc_id
+        if item.skipped:
+            return
+        
+        item.prepared = self.ingestion._prepare_chunks(
+            item.doc_id, item.text, item.use_multi_granularity, item.extracted
+        )
+        item.new_chunks = self.ingestion._diff_chunks(item.version, item.prepared)
+    
+    def _embed(self, item: StreamItem):
+        if item.skipped:
+            return
+        self.ingestion._embed_chunks(item.new_chunks)
+    
+    def _persist(self, item: StreamItem):
+        if item.skipped:
+            return
+        
+        with self._store_lock:
+            # The same text may have been persisted earlier in this stream
+            existing = (self.ingestion.sqlite_store.get_document_by_hash(item.version.content_hash)
+                        if item.version.status == 'created' else None)
+            if existing:
+                item.version = DocumentVersion(existing.id, item.version.content_hash, 'unchanged')
+                item.doc_id = existing.id
+                item.prepared = item.new_chunks = None
+                return
+            
+            with self.ingestion.sqlite_store.transaction():
+                self.ingestion._write_document(
+                    item.version, item.text, item.filename, item.filepath, item.extension[1:],
+                    item.title, item.description
+                )
+                self.ingestion._update_chunk_rows(item.version, item.prepared)
+                self.ingestion.sqlite_store.add_chunks_bulk(item.new_chunks.chunk_rows)
+            self.ingestion._drop_removed_chunks(item.version)
+            self.ingestion._add_vectors(item.new_chunks)
+        
+        # Text is no longer needed downstream
+        item.text = None
+        item.extracted = None
+    
+    def _graph(self, item: StreamItem):
+        if item.skipped:
+            return
+        with self._store_lock:
+            self.ingestion._link_chunks(item.prepared, item.new_chunks)
@@ -0,0 +1,49 @@
+"""
+Rebuild the full-text (FTS5) index of chunk text.
+
+Usage:
+    python rebuild_search_index.py
+    python rebuild_search_index.py --query "mutation entry"   # then run a test search
+
+Needed once for databases created before the index (after migrate_db.py),
+and after writes made outside SQLiteStore (ingest_standalone.py rebuilds
+it itself). Ingestion keeps it up to date. The row counters are reset too.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import LEXICAL_CANDIDATES
+from storage.sqlite_store import get_sqlite_store
+
+
+def rebuild_search_index():
+    store = get_sqlite_store()
+    counters = store.recount()
+    print(f"Database: {counters['documents']} documents, {counters['chunks']} chunks")
+
+    start = time.perf_counter()
+    indexed = store.rebuild_search_index()
+    print(f"✓ Indexed {indexed} chunks in {time.perf_counter() - start:.2f}s")
+
+
+def test_query(query: str):
+    store = get_sqlite_store()
+    start = time.perf_counter()
+    results = store.search_chunks(query, LEXICAL_CANDIDATES)
+    print(f"\n{len(results)} matches for {query!r} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for chunk_id, score in results[:10]:
+        print(f"  {score:8.3f}  {chunk_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the full-text index of chunk text")
+    parser.add_argument("--query", help="Search the rebuilt index")
+    args = parser.parse_args()
+
+    rebuild_search_index()
+    if args.query:
+        test_query(args.query)
@@ -8,6 +8,7 @@ import sys
 import json
 import pickle
 import asyncio
+import zlib
 import numpy as np
 import requests
 from typing import List, Dict, Any, Optional
@@ -15,11 +16,13 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from openai import OpenAI
-from sqlalchemy import create_engine, Column, String, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
+from config import DOCUMENT_TEXT_BLOCK_SIZE
+from storage.sqlite_store import get_engine
 
 load_dotenv()
 
@@ -55,11 +58,39 @@ class Chunk(Base):
     content = Column(Text, nullable=False)
     chunk_index = Column(Integer)
     chunk_type = Column(String(10), default='M')  # S, M, or L for multi-granularity
+    start_char = Column(Integer)
+    end_char = Column(Integer)
+
+class DocumentTextBlock(Base):
+    __tablename__ = 'document_text_blocks'
+    document_id = Column(String(50), primary_key=True)
+    block_index = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+def chunk_text(session, chunk) -> str:
+    """Chunk content; NULL content is a span of the compressed document text"""
+    if chunk.content is not None:
+        return chunk.content
+    if chunk.end_char <= chunk.start_char:
+        return ""
+    first = chunk.start_char // DOCUMENT_TEXT_BLOCK_SIZE
+    last = (chunk.end_char - 1) // DOCUMENT_TEXT_BLOCK_SIZE
+    blocks = (session.query(DocumentTextBlock)
+              .filter(DocumentTextBlock.document_id == chunk.document_id,
+                      DocumentTextBlock.block_index.between(first, last))
+              .order_by(DocumentTextBlock.block_index).all())
+    text = "".join(zlib.decompress(block.data).decode("utf-8") for block in blocks)
+    offset = first * DOCUMENT_TEXT_BLOCK_SIZE
+    return text[chunk.start_char - offset:chunk.end_char - offset]
+
+# The process's pooled engine (WAL, busy timeout and cache pragmas set in storage.sqlite_store);
+# each request takes a short-lived session from it
+engine = get_engine(SQLITE_DB_PATH)
+
+SessionLocal = sessionmaker(bind=engine)
 
 def get_db_session():
-    engine = create_engine(f'sqlite:///{SQLITE_DB_PATH}')
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return SessionLocal()
 
 # --- COMPONENTS ---
 class LocalEmbeddings:
@@ -82,6 +113,7 @@ class SimpleVectorStore:
         self.id_map_path = os.path.join(FAISS_INDEX_PATH, "id_map.pkl")
         self.vectors = np.empty((0, 1024), dtype=np.float32) # 1024 dims
         self.id_to_chunk = {}
+        self.tombstones = set()
         self._load()
 
     def _load(self):
@@ -91,6 +123,7 @@ class SimpleVectorStore:
                 with open(self.id_map_path, 'rb') as f:
                     data = pickle.load(f)
                     self.id_to_chunk = data['id_to_chunk']
+                    self.tombstones = data.get('tombstones', set())
             except: pass
 
     def search(self, query_embedding: List[float], top_k: int = 5) -> List[tuple]:
@@ -110,6 +143,8 @@ class SimpleVectorStore:
         norm_vecs[norm_vecs == 0] = 1e-10
         
         sims = np.dot(self.vectors, query_vec) / (norm_vecs * norm_query)
+        if self.tombstones:
+            sims[list(self.tombstones)] = -np.inf  # Chunks removed by a re-ingest
         top_indices = np.argsort(sims)[-top_k:][::-1]
         
         results = []
@@ -157,9 +192,9 @@ async def chat(request: ChatRequest):
         
         session = get_db_session()
         chunks = session.query(Chunk).filter(Chunk.id.in_(chunk_ids)).all()
+        chunk_map = {c.id: chunk_text(session, c) for c in chunks}
         session.close()
         
-        chunk_map = {c.id: c.content for c in chunks}
         retrieved_texts = [chunk_map.get(cid, "") for cid in chunk_ids]
         
         context = "\n\n".join(retrieved_texts)
@@ -7,3 +7,5 @@ from .simple_store import get_faiss_store, SimpleVectorStore as FAISSStore
 
 from .sqlite_store import get_sqlite_store, SQLiteStore
 from .knowledge_graph import get_knowledge_graph, KnowledgeGraph
+from .job_store import get_job_store, JobStore
+from .persistence import get_persistence_manager, PersistenceManager
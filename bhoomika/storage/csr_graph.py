@@ -0,0 +1,546 @@
+"""
+Compressed Sparse Row (CSR) Graph Storage for the Knowledge Graph
+"""
+import os
+import time
+import zlib
+import shutil
+import pickle
+import struct
+import numpy as np
+from typing import List, Optional, Tuple, Iterable, Dict
+import sys
+sys.path.append('..')
+from config import GRAPH_DELTA_MAX_EDGES, GRAPH_LOG_COMPACT_RATIO, GRAPH_LOG_MIN_COMPACT_BYTES
+from .persistence import atomic_write, atomic_write_bytes
+
+_ARRAYS = ("indptr", "indices", "weights", "relationships", "labels", "node_documents")
+
+# Edge log: frames of (payload length, crc32) + records. Records reference
+# strings by log-local ids, defined once per log by a string record.
+_LOG = "edges.log"
+_FRAME = struct.Struct('<II')
+_STRING = struct.Struct('<BIH')  # op, id, utf-8 length (bytes follow)
+_NODE = struct.Struct('<BIi')  # op, node, document (-1 = none)
+_EDGE = struct.Struct('<BIIeIi')  # op, node, node, float16 weight, kind, label (-1 = none)
+_UNLINK = struct.Struct('<BII')  # op, node, node
+_REMOVE = struct.Struct('<BI')  # op, node
+_OP_STRING, _OP_NODE, _OP_EDGE, _OP_UNLINK, _OP_REMOVE = 1, 2, 3, 4, 5
+
+
+def split_relationship(relationship: str) -> Tuple[str, Optional[str]]:
+    """'shared_concept:Tehsildar' -> ('shared_concept', 'Tehsildar'); 'semantic' -> ('semantic', None)"""
+    kind, _, label = relationship.partition(':')
+    return kind, (label if _ else None)
+
+
+class _Interned:
+    """String <-> dense integer code table"""
+    
+    def __init__(self, values: Iterable[str] = ()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+    
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class CSRGraph:
+    """
+    Undirected weighted graph as CSR arrays plus a delta buffer.
+    
+    The base graph is stored symmetrically (every edge in both rows):
+    indptr (int64), indices (int32 neighbor node codes, sorted per row),
+    weights (float16), relationships (uint8 kind codes such as 'semantic'
+    or 'shared_concept') and labels (int32 codes of the part after ':',
+    e.g. the shared keyword; -1 if none). Chunk IDs and document IDs are
+    interned to dense int codes. Saved arrays are memory-mapped on load.
+    
+    Mutations go to a delta buffer (added/changed edges, hidden base edges,
+    removed nodes) that reads merge on the fly. The buffer is merged into
+    new CSR arrays once it holds GRAPH_DELTA_MAX_EDGES changes.
+    
+    On disk, a version directory holds a snapshot of the arrays plus an
+    append-only edge log of the mutations made since. A save appends one
+    checksummed frame with the mutations since the previous save; loading
+    maps the snapshot and replays the log (a torn last frame is dropped).
+    Once the log outgrows the snapshot (GRAPH_LOG_COMPACT_RATIO), the save
+    writes a new snapshot version and switches the CURRENT pointer
+    atomically, so a crash leaves the previous version intact.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._load()
+    
+    # Loading and saving
+    def _load(self):
+        self.pending = bytearray()  # Encoded mutations not yet appended to the log
+        self.log_strings = {}  # String -> log-local id
+        self.log_bytes = 0
+        self.snapshot_bytes = 0
+        self.last_save = None
+        self._journal = True
+        
+        version = self._current_version()
+        if version is None:
+            self.node_ids = _Interned()
+            self.documents = _Interned()
+            self.kinds = _Interned()
+            self.labels = _Interned()
+            self.dead = set()
+            self._set_base(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                           np.zeros(0, dtype=np.float16), np.zeros(0, dtype=np.uint8),
+                           np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+            return
+        
+        path = os.path.join(self.directory, version)
+        with open(os.path.join(path, "tables.pkl"), 'rb') as f:
+            tables = pickle.load(f)
+        self.node_ids = _Interned(tables["node_ids"])
+        self.documents = _Interned(tables["documents"])
+        self.kinds = _Interned(tables["kinds"])
+        self.labels = _Interned(tables["labels"])
+        self.dead = set()
+        self._set_base(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS))
+        self.snapshot_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+                                  if name != _LOG)
+        self._replay_log(os.path.join(path, _LOG))
+    
+    def _current_version(self) -> Optional[str]:
+        pointer = os.path.join(self.directory, "CURRENT")
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer) as f:
+            return f.read().strip() or None
+    
+    def _set_base(self, indptr, indices, weights, relationships, labels, node_documents):
+        """Install new base arrays and reset the delta buffer"""
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.relationships = relationships
+        self.edge_labels = labels
+        self.base_nodes = len(indptr) - 1
+        # Node -> document code; grows with new nodes, -1 = no document
+        self.node_documents = np.array(node_documents, dtype=np.int32)
+        
+        self.delta = {}  # node -> {neighbor: (float16-rounded weight, kind, label)}, symmetric
+        self.hidden = set()  # (min, max) base edges removed or overridden by the delta
+        self.delta_changes = 0
+        # Every edge has an entry in both rows, except self-loops
+        self_loops = int(np.count_nonzero(np.asarray(indices) == self._row_of_entries())) if len(indices) else 0
+        self.edges = (len(indices) + self_loops) // 2
+    
+    def _row_of_entries(self) -> np.ndarray:
+        return np.repeat(np.arange(self.base_nodes, dtype=np.int32), np.diff(self.indptr))
+    
+    def save(self):
+        """Append the mutations since the last save to the edge log, or snapshot once it is too large"""
+        start = time.perf_counter()
+        version = self._current_version()
+        compact_at = max(GRAPH_LOG_MIN_COMPACT_BYTES, GRAPH_LOG_COMPACT_RATIO * self.snapshot_bytes)
+        if version is None or self.log_bytes + len(self.pending) > compact_at:
+            mode, written = "snapshot", self.snapshot()
+        else:
+            mode, written = "append", self._append_log(version)
+        self.last_save = {"mode": mode, "bytes": written, "seconds": round(time.perf_counter() - start, 4)}
+    
+    def get_stats(self) -> Dict:
+        return {
+            "snapshot_bytes": self.snapshot_bytes,
+            "log_bytes": self.log_bytes,
+            "last_save": self.last_save
+        }
+    
+    def snapshot(self) -> int:
+        """Merge the delta buffer and write a new version of the arrays with an empty log. Returns bytes written."""
+        self.merge()
+        os.makedirs(self.directory, exist_ok=True)
+        
+        previous = self._current_version()
+        number = int(previous[1:]) + 1 if previous else 1
+        version = f"v{number:06d}"
+        path = os.path.join(self.directory, version)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        
+        arrays = (self.indptr, self.indices, self.weights, self.relationships, self.edge_labels,
+                  self.node_documents)
+        for name, array in zip(_ARRAYS, arrays):
+            atomic_write(os.path.join(path, f"{name}.npy"), lambda tmp, array=array: np.save(tmp, array))
+        atomic_write_bytes(os.path.join(path, "tables.pkl"), pickle.dumps({
+            "node_ids": self.node_ids.values,
+            "documents": self.documents.values,
+            "kinds": self.kinds.values,
+            "labels": self.labels.values
+        }))
+        atomic_write_bytes(os.path.join(self.directory, "CURRENT"), version.encode('utf-8'))
+        
+        # Re-open the saved arrays memory-mapped, so they live in the page cache
+        self._set_base(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS))
+        self.snapshot_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        self.pending = bytearray()
+        self.log_strings = {}
+        self.log_bytes = 0
+        
+        if previous and previous != version:
+            # May fail on Windows while an old mapping is still open; retried next save
+            shutil.rmtree(os.path.join(self.directory, previous), ignore_errors=True)
+        return self.snapshot_bytes
+    
+    # Edge log
+    def _append_log(self, version: str) -> int:
+        """Append pending mutations as one frame (fsynced). Returns bytes written."""
+        if not self.pending:
+            return 0
+        payload = bytes(self.pending)
+        frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with open(os.path.join(self.directory, version, _LOG), 'ab') as f:
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = bytearray()
+        self.log_bytes += len(frame)
+        return len(frame)
+    
+    def _log_string(self, value: str) -> int:
+        string_id = self.log_strings.get(value)
+        if string_id is None:
+            string_id = self.log_strings[value] = len(self.log_strings)
+            data = value.encode('utf-8')
+            self.pending += _STRING.pack(_OP_STRING, string_id, len(data))
+            self.pending += data
+        return string_id
+    
+    def _replay_log(self, path: str):
+        """Apply the frames of an edge log; truncate it after the last intact frame"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        strings = []
+        offset = 0
+        self._journal = False
+        try:
+            while offset + _FRAME.size <= len(data):
+                length, checksum = _FRAME.unpack_from(data, offset)
+                payload = data[offset + _FRAME.size:offset + _FRAME.size + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                self._apply_records(payload, strings)
+                offset += _FRAME.size + length
+        finally:
+            self._journal = True
+        
+        if offset < len(data):
+            print(f"Dropping {len(data) - offset} bytes of incomplete graph log {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self.log_strings = {value: string_id for string_id, value in enumerate(strings)}
+        self.log_bytes = offset
+    
+    def _apply_records(self, payload: bytes, strings: List[str]):
+        offset = 0
+        while offset < len(payload):
+            op = payload[offset]
+            if op == _OP_STRING:
+                _, _, length = _STRING.unpack_from(payload, offset)
+                offset += _STRING.size
+                strings.append(payload[offset:offset + length].decode('utf-8'))
+                offset += length
+            elif op == _OP_EDGE:
+                _, u, v, weight, kind, label = _EDGE.unpack_from(payload, offset)
+                offset += _EDGE.size
+                relationship = strings[kind] if label < 0 else f"{strings[kind]}:{strings[label]}"
+                self.add_edges([(strings[u], strings[v], weight, relationship)])
+            elif op == _OP_NODE:
+                _, node, document = _NODE.unpack_from(payload, offset)
+                offset += _NODE.size
+                self.add_node(strings[node], strings[document] if document >= 0 else None)
+            elif op == _OP_UNLINK:
+                _, u, v = _UNLINK.unpack_from(payload, offset)
+                offset += _UNLINK.size
+                self.remove_edges([(strings[u], strings[v])])
+            elif op == _OP_REMOVE:
+                _, node = _REMOVE.unpack_from(payload, offset)
+                offset += _REMOVE.size
+                self.remove_nodes([strings[node]])
+            else:
+                raise ValueError(f"Corrupt graph log record (op {op})")
+    
+    # Nodes
+    def _code(self, chunk_id: str) -> Optional[int]:
+        return self.node_ids.codes.get(chunk_id)
+    
+    def _intern_node(self, chunk_id: str) -> int:
+        code = self.node_ids.codes.get(chunk_id)
+        if code is not None:
+            return code
+        
+        # New (or re-added after removal: the old code stays dead)
+        code = self.node_ids.code(chunk_id)
+        if code >= len(self.node_documents):
+            grown = np.full(max(16, 2 * len(self.node_documents)), -1, dtype=np.int32)
+            grown[:len(self.node_documents)] = self.node_documents
+            self.node_documents = grown
+        self.node_documents[code] = -1
+        return code
+    
+    def has_node(self, chunk_id: str) -> bool:
+        return self._code(chunk_id) is not None
+    
+    def add_node(self, chunk_id: str, document_id: Optional[str] = None):
+        code = self._intern_node(chunk_id)
+        if document_id is not None:
+            self.node_documents[code] = self.documents.code(document_id)
+        if self._journal:
+            self.pending += _NODE.pack(_OP_NODE, self._log_string(chunk_id),
+                                       self._log_string(document_id) if document_id is not None else -1)
+    
+    def set_document(self, chunk_ids: Iterable[str], document_id: str):
+        for chunk_id in chunk_ids:
+            self.add_node(chunk_id, document_id)
+    
+    def node_document(self, chunk_id: str) -> Optional[str]:
+        code = self._code(chunk_id)
+        if code is None or self.node_documents[code] < 0:
+            return None
+        return self.documents.values[self.node_documents[code]]
+    
+    def document_nodes(self, document_id: str) -> List[str]:
+        document = self.documents.codes.get(document_id)
+        if document is None:
+            return []
+        codes = np.flatnonzero(self.node_documents[:len(self.node_ids.values)] == document)
+        return [self.node_ids.values[code] for code in codes if code not in self.dead]
+    
+    def nodes_with_documents(self) -> List[Tuple[str, Optional[str]]]:
+        """(chunk_id, document_id) of every live node, in insertion order"""
+        documents = self.node_documents
+        return [(chunk_id, self.documents.values[documents[code]] if documents[code] >= 0 else None)
+                for chunk_id, code in self.node_ids.codes.items()]  # Codes are assigned in insertion order
+    
+    def remove_nodes(self, chunk_ids: Iterable[str]) -> int:
+        removed = 0
+        for chunk_id in chunk_ids:
+            code = self._code(chunk_id)
+            if code is None:
+                continue
+            for neighbor in list(self._neighbor_codes(code)):
+                self._remove_edge(code, neighbor)
+            self.dead.add(code)
+            del self.node_ids.codes[chunk_id]
+            self.delta_changes += 1
+            removed += 1
+            if self._journal:
+                self.pending += _REMOVE.pack(_OP_REMOVE, self._log_string(chunk_id))
+        self._maybe_merge()
+        return removed
+    
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids.codes)
+    
+    # Edges
+    def _base_entry(self, u: int, v: int) -> int:
+        """Position of v in u's base row, or -1"""
+        if u >= self.base_nodes or v >= self.base_nodes:
+            return -1
+        start, end = self.indptr[u], self.indptr[u + 1]
+        position = start + int(np.searchsorted(self.indices[start:end], v))
+        if position < end and self.indices[position] == v:
+            return position
+        return -1
+    
+    def _has_edge(self, u: int, v: int) -> bool:
+        if v in self.delta.get(u, ()):
+            return True
+        return (min(u, v), max(u, v)) not in self.hidden and self._base_entry(u, v) >= 0
+    
+    def add_edges(self, edges: Iterable[Tuple[str, str, float, str]]) -> int:
+        """Add or update (chunk_id_1, chunk_id_2, weight, relationship) edges. Returns the number of new edges."""
+        added = 0
+        for chunk_id_1, chunk_id_2, weight, relationship in edges:
+            u, v = self._intern_node(chunk_id_1), self._intern_node(chunk_id_2)
+            kind, label = split_relationship(relationship)
+            # Rounded to float16 like the base arrays and the edge log, so a merge or reload keeps the weight
+            attributes = (float(np.float16(weight)), self.kinds.code(kind), self.labels.code(label) if label is not None else -1)
+            
+            if not self._has_edge(u, v):
+                self.edges += 1
+                added += 1
+            elif self._base_entry(u, v) >= 0:
+                self.hidden.add((min(u, v), max(u, v)))
+            
+            self.delta.setdefault(u, {})[v] = attributes
+            self.delta.setdefault(v, {})[u] = attributes
+            self.delta_changes += 1
+            
+            if self._journal:
+                self.pending += _EDGE.pack(_OP_EDGE, self._log_string(chunk_id_1), self._log_string(chunk_id_2),
+                                           weight, self._log_string(kind),
+                                           self._log_string(label) if label is not None else -1)
+        
+        self._maybe_merge()
+        return added
+    
+    def _remove_edge(self, u: int, v: int) -> bool:
+        if not self._has_edge(u, v):
+            return False
+        
+        for a, b in ((u, v), (v, u)):
+            neighbors = self.delta.get(a)
+            if neighbors is not None:
+                neighbors.pop(b, None)
+                if not neighbors:
+                    del self.delta[a]
+        if self._base_entry(u, v) >= 0:
+            self.hidden.add((min(u, v), max(u, v)))
+        
+        self.edges -= 1
+        self.delta_changes += 1
+        return True
+    
+    def remove_edges(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        removed = 0
+        for chunk_id_1, chunk_id_2 in pairs:
+            u, v = self._code(chunk_id_1), self._code(chunk_id_2)
+            if u is not None and v is not None and self._remove_edge(u, v):
+                removed += 1
+                if self._journal:
+                    self.pending += _UNLINK.pack(_OP_UNLINK, self._log_string(chunk_id_1),
+                                                 self._log_string(chunk_id_2))
+        self._maybe_merge()
+        return removed
+    
+    def number_of_edges(self) -> int:
+        return self.edges
+    
+    # Reads
+    def _neighbor_entries(self, code: int):
+        """Yield (neighbor code, weight, kind code, label code) of a live node"""
+        if code < self.base_nodes:
+            start, end = self.indptr[code], self.indptr[code + 1]
+            entries = zip(self.indices[start:end].tolist(), self.weights[start:end].tolist(),
+                          self.relationships[start:end].tolist(), self.edge_labels[start:end].tolist())
+            if self.dead or self.hidden:
+                entries = [entry for entry in entries if entry[0] not in self.dead
+                           and (min(code, entry[0]), max(code, entry[0])) not in self.hidden]
+            yield from entries
+        for neighbor, (weight, kind, label) in self.delta.get(code, {}).items():
+            yield neighbor, weight, kind, label
+    
+    def _neighbor_codes(self, code: int) -> List[int]:
+        """Neighbor codes of a live node, reading only the indices array"""
+        neighbors = []
+        if code < self.base_nodes:
+            neighbors = self.indices[self.indptr[code]:self.indptr[code + 1]].tolist()
+            if self.dead or self.hidden:
+                neighbors = [neighbor for neighbor in neighbors if neighbor not in self.dead
+                             and (min(code, neighbor), max(code, neighbor)) not in self.hidden]
+        delta = self.delta.get(code)
+        if delta:
+            neighbors.extend(delta)
+        return neighbors
+    
+    def _relationship(self, kind: int, label: int) -> str:
+        kind = self.kinds.values[kind]
+        return kind if label < 0 else f"{kind}:{self.labels.values[label]}"
+    
+    def neighbors(self, chunk_id: str) -> List[str]:
+        code = self._code(chunk_id)
+        if code is None:
+            return []
+        values = self.node_ids.values
+        return [values[neighbor] for neighbor in self._neighbor_codes(code)]
+    
+    def weighted_neighbors(self, chunk_id: str) -> List[Tuple[str, float]]:
+        """(neighbor, weight) for every edge of a chunk, without building relationship strings"""
+        code = self._code(chunk_id)
+        if code is None:
+            return []
+        values = self.node_ids.values
+        if code < self.base_nodes and not self.dead and not self.hidden:
+            start, end = self.indptr[code], self.indptr[code + 1]
+            pairs = [(values[neighbor], weight) for neighbor, weight
+                     in zip(self.indices[start:end].tolist(), self.weights[start:end].tolist())]
+            pairs.extend((values[neighbor], weight) for neighbor, (weight, _, _) in self.delta.get(code, {}).items())
+            return pairs
+        return [(values[neighbor], weight) for neighbor, weight, _, _ in self._neighbor_entries(code)]
+    
+    def edges_of(self, chunk_id: str) -> List[Tuple[str, float, str]]:
+        """(neighbor, weight, relationship) for every edge of a chunk"""
+        code = self._code(chunk_id)
+        if code is None:
+            return []
+        return [(self.node_ids.values[neighbor], weight, self._relationship(kind, label))
+                for neighbor, weight, kind, label in self._neighbor_entries(code)]
+    
+    def edges_among(self, chunk_ids: Iterable[str]) -> List[Tuple[str, str, str]]:
+        """(chunk_id_1, chunk_id_2, relationship) for edges with both ends in chunk_ids"""
+        codes = {code for code in map(self._code, chunk_ids) if code is not None}
+        edges = []
+        for code in codes:
+            for neighbor, _, kind, label in self._neighbor_entries(code):
+                if neighbor in codes and code <= neighbor:
+                    edges.append((self.node_ids.values[code], self.node_ids.values[neighbor],
+                                  self._relationship(kind, label)))
+        return edges
+    
+    # Merging
+    def _maybe_merge(self):
+        if self.delta_changes >= GRAPH_DELTA_MAX_EDGES:
+            self.merge()
+    
+    def merge(self):
+        """Fold the delta buffer into new CSR arrays, dropping removed nodes"""
+        if not self.delta_changes and len(self.node_ids.values) == self.base_nodes:
+            return
+        
+        total = len(self.node_ids.values)
+        alive = np.zeros(total, dtype=bool)
+        alive[list(self.node_ids.codes.values())] = True
+        remap = np.full(total, -1, dtype=np.int64)
+        remap[alive] = np.arange(int(alive.sum()))
+        
+        # Base entries that survive
+        rows = self._row_of_entries().astype(np.int64)
+        cols = np.asarray(self.indices, dtype=np.int64)
+        keep = alive[rows] & alive[cols] if len(rows) else np.zeros(0, dtype=bool)
+        if self.hidden and len(rows):
+            hidden = np.array([u * total + v for u, v in self.hidden], dtype=np.int64)
+            keys = np.minimum(rows, cols) * total + np.maximum(rows, cols)
+            keep &= ~np.isin(keys, hidden)
+        
+        # Delta entries (already symmetric)
+        delta = [(u, v, attributes) for u, neighbors in self.delta.items() for v, attributes in neighbors.items()
+                 if alive[u] and alive[v]]
+        delta_rows = np.array([u for u, _, _ in delta], dtype=np.int64)
+        delta_cols = np.array([v for _, v, _ in delta], dtype=np.int64)
+        
+        rows = np.concatenate([remap[rows[keep]], remap[delta_rows]])
+        cols = np.concatenate([remap[cols[keep]], remap[delta_cols]])
+        weights = np.concatenate([np.asarray(self.weights)[keep],
+                                  np.array([a[0] for _, _, a in delta], dtype=np.float16)])
+        kinds = np.concatenate([np.asarray(self.relationships)[keep],
+                                np.array([a[1] for _, _, a in delta], dtype=np.uint8)])
+        labels = np.concatenate([np.asarray(self.edge_labels)[keep],
+                                 np.array([a[2] for _, _, a in delta], dtype=np.int32)])
+        
+        order = np.lexsort((cols, rows))
+        nodes = int(alive.sum())
+        indptr = np.zeros(nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=nodes), out=indptr[1:])
+        
+        node_ids = [self.node_ids.values[code] for code in np.flatnonzero(alive)]
+        node_documents = self.node_documents[:total][alive]
+        
+        self.node_ids = _Interned(node_ids)
+        self.dead = set()
+        self._set_base(indptr, cols[order].astype(np.int32), weights[order], kinds[order], labels[order],
+                       node_documents)
@@ -4,11 +4,12 @@ FAISS HNSW Vector Store for Embedding Storage
 import os
 import faiss
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Set
 import pickle
 import sys
 sys.path.append('..')
-from config import FAISS_INDEX_PATH, EMBEDDING_DIMENSION, TOP_K_RESULTS
+from .persistence import atomic_write, atomic_write_bytes
+from config import FAISS_INDEX_PATH, EMBEDDING_DIMENSION, TOP_K_RESULTS, TOMBSTONE_COMPACT_RATIO
 
 
 class FAISSStore:
@@ -26,6 +27,13 @@ class FAISSStore:
         self.chunk_to_id = {}
         self.current_id = 0
         
+        # Internal IDs of removed vectors (HNSW has no cheap delete); searches over-fetch
+        # by their number, so the index is rebuilt once they pass TOMBSTONE_COMPACT_RATIO
+        self.tombstones = set()
+        
+        # Mutations since the last save (see PersistenceManager)
+        self.dirty_ops = 0
+        
         # Load or create index
         self._load_or_create_index()
     
@@ -38,13 +46,24 @@ class FAISSStore:
                 self.id_to_chunk = data['id_to_chunk']
                 self.chunk_to_id = data['chunk_to_id']
                 self.current_id = data['current_id']
+                self.tombstones = data.get('tombstones', set())
+            
+            # index.faiss is saved before id_map.pkl: vectors added by an interrupted
+            # save have no chunk; skip their positions so new IDs stay aligned
+            if self.index.ntotal > self.current_id:
+                self.tombstones.update(range(self.current_id, self.index.ntotal))
+                self.current_id = self.index.ntotal
         else:
-            # Create HNSW index with 32 links per node
-            self.index = faiss.IndexHNSWFlat(self.dimension, 32)
-            # Set efConstruction for build-time accuracy
-            self.index.hnsw.efConstruction = 128
-            # Set efSearch for query-time accuracy
-            self.index.hnsw.efSearch = 64
+            self.index = self._new_index()
+    
+    def _new_index(self):
+        # Create HNSW index with 32 links per node
+        index = faiss.IndexHNSWFlat(self.dimension, 32)
+        # Set efConstruction for build-time accuracy
+        index.hnsw.efConstruction = 128
+        # Set efSearch for query-time accuracy
+        index.hnsw.efSearch = 64
+        return index
     
     def add(self, chunk_id: str, embedding: List[float]) -> int:
         """Add embedding with associated chunk ID"""
@@ -62,6 +81,7 @@ class FAISSStore:
         self.id_to_chunk[internal_id] = chunk_id
         self.chunk_to_id[chunk_id] = internal_id
         self.current_id += 1
+        self.dirty_ops += 1
         
         return internal_id
     
@@ -80,8 +100,8 @@ class FAISSStore:
         # Convert to numpy array
         query_vector = np.array([query_embedding], dtype=np.float32)
         
-        # Search
-        distances, indices = self.index.search(query_vector, min(top_k, self.index.ntotal))
+        # Search (over-fetch so tombstoned hits can be dropped)
+        distances, indices = self.index.search(query_vector, min(top_k + len(self.tombstones), self.index.ntotal))
         
         # Map back to chunk IDs
         results = []
@@ -91,23 +111,99 @@ class FAISSStore:
                 similarity = 1 / (1 + dist)
                 results.append((self.id_to_chunk[idx], similarity))
         
+        return results[:top_k]
+    
+    def search_among(self, query_embedding: List[float], chunk_ids: List[str],
+                     top_k: int = TOP_K_RESULTS) -> List[Tuple[str, float]]:
+        """Exact search restricted to the given chunks, scored like search (vectors read back from the index)"""
+        ids = [self.chunk_to_id[chunk_id] for chunk_id in chunk_ids if chunk_id in self.chunk_to_id]
+        if not ids:
+            return []
+        
+        candidate_vectors = np.vstack([self.index.reconstruct(int(internal_id)) for internal_id in ids])
+        distances = np.sum((candidate_vectors - np.array(query_embedding, dtype=np.float32)) ** 2, axis=1)
+        order = np.argsort(distances)[:top_k]
+        return [(self.id_to_chunk[ids[i]], float(1 / (1 + distances[i]))) for i in order]
+    
+    def get_vectors(self, chunk_ids: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Stored vectors of the given chunks (read back from the index); returns (chunk IDs found, vectors)"""
+        found = [chunk_id for chunk_id in chunk_ids if chunk_id in self.chunk_to_id]
+        vectors = np.zeros((len(found), self.dimension), dtype=np.float32)
+        for row, chunk_id in enumerate(found):
+            vectors[row] = self.index.reconstruct(int(self.chunk_to_id[chunk_id]))
+        return found, vectors
+    
+    def search_batch(self, query_embeddings, top_k: int = TOP_K_RESULTS,
+                     exclude: Optional[Set[str]] = None) -> List[List[Tuple[str, float]]]:
+        """k-NN for many queries in one index call; chunk IDs in exclude are never returned"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if self.index.ntotal == 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        
+        exclude = exclude or set()
+        fetch = min(top_k + len(self.tombstones) + len(exclude), self.index.ntotal)
+        distances, indices = self.index.search(queries, fetch)
+        
+        results = []
+        for row_indices, row_distances in zip(indices, distances):
+            row = []
+            for idx, dist in zip(row_indices, row_distances):
+                chunk_id = self.id_to_chunk.get(idx)
+                if idx != -1 and chunk_id is not None and chunk_id not in exclude:
+                    row.append((chunk_id, 1 / (1 + dist)))
+            results.append(row[:top_k])
         return results
     
+    def remove(self, chunk_ids: List[str]) -> int:
+        """Tombstone the vectors of removed chunks; they are skipped by search"""
+        removed = 0
+        for chunk_id in chunk_ids:
+            internal_id = self.chunk_to_id.pop(chunk_id, None)
+            if internal_id is None:
+                continue
+            self.id_to_chunk.pop(internal_id, None)
+            self.tombstones.add(internal_id)
+            removed += 1
+        self.dirty_ops += removed
+        
+        if len(self.tombstones) > TOMBSTONE_COMPACT_RATIO * self.index.ntotal:
+            self.compact()
+        return removed
+    
+    def compact(self):
+        """Rebuild the index from the live vectors and renumber internal IDs"""
+        if not self.tombstones:
+            return
+        
+        keep = [i for i in range(self.index.ntotal) if i not in self.tombstones]
+        chunk_ids = [self.id_to_chunk[i] for i in keep]
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)[keep] if keep else None
+        
+        self.index = self._new_index()
+        if vectors is not None:
+            self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        
+        self.id_to_chunk = dict(enumerate(chunk_ids))
+        self.chunk_to_id = {chunk_id: i for i, chunk_id in self.id_to_chunk.items()}
+        self.current_id = len(chunk_ids)
+        self.tombstones = set()
+        self.dirty_ops += 1
+    
     def save(self):
-        """Persist index and mappings to disk"""
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        faiss.write_index(self.index, self.index_path)
-        
-        with open(self.id_map_path, 'wb') as f:
-            pickle.dump({
-                'id_to_chunk': self.id_to_chunk,
-                'chunk_to_id': self.chunk_to_id,
-                'current_id': self.current_id
-            }, f)
+        """Persist index and mappings to disk (each file via atomic rename)"""
+        pending = self.dirty_ops
+        atomic_write(self.index_path, lambda path: faiss.write_index(self.index, path))
+        atomic_write_bytes(self.id_map_path, pickle.dumps({
+            'id_to_chunk': self.id_to_chunk,
+            'chunk_to_id': self.chunk_to_id,
+            'current_id': self.current_id,
+            'tombstones': self.tombstones
+        }))
+        self.dirty_ops -= pending
     
     def count(self) -> int:
         """Return number of vectors in index"""
-        return self.index.ntotal
+        return self.index.ntotal - len(self.tombstones)
 
 
 # Singleton instance
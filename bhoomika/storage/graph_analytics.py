@@ -0,0 +1,237 @@
+"""
+Knowledge Graph Structure and Traversal Statistics
+"""
+import threading
+import heapq
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Tuple
+import sys
+sys.path.append('..')
+from config import GRAPH_STATS_HUB_MIN_DEGREE, GRAPH_STATS_RECENT_QUERIES
+from .csr_graph import split_relationship
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """q-th percentile of sorted values (nearest rank)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def _degree_bucket(degree: int) -> str:
+    """Power-of-two bucket: 1, 2-3, 4-7, ..."""
+    low = 1 << (degree.bit_length() - 1)
+    high = (low << 1) - 1
+    return str(low) if low == high else f"{low}-{high}"
+
+
+class TraversalLog:
+    """Per-query nodes visited and latency of one kind of traversal"""
+    
+    def __init__(self, recent: int = GRAPH_STATS_RECENT_QUERIES):
+        self.queries = 0
+        self.total_nodes = 0
+        self.total_ms = 0.0
+        self.max_nodes = 0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=recent)  # (nodes, ms) of the latest queries, for percentiles
+    
+    def record(self, nodes: int, ms: float):
+        self.queries += 1
+        self.total_nodes += nodes
+        self.total_ms += ms
+        self.max_nodes = max(self.max_nodes, nodes)
+        self.max_ms = max(self.max_ms, ms)
+        self.recent.append((nodes, ms))
+    
+    def get_stats(self) -> Dict:
+        nodes = sorted(n for n, _ in self.recent)
+        ms = sorted(m for _, m in self.recent)
+        return {
+            "queries": self.queries,
+            "mean_nodes": round(self.total_nodes / self.queries, 1) if self.queries else 0.0,
+            "p95_nodes": _percentile(nodes, 95),
+            "max_nodes": self.max_nodes,
+            "mean_ms": round(self.total_ms / self.queries, 3) if self.queries else 0.0,
+            "p50_ms": round(_percentile(ms, 50), 3),
+            "p95_ms": round(_percentile(ms, 95), 3),
+            "max_ms": round(self.max_ms, 3)
+        }
+
+
+class GraphAnalytics:
+    """
+    Degree distribution, hubs, edges by relationship and connected components
+    of the graph, kept up to date as KnowledgeGraph writes it.
+    
+    Nothing is tracked until the first get_stats call, which scans the graph
+    once. After that, KnowledgeGraph passes the edge profile
+    (relationship -> edge count) of every chunk a write touches, read
+    before and after the write, and only those chunks are re-counted.
+    Components are a union-find: added edges union their ends, removals
+    mark it stale and it is rebuilt by the next get_stats call.
+    
+    Also keeps a TraversalLog per traversal kind: 'pagerank' (the graph
+    score of every retrieval) and 'expansion' (get_related_chunks calls,
+    which retrieval does not make).
+    """
+    
+    def __init__(self, hub_min_degree: int = GRAPH_STATS_HUB_MIN_DEGREE):
+        self.hub_min_degree = hub_min_degree
+        self.lock = threading.RLock()  # Held by KnowledgeGraph across each write, so a scan never sees half of one
+        self.traversal_lock = threading.Lock()  # Queries never wait for a scan
+        self.traversals = {"expansion": TraversalLog(), "pagerank": TraversalLog()}
+        self.reset()
+    
+    def reset(self):
+        """Forget the structure counts (rebuilt on the next get_stats call)"""
+        with self.lock:
+            self.built = False
+            self.degree_counts = Counter()  # Degree -> chunks with it (degree > 0 only)
+            self.relationship_ends = Counter()  # Relationship -> edge endpoints (2 per edge)
+            self.hubs: Dict[str, int] = {}  # Chunks with degree >= hub_min_degree
+            self.parent: Dict[str, str] = {}  # Union-find over chunks with edges
+            self.sizes: Dict[str, int] = {}  # Component root -> size
+            self.components_stale = True
+    
+    @staticmethod
+    def profile(graph, chunk_ids: Iterable[str]) -> Dict[str, Counter]:
+        """Relationship -> edge count of each chunk (empty for absent chunks)"""
+        return {chunk_id: Counter(relationship for _, _, relationship in graph.edges_of(chunk_id))
+                for chunk_id in chunk_ids}
+    
+    def update(self, before: Dict[str, Counter], after: Dict[str, Counter]):
+        """Replace the touched chunks' old edge profiles by their new ones"""
+        with self.lock:
+            if not self.built:
+                return
+            for chunk_id, old in before.items():
+                new = after.get(chunk_id, Counter())
+                self._set_degree(chunk_id, sum(old.values()), sum(new.values()))
+                self.relationship_ends.subtract(old)
+                self.relationship_ends.update(new)
+    
+    def _set_degree(self, chunk_id: str, old: int, new: int):
+        if old == new:
+            return
+        if old:
+            self.degree_counts[old] -= 1
+            if not self.degree_counts[old]:
+                del self.degree_counts[old]
+        if new:
+            self.degree_counts[new] += 1
+        if new >= self.hub_min_degree:
+            self.hubs[chunk_id] = new
+        else:
+            self.hubs.pop(chunk_id, None)
+    
+    def link(self, pairs: Iterable[Tuple[str, str]]):
+        """Union the ends of added edges"""
+        with self.lock:
+            if self.built and not self.components_stale:
+                for chunk_id_1, chunk_id_2 in pairs:
+                    self._union(chunk_id_1, chunk_id_2)
+    
+    def unlink(self):
+        """Edges were removed: components may have split"""
+        with self.lock:
+            self.components_stale = True
+    
+    def _find(self, chunk_id: str) -> str:
+        parent = self.parent
+        root = chunk_id
+        while parent[root] != root:
+            root = parent[root]
+        while parent[chunk_id] != root:  # Path compression
+            parent[chunk_id], chunk_id = root, parent[chunk_id]
+        return root
+    
+    def _union(self, chunk_id_1: str, chunk_id_2: str):
+        for chunk_id in (chunk_id_1, chunk_id_2):
+            if chunk_id not in self.parent:
+                self.parent[chunk_id] = chunk_id
+                self.sizes[chunk_id] = 1
+        root_1, root_2 = self._find(chunk_id_1), self._find(chunk_id_2)
+        if root_1 == root_2:
+            return
+        if self.sizes[root_1] < self.sizes[root_2]:
+            root_1, root_2 = root_2, root_1
+        self.parent[root_2] = root_1
+        self.sizes[root_1] += self.sizes.pop(root_2)
+    
+    def _build(self, graph):
+        """Count everything from one scan of the graph"""
+        self.reset()
+        self.built = True
+        self.components_stale = False
+        for chunk_id, _ in graph.nodes_with_documents():
+            edges = graph.edges_of(chunk_id)
+            self._set_degree(chunk_id, 0, len(edges))
+            self.relationship_ends.update(relationship for _, _, relationship in edges)
+            for neighbor, _, _ in edges:
+                self._union(chunk_id, neighbor)
+    
+    def _rebuild_components(self, graph):
+        self.parent.clear()
+        self.sizes.clear()
+        for chunk_id, _ in graph.nodes_with_documents():
+            for neighbor in graph.neighbors(chunk_id):
+                self._union(chunk_id, neighbor)
+        self.components_stale = False
+    
+    def record_traversal(self, kind: str, nodes: int, ms: float):
+        with self.traversal_lock:
+            self.traversals[kind].record(nodes, ms)
+    
+    def get_stats(self, graph, top_n: int = 10) -> Dict:
+        """Structure of the graph and per-query traversal costs"""
+        with self.lock:
+            if not self.built:
+                self._build(graph)
+            elif self.components_stale:
+                self._rebuild_components(graph)
+            
+            nodes = graph.number_of_nodes()
+            connected = sum(self.degree_counts.values())
+            buckets = Counter()
+            for degree, count in self.degree_counts.items():
+                buckets[degree.bit_length()] += count
+            histogram = [{"degree": "0", "nodes": nodes - connected}] + [
+                {"degree": _degree_bucket(1 << (bits - 1)), "nodes": buckets[bits]} for bits in sorted(buckets)]
+            degree_sum = sum(degree * count for degree, count in self.degree_counts.items())
+            
+            kinds = Counter()
+            concepts = Counter()
+            for relationship, ends in self.relationship_ends.items():
+                if ends > 0:
+                    kind, label = split_relationship(relationship)
+                    kinds[kind] += ends
+                    if label is not None:
+                        concepts[label] += ends // 2
+            
+            sizes = sorted(self.sizes.values(), reverse=True)
+            isolated = nodes - len(self.parent)
+            
+            return {
+                "nodes": nodes,
+                "edges": graph.number_of_edges(),
+                "degree": {
+                    "mean": round(degree_sum / nodes, 2) if nodes else 0.0,
+                    "max": max(self.degree_counts, default=0),
+                    "histogram": histogram
+                },
+                "hubs": [{"chunk_id": chunk_id, "degree": degree}
+                         for chunk_id, degree in heapq.nsmallest(top_n, self.hubs.items(), key=lambda item: (-item[1], item[0]))],
+                "edges_by_relationship": {kind: ends // 2 for kind, ends in kinds.most_common()},
+                "top_concepts": [{"concept": label, "edges": edges} for label, edges in concepts.most_common(top_n)],
+                "components": {
+                    "count": len(sizes) + isolated,
+                    "isolated_nodes": isolated,
+                    "largest": sizes[:top_n]
+                },
+                "traversals": self.get_traversal_stats()
+            }
+    
+    def get_traversal_stats(self) -> Dict:
+        with self.traversal_lock:
+            return {kind: log.get_stats() for kind, log in self.traversals.items()}
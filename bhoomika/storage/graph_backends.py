@@ -0,0 +1,172 @@
+"""
+Graph Storage Backends for the Knowledge Graph
+"""
+import os
+import time
+import pickle
+import networkx as nx
+from typing import List, Optional, Tuple, Iterable, Dict
+import sys
+sys.path.append('..')
+from config import GRAPH_PATH, GRAPH_BACKEND, SQLITE_DB_PATH
+from .persistence import atomic_write
+from .csr_graph import CSRGraph
+from .sqlite_graph import SQLiteGraph
+
+
+class NetworkXGraph:
+    """
+    networkx.Graph storage, pickled as a whole (the original format).
+    
+    Every backend implements the same primitives, used by KnowledgeGraph:
+    has_node, add_node, set_document, node_document, document_nodes,
+    nodes_with_documents, remove_nodes, add_edges, remove_edges, neighbors,
+    weighted_neighbors, edges_of, edges_among, number_of_nodes, number_of_edges, save and
+    get_stats (with last_save: the mode, bytes and seconds of the last save).
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(path):
+            # Same format as the removed nx.read_gpickle / nx.write_gpickle
+            with open(path, 'rb') as f:
+                self.graph = pickle.load(f)
+        else:
+            self.graph = nx.Graph()
+        self.last_save = None
+    
+    def save(self):
+        start = time.perf_counter()
+        atomic_write(self.path, lambda tmp_path: self._dump(tmp_path))
+        self.last_save = {"mode": "pickle", "bytes": os.path.getsize(self.path),
+                          "seconds": round(time.perf_counter() - start, 4)}
+    
+    def get_stats(self) -> Dict:
+        return {"pickle_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "last_save": self.last_save}
+    
+    def _dump(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self.graph, f, pickle.HIGHEST_PROTOCOL)
+    
+    # Nodes
+    def has_node(self, chunk_id: str) -> bool:
+        return chunk_id in self.graph
+    
+    def add_node(self, chunk_id: str, document_id: Optional[str] = None):
+        self.graph.add_node(chunk_id)
+        if document_id is not None:
+            self.graph.nodes[chunk_id]['document_id'] = document_id
+    
+    def set_document(self, chunk_ids: Iterable[str], document_id: str):
+        for chunk_id in chunk_ids:
+            self.add_node(chunk_id, document_id)
+    
+    def node_document(self, chunk_id: str) -> Optional[str]:
+        if chunk_id not in self.graph:
+            return None
+        return self.graph.nodes[chunk_id].get('document_id')
+    
+    def document_nodes(self, document_id: str) -> List[str]:
+        return [node for node, node_document in self.graph.nodes(data='document_id')
+                if node_document == document_id]
+    
+    def nodes_with_documents(self) -> List[Tuple[str, Optional[str]]]:
+        """(chunk_id, document_id) of every node, in insertion order"""
+        return list(self.graph.nodes(data='document_id'))
+    
+    def remove_nodes(self, chunk_ids: Iterable[str]) -> int:
+        present = [chunk_id for chunk_id in chunk_ids if chunk_id in self.graph]
+        self.graph.remove_nodes_from(present)
+        return len(present)
+    
+    def number_of_nodes(self) -> int:
+        return self.graph.number_of_nodes()
+    
+    # Edges
+    def add_edges(self, edges: Iterable[Tuple[str, str, float, str]]) -> int:
+        """Add or update (chunk_id_1, chunk_id_2, weight, relationship) edges. Returns the number of new edges."""
+        before = self.graph.number_of_edges()
+        self.graph.add_edges_from(
+            (u, v, {"weight": weight, "relationship": relationship}) for u, v, weight, relationship in edges
+        )
+        return self.graph.number_of_edges() - before
+    
+    def remove_edges(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        present = [(u, v) for u, v in pairs if self.graph.has_edge(u, v)]
+        self.graph.remove_edges_from(present)
+        return len(present)
+    
+    def number_of_edges(self) -> int:
+        return self.graph.number_of_edges()
+    
+    # Reads
+    def neighbors(self, chunk_id: str) -> List[str]:
+        if chunk_id not in self.graph:
+            return []
+        return list(self.graph.neighbors(chunk_id))
+    
+    def weighted_neighbors(self, chunk_id: str) -> List[Tuple[str, float]]:
+        """(neighbor, weight) for every edge of a chunk"""
+        if chunk_id not in self.graph:
+            return []
+        return [(neighbor, data.get('weight', 1.0)) for neighbor, data in self.graph[chunk_id].items()]
+    
+    def edges_of(self, chunk_id: str) -> List[Tuple[str, float, str]]:
+        """(neighbor, weight, relationship) for every edge of a chunk"""
+        if chunk_id not in self.graph:
+            return []
+        return [(neighbor, data.get('weight', 1.0), data.get('relationship', 'related'))
+                for _, neighbor, data in self.graph.edges(chunk_id, data=True)]
+    
+    def edges_among(self, chunk_ids: Iterable[str]) -> List[Tuple[str, str, str]]:
+        """(chunk_id_1, chunk_id_2, relationship) for edges with both ends in chunk_ids"""
+        return list(self.graph.subgraph(chunk_ids).edges(data='relationship', default='related'))
+
+
+def copy_graph(source, target):
+    """Copy every node (with its document) and edge from one backend into another"""
+    documents: Dict[Optional[str], List[str]] = {}
+    for chunk_id, document_id in source.graph.nodes(data='document_id'):
+        documents.setdefault(document_id, []).append(chunk_id)
+    for document_id, chunk_ids in documents.items():
+        if document_id is None:
+            for chunk_id in chunk_ids:
+                target.add_node(chunk_id)
+        else:
+            target.set_document(chunk_ids, document_id)  # One write per document
+    target.add_edges(
+        (u, v, data.get('weight', 1.0), data.get('relationship', 'related'))
+        for u, v, data in source.graph.edges(data=True)
+    )
+
+
+def open_graph(backend: str = GRAPH_BACKEND, graph_path: str = GRAPH_PATH):
+    """
+    Open the graph storage for a backend name ('csr', 'sqlite' or 'networkx').
+    
+    The CSR arrays live in <graph_path without extension>_csr/. The sqlite
+    edge table lives in SQLITE_DB_PATH for the default graph path, else in
+    <graph_path without extension>.db. If they do not exist yet but a
+    networkx pickle does, it is converted once.
+    """
+    if backend == "networkx":
+        return NetworkXGraph(graph_path)
+    
+    if backend == "csr":
+        graph = CSRGraph(os.path.splitext(graph_path)[0] + "_csr")
+        if graph.number_of_nodes() == 0 and os.path.exists(graph_path):
+            print(f"Converting {graph_path} to CSR arrays...")
+            copy_graph(NetworkXGraph(graph_path), graph)
+            graph.save()
+        return graph
+    
+    if backend == "sqlite":
+        db_path = SQLITE_DB_PATH if graph_path == GRAPH_PATH else os.path.splitext(graph_path)[0] + ".db"
+        graph = SQLiteGraph(db_path)
+        if graph.number_of_nodes() == 0 and os.path.exists(graph_path):
+            print(f"Converting {graph_path} to the sqlite edge table...")
+            copy_graph(NetworkXGraph(graph_path), graph)
+        return graph
+    
+    raise ValueError(f"Unknown graph backend: {backend}")
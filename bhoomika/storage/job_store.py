@@ -0,0 +1,175 @@
+"""
+SQLite Store for Ingestion Jobs
+"""
+import os
+import json
+import uuid
+import socket
+from typing import Optional
+from sqlalchemy import Column, String, Text, DateTime, or_
+from sqlalchemy.orm import sessionmaker, scoped_session
+from datetime import datetime, timedelta
+import sys
+sys.path.append('..')
+from config import SQLITE_DB_PATH, INGEST_JOB_STALE_SECONDS
+from .sqlite_store import Base, get_engine
+
+# Stages reported by DocumentIngestion.ingest_file(on_stage=...)
+INGEST_STAGES = ("extract", "chunk", "embed", "persist", "graph", "save")
+
+
+class IngestionJob(Base):
+    """Queued file ingestion, processed by the single ingestion worker"""
+    __tablename__ = 'ingestion_jobs'
+    
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed
+    filename = Column(String(255), nullable=False)
+    filepath = Column(String(500))  # Upload on disk, removed once the job finishes
+    title = Column(String(500))
+    description = Column(Text)
+    stage = Column(String(20))  # Stage currently running
+    progress = Column(Text)  # JSON: stage -> {status, seconds}
+    document_id = Column(String(50))
+    result = Column(Text)  # JSON: document version and store stats
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    owner = Column(String(100))  # JobStore.owner of the process running the job
+    heartbeat_at = Column(DateTime)  # Refreshed by the owner while the job runs
+    
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "title": self.title,
+            "stage": self.stage,
+            "stages": json.loads(self.progress) if self.progress else {},
+            "document_id": self.document_id,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobStore:
+    """
+    Persistent ingestion job queue.
+    
+    Uses a thread-local session, so API handlers and the worker thread
+    can share one store. Several processes may share the queue: a job is
+    claimed by one conditional UPDATE, and its owner refreshes a heartbeat
+    while it runs. Jobs survive restarts: anything left running by a
+    process whose heartbeat went stale is re-queued by requeue_interrupted().
+    """
+    
+    def __init__(self, db_path: str = SQLITE_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.engine = get_engine(db_path)
+        Base.metadata.create_all(self.engine, tables=[IngestionJob.__table__])
+        self.session = scoped_session(sessionmaker(bind=self.engine, expire_on_commit=False))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def create_job(self, filename: str, filepath: str, title: str = None,
+                   description: str = None, job_id: str = None) -> IngestionJob:
+        """Queue a new job"""
+        job = IngestionJob(
+            id=job_id or uuid.uuid4().hex,
+            status='queued',
+            filename=filename,
+            filepath=filepath,
+            title=title or filename,
+            description=description,
+            progress=json.dumps({stage: {"status": "pending"} for stage in INGEST_STAGES})
+        )
+        self.session.add(job)
+        self.session.commit()
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Get job by ID (fresh from the database)"""
+        self.session.expire_all()
+        return self.session.query(IngestionJob).filter_by(id=job_id).first()
+    
+    def claim_next(self) -> Optional[IngestionJob]:
+        """
+        Mark the oldest queued job as running and return it.
+        
+        The claim is one UPDATE guarded by status = 'queued', so when
+        several workers race for a job exactly one of them gets it; the
+        others move on to the next queued job.
+        """
+        while True:
+            job_id = (self.session.query(IngestionJob.id).filter_by(status='queued')
+                      .order_by(IngestionJob.created_at).limit(1).scalar())
+            # End the read snapshot, so the claim waits for other writers instead of failing
+            self.session.commit()
+            if job_id is None:
+                return None
+            
+            now = datetime.utcnow()
+            claimed = (self.session.query(IngestionJob)
+                       .filter(IngestionJob.id == job_id, IngestionJob.status == 'queued')
+                       .update({IngestionJob.status: 'running', IngestionJob.owner: self.owner,
+                                IngestionJob.started_at: now, IngestionJob.heartbeat_at: now},
+                               synchronize_session=False))
+            self.session.commit()
+            if claimed == 1:
+                return self.get_job(job_id)
+    
+    def heartbeat(self) -> int:
+        """Refresh the heartbeat of every job this process is running"""
+        count = (self.session.query(IngestionJob).filter_by(status='running', owner=self.owner)
+                 .update({IngestionJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False))
+        self.session.commit()
+        return count
+    
+    def update_progress(self, job: IngestionJob, stage: Optional[str], progress: dict):
+        """Record the running stage and per-stage progress"""
+        job.stage = stage
+        job.progress = json.dumps(progress)
+        job.heartbeat_at = datetime.utcnow()
+        self.session.commit()
+    
+    def complete_job(self, job: IngestionJob, document_id: str, result: dict):
+        job.status = 'completed'
+        job.stage = None
+        job.document_id = document_id
+        job.result = json.dumps(result)
+        job.finished_at = datetime.utcnow()
+        self.session.commit()
+    
+    def fail_job(self, job: IngestionJob, error: str):
+        job.status = 'failed'
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        self.session.commit()
+    
+    def requeue_interrupted(self, stale_seconds: float = INGEST_JOB_STALE_SECONDS) -> int:
+        """
+        Put jobs whose owner stopped sending heartbeats (a crashed or killed
+        process) back in the queue. Jobs other live workers are running are
+        left alone.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        count = (self.session.query(IngestionJob)
+                 .filter(IngestionJob.status == 'running',
+                         or_(IngestionJob.heartbeat_at == None, IngestionJob.heartbeat_at < stale_before))
+                 .update({IngestionJob.status: 'queued', IngestionJob.stage: None, IngestionJob.owner: None},
+                         synchronize_session=False))
+        self.session.commit()
+        return count
+
+
+# Singleton instance
+_store = None
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
@@ -2,54 +2,232 @@
 Knowledge Graph for Semantic Relationships Between Chunks
 """
 import os
+import re
+import time
+import heapq
 import pickle
-import networkx as nx
-from typing import List, Set, Tuple
+import fnmatch
+import functools
+import numpy as np
+from collections import defaultdict
+from typing import List, Set, Tuple, Dict, Iterable, Optional, Sequence
 import sys
 sys.path.append('..')
-from config import GRAPH_PATH, GRAPH_EXPANSION_DEPTH
+from .persistence import atomic_write_bytes
+from .graph_backends import open_graph
+from .csr_graph import split_relationship
+from .neighborhood_cache import NeighborhoodCache
+from .graph_analytics import GraphAnalytics
+from config import (GRAPH_PATH, GRAPH_BACKEND, GRAPH_EXPANSION_DEPTH, GRAPH_EXPANSION_FANOUT, KEYWORD_MAX_DF_RATIO, KEYWORD_MIN_DF_CAP,
+                    KEYWORD_GLOBAL_MAX_DF, KEYWORD_CROSS_DOCUMENT, GRAPH_PPR_RESTART, GRAPH_PPR_MAX_ITERATIONS,
+                    GRAPH_PPR_TIME_BUDGET_MS, GRAPH_PPR_TOLERANCE, GRAPH_PPR_MIN_MASS, GRAPH_RELATIONSHIP_WEIGHTS,
+                    GRAPH_CACHE_PRECOMPUTE_TOP_N)
 
+# Capitalized words (potential proper nouns, concepts) and acronyms (all caps, 2+ letters)
+_CAPITALIZED_RE = re.compile(r'\b[A-Z][a-z]{4,}\b')
+_ACRONYM_RE = re.compile(r'\b[A-Z]{2,}\b')
 
-class KnowledgeGraph:
+
+def _traversal(method):
+    """Run a graph read as one backend traversal (SQLite: a single version check for all its reads)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        traversal = getattr(self.graph, 'traversal', None)
+        if traversal is None:
+            return method(self, *args, **kwargs)
+        with traversal():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Stopwords to ignore
+_IGNORE_WORDS = frozenset({
+    'this', 'that', 'there', 'their', 'these', 'those',
+    'chapter', 'section', 'about', 'would', 'could', 'should',
+    'which', 'where', 'while', 'when', 'what'
+})
+
+
+def extract_keywords(text: str) -> Set[str]:
+    """Capitalized concept words and acronyms of a chunk"""
+    keywords = {word for word in _CAPITALIZED_RE.findall(text) if word.lower() not in _IGNORE_WORDS}
+    keywords.update(_ACRONYM_RE.findall(text))
+    return keywords
+
+
+class KeywordIndex:
     """
-    NetworkX-based knowledge graph for storing semantic relationships
+    Global inverted index: keyword -> chunk IDs, across all documents.
+    Also keeps chunk -> keywords so removed chunks can be unindexed.
     """
     
     def __init__(self):
-        self.graph_path = GRAPH_PATH
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.chunk_keywords: Dict[str, Set[str]] = {}
+    
+    def add(self, chunk_id: str, keywords: Set[str]):
+        self.remove([chunk_id])
+        self.chunk_keywords[chunk_id] = keywords
+        for keyword in keywords:
+            self.postings[keyword].add(chunk_id)
+    
+    def remove(self, chunk_ids: Iterable[str]):
+        for chunk_id in chunk_ids:
+            for keyword in self.chunk_keywords.pop(chunk_id, ()):
+                posting = self.postings.get(keyword)
+                if posting is not None:
+                    posting.discard(chunk_id)
+                    if not posting:
+                        del self.postings[keyword]
+    
+    def chunks_with(self, keyword: str) -> Set[str]:
+        return self.postings.get(keyword, set())
+    
+    def document_frequency(self, keyword: str) -> int:
+        return len(self.postings.get(keyword, ()))
+
+
+class DocumentIndex:
+    """
+    Document -> chunk IDs in document order, and chunk -> document.
+    Maintained by KnowledgeGraph so document lookups never scan the graph.
+    """
+    
+    def __init__(self):
+        self.document_chunks: Dict[str, List[str]] = {}
+        self.chunk_documents: Dict[str, str] = {}
+    
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[Tuple[str, Optional[str]]]) -> 'DocumentIndex':
+        """Rebuild from (chunk_id, document_id) pairs, e.g. a graph saved without an index"""
+        index = cls()
+        for chunk_id, document_id in nodes:
+            if document_id is not None:
+                index.add(chunk_id, document_id)
+        return index
+    
+    def add(self, chunk_id: str, document_id: str):
+        """Append a chunk to its document (moving it if it belonged to another)"""
+        previous = self.chunk_documents.get(chunk_id)
+        if previous == document_id:
+            return
+        if previous is not None:
+            self.remove([chunk_id])
+        self.chunk_documents[chunk_id] = document_id
+        self.document_chunks.setdefault(document_id, []).append(chunk_id)
+    
+    def set_document(self, document_id: str, chunk_ids: List[str]):
+        """Replace a document's chunk list (ordered) with chunk_ids"""
+        self.remove_document(document_id)
+        self.remove(chunk_ids)
+        self.document_chunks[document_id] = list(chunk_ids)
+        for chunk_id in chunk_ids:
+            self.chunk_documents[chunk_id] = document_id
+    
+    def remove(self, chunk_ids: Iterable[str]):
+        removed = defaultdict(set)
+        for chunk_id in chunk_ids:
+            document_id = self.chunk_documents.pop(chunk_id, None)
+            if document_id is not None:
+                removed[document_id].add(chunk_id)
+        
+        for document_id, gone in removed.items():
+            remaining = [chunk_id for chunk_id in self.document_chunks[document_id] if chunk_id not in gone]
+            if remaining:
+                self.document_chunks[document_id] = remaining
+            else:
+                del self.document_chunks[document_id]
+    
+    def remove_document(self, document_id: str) -> List[str]:
+        """Drop a document; returns its chunk IDs"""
+        chunk_ids = self.document_chunks.pop(document_id, [])
+        for chunk_id in chunk_ids:
+            del self.chunk_documents[chunk_id]
+        return chunk_ids
+    
+    def chunks_of(self, document_id: str) -> List[str]:
+        return self.document_chunks.get(document_id, [])
+    
+    def document_of(self, chunk_id: str) -> Optional[str]:
+        return self.chunk_documents.get(chunk_id)
+
+
+class KnowledgeGraph:
+    """
+    Knowledge graph for storing semantic relationships between chunks.
+    
+    Storage is a backend (see storage/graph_backends.py) selected by
+    GRAPH_BACKEND: memory-mapped CSR arrays by default, the SQLite edge
+    table shared by every worker, or a networkx graph.
+    
+    The keyword and document indexes are per-process pickles whatever the
+    backend. With the SQLite backend and several workers, a worker sees
+    the edges other workers add, but not their chunks in its keyword index
+    (cross-document keyword links) or document index (get_document_chunks,
+    get_large_context) until it restarts; the last worker to save
+    overwrites the pickles. Run ingestion in one worker.
+    """
+    
+    def __init__(self, graph_path: str = GRAPH_PATH):
+        self.graph_path = graph_path
         self._load_or_create_graph()
     
-    def _load_or_create_graph(self):
+    def _load_or_create_graph(self, backend: str = GRAPH_BACKEND):
         """Load existing graph or create new one"""
-        if os.path.exists(self.graph_path):
-            self.graph = nx.read_gpickle(self.graph_path)
+        self.graph = open_graph(backend, self.graph_path)
+        
+        # Mutations since the last save (see PersistenceManager)
+        self.dirty_ops = 0
+        self.last_save = None
+        self.last_pagerank = None
+        
+        self.keyword_index_path = os.path.splitext(self.graph_path)[0] + "_keywords.pkl"
+        self.keyword_index = KeywordIndex()
+        if os.path.exists(self.keyword_index_path):
+            with open(self.keyword_index_path, 'rb') as f:
+                self.keyword_index = pickle.load(f)
+        
+        # Graphs saved before the document index existed: rebuilt once from node attributes
+        self.document_index_path = os.path.splitext(self.graph_path)[0] + "_documents.pkl"
+        if os.path.exists(self.document_index_path):
+            with open(self.document_index_path, 'rb') as f:
+                self.document_index = pickle.load(f)
         else:
-            self.graph = nx.Graph()
+            self.document_index = DocumentIndex.from_nodes(self.graph.nodes_with_documents())
+        
+        # Hot neighborhoods; retrieval counts survive restarts to pick what to precompute
+        self.neighborhood_cache = NeighborhoodCache()
+        self.retrievals_path = os.path.splitext(self.graph_path)[0] + "_retrievals.pkl"
+        if os.path.exists(self.retrievals_path):
+            with open(self.retrievals_path, 'rb') as f:
+                self.neighborhood_cache.retrievals = pickle.load(f)
+        
+        # Structure statistics and per-query traversal costs (/api/graph/stats)
+        self.analytics = GraphAnalytics()
     
-    def add_node(self, chunk_id: str, **attributes):
-        """Add a chunk node with attributes"""
-        self.graph.add_node(chunk_id, **attributes)
+    def add_node(self, chunk_id: str, document_id: str = None):
+        """Add a chunk node, optionally with its document"""
+        self.graph.add_node(chunk_id, document_id)
+        if document_id is not None:
+            self.document_index.add(chunk_id, document_id)
+        self.dirty_ops += 1
     
     def add_edge(self, chunk_id_1: str, chunk_id_2: str, weight: float = 1.0, 
                  relationship: str = "related"):
         """Add edge between two chunks"""
-        self.graph.add_edge(chunk_id_1, chunk_id_2, weight=weight, relationship=relationship)
+        self._add_edges([(chunk_id_1, chunk_id_2, weight, relationship)])
+        self.dirty_ops += 1
     
     def add_sequential_edges(self, chunk_ids: List[str], document_id: str):
         """Add edges between sequential chunks in a document"""
-        for i in range(len(chunk_ids) - 1):
-            self.add_edge(
-                chunk_ids[i], 
-                chunk_ids[i + 1], 
-                weight=0.8,
-                relationship="sequential"
-            )
-            # Also add node with document reference
-            self.graph.nodes[chunk_ids[i]]['document_id'] = document_id
-        
-        # Add last node's document reference
-        if chunk_ids:
-            self.graph.nodes[chunk_ids[-1]]['document_id'] = document_id
+        # Every chunk is a node with its document, including the only chunk of a one-chunk document
+        self.graph.set_document(chunk_ids, document_id)
+        self._add_edges(
+            (chunk_ids[i], chunk_ids[i + 1], 0.8, "sequential") for i in range(len(chunk_ids) - 1)
+        )
+        # chunk_ids is the document's full chunk list, in order
+        self.document_index.set_document(document_id, chunk_ids)
+        self.dirty_ops += len(chunk_ids)
     
     def add_semantic_edge(self, chunk_id_1: str, chunk_id_2: str, similarity: float):
         """Add semantic similarity edge based on embedding similarity"""
@@ -61,44 +239,365 @@ class KnowledgeGraph:
                 relationship="semantic"
             )
     
-    def get_neighbors(self, chunk_id: str, depth: int = GRAPH_EXPANSION_DEPTH) -> Set[str]:
-        """Get neighboring chunks up to specified depth"""
-        if chunk_id not in self.graph:
-            return set()
+    def add_semantic_edges(self, edges: List[Tuple[str, str, float]]):
+        """Add many (chunk_id_1, chunk_id_2, similarity) semantic edges in one call"""
+        self.dirty_ops += self._add_edges((u, v, similarity, "semantic") for u, v, similarity in edges)
+    
+    def _add_edges(self, edges: Iterable[Tuple[str, str, float, str]]) -> int:
+        """Add edges to the backend, dropping cached neighborhoods and updating statistics of the chunks they touch"""
+        with self.analytics.lock:
+            if self.analytics.built:
+                edges = list(edges)
+                touched = {chunk_id for edge in edges for chunk_id in edge[:2]}
+                before = self.analytics.profile(self.graph, touched)
+                added = self.graph.add_edges(edges)
+                self.analytics.update(before, self.analytics.profile(self.graph, touched))
+                self.analytics.link(edge[:2] for edge in edges)
+            else:
+                touched = set()
+                
+                def record(edges):
+                    for edge in edges:
+                        touched.add(edge[0])
+                        touched.add(edge[1])
+                        yield edge
+                
+                added = self.graph.add_edges(record(edges))
+        self.neighborhood_cache.invalidate(touched)
+        return added
+    
+    def _remove_nodes(self, chunk_ids: List[str]):
+        """Remove nodes from the backend, dropping cached neighborhoods and updating statistics around them"""
+        with self.analytics.lock:
+            touched = set(chunk_ids)
+            if len(self.neighborhood_cache) or self.analytics.built:
+                for chunk_id in chunk_ids:
+                    touched.update(self.graph.neighbors(chunk_id))
+            self.neighborhood_cache.invalidate(touched)
+            before = self.analytics.profile(self.graph, touched) if self.analytics.built else {}
+            self.graph.remove_nodes(chunk_ids)
+            if before:
+                self.analytics.update(before, self.analytics.profile(self.graph, touched))
+                self.analytics.unlink()
+    
+    def remove_chunks(self, chunk_ids: List[str]):
+        """Remove chunk nodes and all their edges"""
+        self._remove_nodes(chunk_ids)
+        self.keyword_index.remove(chunk_ids)
+        self.document_index.remove(chunk_ids)
+        self.dirty_ops += len(chunk_ids)
+    
+    def remove_document(self, document_id: str) -> List[str]:
+        """Remove all chunks of a document and their edges. Returns the removed chunk IDs."""
+        chunk_ids = self.document_index.remove_document(document_id)
+        self._remove_nodes(chunk_ids)
+        self.keyword_index.remove(chunk_ids)
+        self.dirty_ops += len(chunk_ids)
+        return chunk_ids
+    
+    def remove_edges_among(self, chunk_ids: List[str], keep_relationships: Tuple[str, ...] = ("semantic",)):
+        """
+        Remove edges between the given chunks, except kept relationship types.
+        Used before re-linking a re-ingested document, so stale sequential and
+        keyword edges between its surviving chunks do not linger.
+        """
+        stale = [
+            (u, v) for u, v, relationship in self.graph.edges_among(chunk_ids)
+            if relationship not in keep_relationships
+        ]
+        touched = {chunk_id for pair in stale for chunk_id in pair}
+        self.neighborhood_cache.invalidate(touched)
+        with self.analytics.lock:
+            before = self.analytics.profile(self.graph, touched) if self.analytics.built else {}
+            self.dirty_ops += self.graph.remove_edges(stale)
+            if before:
+                self.analytics.update(before, self.analytics.profile(self.graph, touched))
+                self.analytics.unlink()
+    
+    @_traversal
+    def expand(self, chunk_ids: Iterable[str], depth: int = GRAPH_EXPANSION_DEPTH,
+               fanout: Optional[Sequence[int]] = GRAPH_EXPANSION_FANOUT,
+               relationships: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Multi-source BFS from all chunk_ids at once.
+        
+        Each chunk is visited once, at its smallest hop distance, so shared
+        neighborhoods are traversed once. At hop h, each frontier chunk
+        follows at most fanout[h - 1] unvisited neighbors, highest edge
+        weight first (the last entry applies to deeper hops; None = no cap),
+        which keeps hubs such as LARGE chunks from flooding the result.
+        relationships keeps only edges whose relationship matches one of the
+        patterns ('sequential', 'semantic', 'shared_concept:*').
+        
+        Returns chunk ID -> hop distance (0 for the seeds present in the graph).
         
-        neighbors = set()
-        current_level = {chunk_id}
+        HybridRetrieval does not call this: its graph score is
+        personalized_pagerank mass. Expansion serves get_related_chunks and
+        get_neighbors, and picks the PageRank rows precompute_neighborhoods warms.
+        """
+        hops = {chunk_id: 0 for chunk_id in chunk_ids if self.graph.has_node(chunk_id)}
+        patterns = list(relationships) if relationships is not None else None
+        allowed = {}  # Relationship -> matches a pattern
+        frontier = list(hops)
         
-        for _ in range(depth):
-            next_level = set()
-            for node in current_level:
-                if node in self.graph:
-                    next_level.update(self.graph.neighbors(node))
-            neighbors.update(next_level)
-            current_level = next_level - neighbors
+        for hop in range(1, depth + 1):
+            limit = fanout[min(hop, len(fanout)) - 1] if fanout else None
+            next_frontier = []
+            for chunk_id in frontier:
+                if patterns is None:
+                    candidates = [(weight, neighbor) for neighbor, weight in self.graph.weighted_neighbors(chunk_id)
+                                  if neighbor not in hops]
+                else:
+                    candidates = []
+                    for neighbor, weight, relationship in self.graph.edges_of(chunk_id):
+                        if neighbor in hops:
+                            continue
+                        keep = allowed.get(relationship)
+                        if keep is None:
+                            keep = allowed[relationship] = any(
+                                fnmatch.fnmatchcase(relationship, pattern) for pattern in patterns)
+                        if keep:
+                            candidates.append((weight, neighbor))
+                
+                if limit is not None and len(candidates) > limit:
+                    candidates = heapq.nlargest(limit, candidates)
+                for _, neighbor in candidates:
+                    if neighbor not in hops:
+                        hops[neighbor] = hop
+                        next_frontier.append(neighbor)
+            
+            frontier = next_frontier
+            if not frontier:
+                break
         
+        return hops
+    
+    def get_neighbors(self, chunk_id: str, depth: int = GRAPH_EXPANSION_DEPTH) -> Set[str]:
+        """Get all neighboring chunks up to specified depth (no fan-out cap)"""
+        neighbors = set(self.expand([chunk_id], depth, fanout=None))
         neighbors.discard(chunk_id)  # Remove the query node itself
         return neighbors
     
-    def get_related_chunks(self, chunk_ids: List[str], depth: int = 1) -> Set[str]:
-        """Get all related chunks for a list of chunk IDs"""
-        related = set()
+    def _sync_cache(self):
+        """Clear the neighborhood cache if another worker wrote to shared graph storage"""
+        refresh = getattr(self.graph, 'refresh', None)
+        if refresh is not None and refresh():
+            self.neighborhood_cache.clear()
+            self.analytics.reset()
+    
+    @_traversal
+    def expand_cached(self, chunk_ids: Iterable[str], depth: int = GRAPH_EXPANSION_DEPTH,
+                      fanout: Optional[Sequence[int]] = GRAPH_EXPANSION_FANOUT,
+                      relationships: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Like expand, from the neighborhood cache. The joint expansion of the
+        seed set is one entry (seeds sorted, so any order of the same set
+        hits it), so the result is always a single multi-source BFS.
+        """
+        seeds = sorted(set(chunk_ids))
+        self._sync_cache()
+        self.neighborhood_cache.record_retrievals(seeds)
+        return self._cached_expansion(seeds, depth, fanout, relationships)
+    
+    def _cached_expansion(self, seeds: List[str], depth: int, fanout: Optional[Sequence[int]],
+                          relationships: Optional[Iterable[str]], count: bool = True) -> Dict[str, int]:
+        relationships = tuple(relationships) if relationships is not None else None
+        key = (tuple(seeds), 'expand', depth, tuple(fanout) if fanout else None, relationships)
+        hops = self.neighborhood_cache.get(key, count)
+        if hops is None:
+            hops = self.expand(seeds, depth, fanout, relationships)
+            # Seeds not in the graph yet are members too: their first edge changes the result
+            self.neighborhood_cache.put(key, hops, set(hops).union(seeds))
+        return hops
+    
+    def _transition_row(self, chunk_id: str, factors: Dict[str, float], count: bool = True) -> List[Tuple[str, float]]:
+        """(neighbor, edge weight x relationship factor) of a chunk, from the neighborhood cache"""
+        key = (chunk_id, 'row')
+        row = self.neighborhood_cache.get(key, count)
+        if row is None:
+            row = []
+            for neighbor, weight, relationship in self.graph.edges_of(chunk_id):
+                factor = factors.get(relationship)
+                if factor is None:
+                    factor = factors[relationship] = GRAPH_RELATIONSHIP_WEIGHTS.get(
+                        split_relationship(relationship)[0], 1.0)
+                row.append((neighbor, weight * factor))
+            self.neighborhood_cache.put(key, row, [chunk_id])
+        return row
+    
+    @_traversal
+    def precompute_neighborhoods(self, top_n: int = GRAPH_CACHE_PRECOMPUTE_TOP_N,
+                                 depth: int = GRAPH_EXPANSION_DEPTH) -> int:
+        """
+        Warm the cache for the top_n most-retrieved chunks: their default
+        expansion and the PageRank rows of every chunk within depth - 1 hops.
+        Returns the number of chunks precomputed.
+        """
+        factors = {}
+        self._sync_cache()
+        chunk_ids = [chunk_id for chunk_id in self.neighborhood_cache.most_retrieved(top_n)
+                     if self.graph.has_node(chunk_id)]
         for chunk_id in chunk_ids:
-            related.update(self.get_neighbors(chunk_id, depth))
-        return related - set(chunk_ids)
+            hops = self._cached_expansion([chunk_id], depth, GRAPH_EXPANSION_FANOUT, None, count=False)
+            for neighbor, hop in hops.items():
+                if hop < depth:
+                    self._transition_row(neighbor, factors, count=False)
+        return len(chunk_ids)
+    
+    def get_related_chunks(self, chunk_ids: List[str], depth: int = 1,
+                           relationships: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Get related chunks for a list of chunk IDs (capped expansion, cached per
+        seed set). Recorded as the 'expansion' traversal; not part of retrieval.
+        """
+        start = time.perf_counter()
+        hops = self.expand_cached(chunk_ids, depth, relationships=relationships)
+        self.analytics.record_traversal("expansion", len(hops), (time.perf_counter() - start) * 1000)
+        return {chunk_id for chunk_id, hop in hops.items() if hop > 0}
+    
+    @_traversal
+    def personalized_pagerank(self, seeds: Dict[str, float], restart: float = GRAPH_PPR_RESTART,
+                              max_iterations: int = GRAPH_PPR_MAX_ITERATIONS,
+                              time_budget_ms: float = GRAPH_PPR_TIME_BUDGET_MS,
+                              tolerance: float = GRAPH_PPR_TOLERANCE, min_mass: float = GRAPH_PPR_MIN_MASS,
+                              exclude_restart: bool = False) -> Dict[str, float]:
+        """
+        Personalized PageRank with seeds (chunk ID -> restart mass, e.g. vector
+        similarity) as the restart distribution.
+        
+        Power iteration x = restart * p + (1 - restart) * P^T x, one sparse
+        mat-vec per iteration over the explored subgraph: a node's adjacency
+        row is loaded the first time it holds min_mass, so mass spreads one
+        hop per iteration and never reaches the whole graph. Transitions are
+        proportional to edge weight x GRAPH_RELATIONSHIP_WEIGHTS[kind]. Mass on
+        nodes without loaded edges returns to the seeds.
+        
+        Stops after max_iterations, once the L1 change is below tolerance, or
+        once time_budget_ms is spent. With exclude_restart, scores are only the
+        mass that arrived over edges (no restart or dangling share). Returns
+        chunk ID -> score of every node reached.
+        """
+        start = time.perf_counter()
+        self._sync_cache()
+        seeds = {chunk_id: mass for chunk_id, mass in seeds.items() if mass > 0 and self.graph.has_node(chunk_id)}
+        self.neighborhood_cache.record_retrievals(seeds)
+        self.last_pagerank = {"iterations": 0, "nodes": len(seeds), "edges": 0, "ms": 0.0}
+        if not seeds:
+            return {}
+        
+        chunk_ids = list(seeds)
+        positions = {chunk_id: i for i, chunk_id in enumerate(chunk_ids)}
+        total = sum(seeds.values())
+        personalization = np.array([seeds[chunk_id] / total for chunk_id in chunk_ids])
+        scores = personalization.copy()
+        expanded = np.zeros(len(chunk_ids), dtype=bool)
+        has_edges = np.zeros(len(chunk_ids), dtype=bool)
+        sources, targets, probabilities = [], [], []
+        spread = np.zeros(len(chunk_ids))
+        factors = {}  # Relationship -> GRAPH_RELATIONSHIP_WEIGHTS factor
+        iterations = 0
+        
+        for iterations in range(1, max_iterations + 1):
+            # Load the rows of nodes that now hold enough mass, heaviest first, within the budget
+            frontier = np.flatnonzero((scores >= min_mass) & ~expanded)
+            for i in frontier[np.argsort(-scores[frontier])].tolist():
+                if (time.perf_counter() - start) * 1000 >= time_budget_ms and sources:
+                    break
+                expanded[i] = True
+                row = self._transition_row(chunk_ids[i], factors)
+                row_total = sum(weight for _, weight in row)
+                if row_total <= 0:
+                    continue
+                has_edges[i] = True
+                for neighbor, weight in row:
+                    position = positions.get(neighbor)
+                    if position is None:
+                        position = positions[neighbor] = len(chunk_ids)
+                        chunk_ids.append(neighbor)
+                    sources.append(i)
+                    targets.append(position)
+                    probabilities.append(weight / row_total)
+            
+            n = len(chunk_ids)
+            if n > len(scores):
+                grow = n - len(scores)
+                scores = np.concatenate([scores, np.zeros(grow)])
+                personalization = np.concatenate([personalization, np.zeros(grow)])
+                expanded = np.concatenate([expanded, np.zeros(grow, dtype=bool)])
+                has_edges = np.concatenate([has_edges, np.zeros(grow, dtype=bool)])
+            
+            source_array = np.array(sources, dtype=np.int64)
+            spread = np.bincount(np.array(targets, dtype=np.int64),
+                                 weights=np.array(probabilities) * scores[source_array], minlength=n)
+            dangling = scores[~has_edges].sum()
+            updated = restart * personalization + (1 - restart) * (spread + dangling * personalization)
+            
+            change = np.abs(updated - scores).sum()
+            scores = updated
+            if change < tolerance or (time.perf_counter() - start) * 1000 >= time_budget_ms:
+                break
+        
+        if exclude_restart:
+            scores = (1 - restart) * spread
+        
+        self.last_pagerank = {
+            "iterations": iterations,
+            "nodes": len(chunk_ids),
+            "edges": len(sources),
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+        self.analytics.record_traversal("pagerank", len(chunk_ids), self.last_pagerank["ms"])
+        return dict(zip(chunk_ids, scores.tolist()))
     
     def get_document_chunks(self, document_id: str) -> List[str]:
-        """Get all chunks belonging to a document"""
-        chunks = []
-        for node in self.graph.nodes():
-            if self.graph.nodes[node].get('document_id') == document_id:
-                chunks.append(node)
-        return chunks
+        """Get all chunks belonging to a document, in document order"""
+        return list(self.document_index.chunks_of(document_id))
+    
+    def get_chunk_document(self, chunk_id: str) -> Optional[str]:
+        """Get the document a chunk belongs to"""
+        return self.document_index.document_of(chunk_id)
+    
+    def get_large_context(self, chunk_ids: List[str]) -> List[str]:
+        """LARGE (L) chunks of the documents the given chunks belong to, in first-seen document order"""
+        large = []
+        seen = set()
+        for chunk_id in chunk_ids:
+            document_id = self.document_index.document_of(chunk_id)
+            if document_id is None or document_id in seen:
+                continue
+            seen.add(document_id)
+            large.extend(chunk for chunk in self.document_index.chunks_of(document_id) if chunk.endswith('_L'))
+        return large
     
     def save(self):
-        """Persist graph to disk"""
-        os.makedirs(os.path.dirname(self.graph_path), exist_ok=True)
-        nx.write_gpickle(self.graph, self.graph_path)
+        """Persist graph, keyword index and document index to disk (each file via atomic rename)"""
+        pending = self.dirty_ops
+        start = time.perf_counter()
+        self.graph.save()
+        indexes = [pickle.dumps(self.keyword_index), pickle.dumps(self.document_index)]
+        atomic_write_bytes(self.keyword_index_path, indexes[0])
+        atomic_write_bytes(self.document_index_path, indexes[1])
+        atomic_write_bytes(self.retrievals_path, pickle.dumps(self.neighborhood_cache.retrievals))
+        self.dirty_ops -= pending
+        
+        graph_save = self.graph.last_save or {}
+        self.last_save = {
+            "seconds": round(time.perf_counter() - start, 4),
+            "graph_mode": graph_save.get("mode"),
+            "graph_bytes": graph_save.get("bytes", 0),
+            "index_bytes": sum(len(data) for data in indexes)
+        }
+    
+    def get_stats(self) -> Dict:
+        """Storage sizes and what the last save wrote"""
+        return {"storage": self.graph.get_stats(), "last_save": self.last_save,
+                "neighborhood_cache": self.neighborhood_cache.get_stats()}
+    
+    @_traversal
+    def get_graph_stats(self, top_n: int = 10) -> Dict:
+        """Degree distribution, top hubs, edges by relationship, components and traversal costs"""
+        self._sync_cache()
+        return self.analytics.get_stats(self.graph, top_n)
     
     def node_count(self) -> int:
         """Return number of nodes"""
@@ -108,57 +607,53 @@ class KnowledgeGraph:
         """Return number of edges"""
         return self.graph.number_of_edges()
     
-    def add_keyword_relations(self, chunk_ids: list, chunk_texts: list, document_id: str):
+    def add_keyword_relations(self, chunk_ids: list, chunk_texts: list, document_id: str,
+                              cross_document: bool = KEYWORD_CROSS_DOCUMENT):
         """
         Build deterministic keyword-based relations between chunks.
         Inspired by EduRank's knowledge graph approach.
         
-        Extracts capitalized keywords (>4 chars) and creates relations
-        between chunks that share concepts.
+        Extracts capitalized keywords (>4 chars) and acronyms, builds posting
+        lists (keyword -> chunks) and emits edges from the posting lists,
+        rarest keyword first, so each pair is labelled with its most specific
+        shared concept. Keywords found in more than
+        max(KEYWORD_MIN_DF_CAP, KEYWORD_MAX_DF_RATIO * n) chunks are hubs and
+        produce no edges.
+        
+        The chunks are also added to the global keyword index; with
+        cross_document, they are linked to other documents' chunks through
+        keywords that occur in at most KEYWORD_GLOBAL_MAX_DF chunks overall.
         """
-        import re
+        postings = defaultdict(list)
+        for chunk_id, text in zip(chunk_ids, chunk_texts):
+            keywords = extract_keywords(text)
+            self.keyword_index.add(chunk_id, keywords)
+            for keyword in keywords:
+                postings[keyword].append(chunk_id)
         
-        if len(chunk_ids) < 2:
-            return
+        max_df = max(KEYWORD_MIN_DF_CAP, int(KEYWORD_MAX_DF_RATIO * len(chunk_ids)))
+        edges = {}
+        for keyword, posting in sorted(postings.items(), key=lambda item: (len(item[1]), item[0])):
+            if len(posting) < 2 or len(posting) > max_df:
+                continue
+            for i, chunk_id_1 in enumerate(posting):
+                for chunk_id_2 in posting[i + 1:]:
+                    edges.setdefault((chunk_id_1, chunk_id_2), keyword)
         
-        # Stopwords to ignore
-        ignore_words = {
-            'this', 'that', 'there', 'their', 'these', 'those',
-            'chapter', 'section', 'about', 'would', 'could', 'should',
-            'which', 'where', 'while', 'when', 'what'
-        }
+        if cross_document:
+            own = set(chunk_ids)
+            for keyword, posting in postings.items():
+                others = self.keyword_index.chunks_with(keyword) - own
+                if not others or self.keyword_index.document_frequency(keyword) > KEYWORD_GLOBAL_MAX_DF:
+                    continue
+                for chunk_id_1 in posting:
+                    for chunk_id_2 in others:
+                        edges.setdefault((chunk_id_1, chunk_id_2), keyword)
         
-        # Extract keywords for each chunk
-        chunk_keywords = {}
-        for chunk_id, text in zip(chunk_ids, chunk_texts):
-            # Find capitalized words (potential proper nouns, concepts)
-            keywords = set()
-            found = re.findall(r'\b[A-Z][a-z]{4,}\b', text)
-            for word in found:
-                if word.lower() not in ignore_words:
-                    keywords.add(word)
-            
-            # Also extract acronyms (all caps, 2+ letters)
-            acronyms = re.findall(r'\b[A-Z]{2,}\b', text)
-            keywords.update(acronyms)
-            
-            chunk_keywords[chunk_id] = keywords
-        
-        # Create relations based on shared keywords
-        for i, chunk_id_1 in enumerate(chunk_ids):
-            for chunk_id_2 in chunk_ids[i+1:]:
-                shared = chunk_keywords[chunk_id_1] & chunk_keywords[chunk_id_2]
-                
-                if shared:
-                    # Use first shared keyword as relation type
-                    keyword = list(shared)[0]
-                    self.add_edge(
-                        chunk_id_1,
-                        chunk_id_2,
-                        weight=0.9,
-                        relationship=f"shared_concept:{keyword}"
-                    )
-
+        self._add_edges(
+            (u, v, 0.9, f"shared_concept:{keyword}") for (u, v), keyword in edges.items()
+        )
+        self.dirty_ops += len(chunk_ids) + len(edges)
 
 # Singleton instance
 _graph = None
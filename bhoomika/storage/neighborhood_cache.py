@@ -0,0 +1,105 @@
+"""
+LRU Cache of Computed Graph Neighborhoods
+"""
+import threading
+from collections import OrderedDict, Counter
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+import sys
+sys.path.append('..')
+from config import GRAPH_CACHE_MAX_ENTRIES
+
+
+class NeighborhoodCache:
+    """
+    LRU cache of neighborhoods keyed by (chunk_id or seed tuple, *parameters).
+    
+    Each entry lists its member chunks: the chunks whose edges it was
+    computed from. invalidate(chunk_ids) drops every entry with a member
+    among them, so KnowledgeGraph calls it with the endpoints of added or
+    removed edges. Also counts how often each chunk seeds a lookup, which
+    picks the chunks to precompute.
+    """
+    
+    def __init__(self, max_entries: int = GRAPH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, Tuple[Any, Set[str]]]" = OrderedDict()
+        self.member_keys: Dict[str, Set[Tuple]] = {}  # Chunk -> keys of entries it belongs to
+        self.retrievals = Counter()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: Tuple, count: bool = True) -> Optional[Any]:
+        """Cached value or None; count=False keeps the lookup out of the hit rate (precompute)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += count
+                return None
+            self.entries.move_to_end(key)
+            self.hits += count
+            return entry[0]
+    
+    def put(self, key: Tuple, value: Any, members: Iterable[str]):
+        members = set(members)
+        with self.lock:
+            self._drop(key)
+            self.entries[key] = (value, members)
+            for chunk_id in members:
+                self.member_keys.setdefault(chunk_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def _drop(self, key: Tuple) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        for chunk_id in entry[1]:
+            keys = self.member_keys.get(chunk_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.member_keys[chunk_id]
+        return True
+    
+    def invalidate(self, chunk_ids: Iterable[str]) -> int:
+        """Drop the entries computed from any of the chunks. Returns the number dropped."""
+        if not self.entries:
+            return 0
+        dropped = 0
+        with self.lock:
+            for chunk_id in chunk_ids:
+                for key in list(self.member_keys.get(chunk_id, ())):
+                    dropped += self._drop(key)
+            self.invalidations += dropped
+        return dropped
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.member_keys.clear()
+    
+    def record_retrievals(self, chunk_ids: Iterable[Hashable]):
+        with self.lock:
+            self.retrievals.update(chunk_ids)
+    
+    def most_retrieved(self, n: int) -> List[str]:
+        return [chunk_id for chunk_id, _ in self.retrievals.most_common(n)]
+    
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "tracked_chunks": len(self.retrievals)
+        }
@@ -0,0 +1,233 @@
+"""
+Write-behind Persistence for the Vector Store and Knowledge Graph
+"""
+import os
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict
+import sys
+sys.path.append('..')
+from config import PERSIST_INTERVAL_SECONDS, PERSIST_MAX_DIRTY_OPS
+
+
+def atomic_write(path: str, write: Callable[[str], None]):
+    """
+    Write a file via a temp file in the same directory, fsync it and
+    rename it over path, so readers and crashes only ever see the old or
+    the new file. write(tmp_path) does the actual writing; the temp name
+    keeps path's extension (np.save / np.savez append one otherwise).
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{extension}"
+
+    write(tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Persist the rename itself
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """atomic_write for an in-memory payload"""
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    atomic_write(path, write)
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer over the in-memory stores.
+
+    `with lock:` takes the write side and is reentrant, like the RLock
+    writers used before; `with lock.read():` takes the shared side. A
+    waiting writer holds back new readers, so a steady stream of queries
+    cannot starve ingestion. The writing thread may also read.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._writers_waiting += 1
+            try:
+                self._condition.wait_for(lambda: self._writer is None and self._readers == 0)
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release(self):
+        with self._condition:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("Write lock released by a thread that does not hold it")
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        with self._condition:
+            self._condition.wait_for(lambda: self._writer is None and self._writers_waiting == 0)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+
+class PersistenceManager:
+    """
+    Flushes dirty stores to disk from a background thread.
+
+    Registered stores expose dirty_ops (mutations since their last save)
+    and save(). A flush runs when any store is dirty and either
+    interval_seconds have passed since the last flush or the stores hold
+    max_dirty_ops unsaved mutations. Writers hold lock while mutating the
+    stores; the flusher takes it too, so every save sees a consistent state.
+    Queries hold lock.read(), so they never see a store mid-mutation.
+    A final flush runs at close() and at interpreter exit.
+    """
+
+    def __init__(self, interval_seconds: float = PERSIST_INTERVAL_SECONDS,
+                 max_dirty_ops: int = PERSIST_MAX_DIRTY_OPS):
+        self.interval_seconds = interval_seconds
+        self.max_dirty_ops = max_dirty_ops
+        self.stores = {}
+        self.lock = ReadWriteLock()
+        self.last_flush = time.time()
+        self.last_flush_seconds = 0.0
+        self.flushes = 0
+        self.last_error = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def register(self, name: str, store):
+        """Track a store (anything with dirty_ops and save())"""
+        self.stores[name] = store
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the background thread and flush whatever is left"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def notify(self):
+        """Called after writes: wakes the flusher to check the size policy"""
+        if self.dirty_ops() >= self.max_dirty_ops:
+            self._wakeup.set()
+
+    def dirty_ops(self) -> int:
+        return sum(store.dirty_ops for store in self.stores.values())
+
+    def flush(self) -> bool:
+        """Save every dirty store now. Returns True if anything was written."""
+        with self.lock:
+            dirty = [store for store in self.stores.values() if store.dirty_ops]
+            if not dirty:
+                return False
+
+            start = time.perf_counter()
+            try:
+                for store in dirty:
+                    store.save()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self.last_flush_seconds = time.perf_counter() - start
+            self.last_flush = time.time()
+            self.flushes += 1
+            return True
+
+    def get_stats(self) -> Dict:
+        return {
+            "last_flush_age_seconds": round(time.time() - self.last_flush, 1),
+            "last_flush_seconds": round(self.last_flush_seconds, 3),
+            "flushes": self.flushes,
+            "dirty_ops": {name: store.dirty_ops for name, store in self.stores.items()},
+            "stores": {name: store.get_stats() for name, store in self.stores.items() if hasattr(store, "get_stats")},
+            "last_error": self.last_error
+        }
+
+    def _due(self) -> bool:
+        dirty_ops = self.dirty_ops()
+        if not dirty_ops:
+            return False
+        return dirty_ops >= self.max_dirty_ops or time.time() - self.last_flush >= self.interval_seconds
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(min(self.interval_seconds, 1.0))
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            if self._due():
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error flushing stores: {e}")
+
+
+# Singleton instance
+_manager = None
+
+def get_persistence_manager() -> PersistenceManager:
+    """Shared manager for the singleton stores, started on first use"""
+    global _manager
+    if _manager is None:
+        from . import get_faiss_store, get_knowledge_graph
+        
+        _manager = PersistenceManager()
+        _manager.register("vectors", get_faiss_store())
+        _manager.register("graph", get_knowledge_graph())
+        _manager.start()
+        atexit.register(_manager.close)
+    return _manager
@@ -3,48 +3,127 @@ Simple In-Memory Vector Store (NumPy-based)
 Fallback if FAISS is not available
 """
 import os
+import zlib
 import numpy as np
 import pickle
-from typing import List, Tuple
+from typing import List, Tuple, Optional, Set
 import sys
 sys.path.append('..')
-from config import FAISS_INDEX_PATH, EMBEDDING_DIMENSION, TOP_K_RESULTS
+from .persistence import atomic_write, atomic_write_bytes
+from config import (FAISS_INDEX_PATH, EMBEDDING_DIMENSION, TOP_K_RESULTS,
+                    REDUCED_DIMENSION, PROJECTION_RERANK_FACTOR, PROJECTION_SAMPLE_SIZE,
+                    TOMBSTONE_COMPACT_RATIO, SEMANTIC_BLOCK_SIZE)
 
 
 class SimpleVectorStore:
     """
     Simple in-memory vector store using NumPy for cosine similarity
+    
+    Optionally keeps a PCA-reduced copy of the vectors (see fit_projection).
+    When present, search scans the reduced matrix for candidates and
+    re-scores only those candidates at full dimension.
     """
     
-    def __init__(self):
+    def __init__(self, index_dir: str = FAISS_INDEX_PATH):
         self.dimension = EMBEDDING_DIMENSION
-        self.index_path = os.path.join(FAISS_INDEX_PATH, "vectors.npy")
-        self.id_map_path = os.path.join(FAISS_INDEX_PATH, "id_map.pkl")
+        self.index_path = os.path.join(index_dir, "vectors.npy")
+        self.id_map_path = os.path.join(index_dir, "id_map.pkl")
+        self.previous_id_map_path = os.path.join(index_dir, "id_map.prev.pkl")
+        self.projection_path = os.path.join(index_dir, "projection.npz")
+        self.reduced_path = os.path.join(index_dir, "vectors_reduced.npy")
         
         # ID to chunk mapping
         self.id_to_chunk = {}
         self.chunk_to_id = {}
         self.current_id = 0
         
+        # Internal IDs of removed vectors, skipped by search until compact()
+        self.tombstones = set()
+        
+        # Mutations since the last save (see PersistenceManager)
+        self.dirty_ops = 0
+        
         # Vectors storage
         self.vectors = np.empty((0, self.dimension), dtype=np.float32)
         
+        # Reduced-dimension tier (None until a projection is fitted)
+        self.projection_mean = None
+        self.projection_components = None
+        self.reduced_vectors = None
+        
         # Load or create
         self._load_or_create_index()
     
     def _load_or_create_index(self):
         """Load existing vectors or initialize empty"""
-        if os.path.exists(self.index_path) and os.path.exists(self.id_map_path):
+        if os.path.exists(self.index_path):
             try:
-                self.vectors = np.load(self.index_path)
-                with open(self.id_map_path, 'rb') as f:
-                    data = pickle.load(f)
+                vectors = np.load(self.index_path)
+                data = self._matching_id_map(vectors)
+                if data is not None:
+                    self.vectors = vectors
                     self.id_to_chunk = data['id_to_chunk']
                     self.chunk_to_id = data['chunk_to_id']
                     self.current_id = data['current_id']
+                    self.tombstones = data.get('tombstones', set())
             except Exception as e:
                 print(f"Error loading index: {e}")
                 self.vectors = np.empty((0, self.dimension), dtype=np.float32)
+        
+        self._load_projection()
+    
+    def _matching_id_map(self, vectors: np.ndarray) -> Optional[dict]:
+        """
+        The saved ID map that belongs to vectors.npy.
+        
+        save() writes the new map before the new vectors and keeps the old
+        map as id_map.prev.pkl until then, so after a crash between the two
+        writes the old map is the one whose checksum matches; it is put
+        back in place. Maps saved before checksums are trusted as is.
+        """
+        checksum = None
+        for path in (self.id_map_path, self.previous_id_map_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            if 'vectors_checksum' not in data:
+                return data
+            if checksum is None:
+                checksum = self._checksum(vectors)
+            if data['vectors_checksum'] == checksum:
+                if path != self.id_map_path:
+                    os.replace(path, self.id_map_path)
+                    print("Recovered the vector ID map of an interrupted save")
+                return data
+        
+        print("No saved ID map matches vectors.npy; starting with an empty vector store")
+        return None
+    
+    @staticmethod
+    def _checksum(vectors: np.ndarray) -> Tuple[int, int]:
+        """(rows, CRC-32 of the matrix bytes), computed without copying the matrix"""
+        return len(vectors), zlib.crc32(np.ascontiguousarray(vectors).data)
+    
+    def _load_projection(self):
+        """Load the PCA projection and reduced matrix if they were built"""
+        if not os.path.exists(self.projection_path):
+            return
+        
+        try:
+            data = np.load(self.projection_path)
+            self.projection_mean = data['mean']
+            self.projection_components = data['components']
+            
+            if os.path.exists(self.reduced_path):
+                self.reduced_vectors = np.load(self.reduced_path)
+            
+            # Reduced matrix out of sync with vectors.npy: re-project
+            if self.reduced_vectors is None or len(self.reduced_vectors) != len(self.vectors):
+                self.reduced_vectors = self._project(self.vectors)
+        except Exception as e:
+            print(f"Error loading projection: {e}")
+            self.drop_projection()
     
     def add(self, chunk_id: str, embedding: List[float]) -> int:
         """Add embedding"""
@@ -54,31 +133,37 @@ class SimpleVectorStore:
         # Add vector
         vector = np.array([embedding], dtype=np.float32)
         self.vectors = np.vstack([self.vectors, vector])
+        self._append_reduced(vector)
         
         # Map IDs
         internal_id = self.current_id
         self.id_to_chunk[internal_id] = chunk_id
         self.chunk_to_id[chunk_id] = internal_id
         self.current_id += 1
+        self.dirty_ops += 1
         
         return internal_id
     
     def add_batch(self, chunk_ids: List[str], embeddings: List[List[float]]) -> List[int]:
-        """Add multiple embeddings"""
-        ids = []
-        new_vectors = np.array(embeddings, dtype=np.float32)
+        """Add multiple embeddings (chunk IDs already stored keep their vector, as in add)"""
+        new_rows = {}  # New chunk ID -> its row in embeddings (first occurrence)
+        for row, chunk_id in enumerate(chunk_ids):
+            if chunk_id not in self.chunk_to_id:
+                new_rows.setdefault(chunk_id, row)
         
-        if len(new_vectors) > 0:
+        if new_rows:
+            new_vectors = np.asarray(embeddings, dtype=np.float32)[list(new_rows.values())]
             self.vectors = np.vstack([self.vectors, new_vectors])
+            self._append_reduced(new_vectors)
             
-            for chunk_id in chunk_ids:
+            for chunk_id in new_rows:
                 internal_id = self.current_id
                 self.id_to_chunk[internal_id] = chunk_id
                 self.chunk_to_id[chunk_id] = internal_id
                 self.current_id += 1
-                ids.append(internal_id)
-                
-        return ids
+            self.dirty_ops += len(new_rows)
+        
+        return [self.chunk_to_id[chunk_id] for chunk_id in chunk_ids]
     
     def search(self, query_embedding: List[float], top_k: int = TOP_K_RESULTS) -> List[Tuple[str, float]]:
         """Cosine similarity search"""
@@ -88,17 +173,32 @@ class SimpleVectorStore:
         query_vector = np.array(query_embedding, dtype=np.float32)
         
         # Normalize vectors for cosine similarity
-        norm_vectors = np.linalg.norm(self.vectors, axis=1)
         norm_query = np.linalg.norm(query_vector)
         
         if norm_query == 0:
             return []
         
-        # Cosine similarity
-        similarities = np.dot(self.vectors, query_vector) / (norm_vectors * norm_query)
-        
-        # Get top-k indices
-        top_k_indices = np.argsort(similarities)[-top_k:][::-1]
+        # First pass on the reduced tier, then exact re-scoring of candidates
+        num_candidates = top_k * PROJECTION_RERANK_FACTOR
+        if self.reduced_vectors is not None and self.count() > num_candidates:
+            candidates = self._reduced_candidates(query_vector / norm_query, num_candidates)
+            candidate_vectors = self.vectors[candidates]
+            norm_vectors = np.linalg.norm(candidate_vectors, axis=1)
+            candidate_similarities = np.dot(candidate_vectors, query_vector) / (norm_vectors * norm_query)
+            
+            order = np.argsort(candidate_similarities)[-top_k:][::-1]
+            top_k_indices = candidates[order]
+            similarities = dict(zip(top_k_indices.tolist(), candidate_similarities[order].tolist()))
+        else:
+            norm_vectors = np.linalg.norm(self.vectors, axis=1)
+            
+            # Cosine similarity
+            similarities = np.dot(self.vectors, query_vector) / (norm_vectors * norm_query)
+            if self.tombstones:
+                similarities[list(self.tombstones)] = -np.inf
+            
+            # Get top-k indices
+            top_k_indices = np.argsort(similarities)[-top_k:][::-1]
         
         results = []
         for idx in top_k_indices:
@@ -108,20 +208,204 @@ class SimpleVectorStore:
         
         return results
     
+    def search_among(self, query_embedding: List[float], chunk_ids: List[str],
+                     top_k: int = TOP_K_RESULTS) -> List[Tuple[str, float]]:
+        """Exact cosine similarity search restricted to the given chunks (e.g. lexical matches)"""
+        ids = np.array([self.chunk_to_id[chunk_id] for chunk_id in chunk_ids if chunk_id in self.chunk_to_id],
+                       dtype=np.int64)
+        query_vector = np.array(query_embedding, dtype=np.float32)
+        norm_query = np.linalg.norm(query_vector)
+        if len(ids) == 0 or norm_query == 0:
+            return []
+        
+        candidate_vectors = self.vectors[ids]
+        similarities = np.dot(candidate_vectors, query_vector) / (np.linalg.norm(candidate_vectors, axis=1) * norm_query)
+        order = np.argsort(-similarities)[:top_k]
+        return [(self.id_to_chunk[int(ids[i])], float(similarities[i])) for i in order]
+    
+    def get_vectors(self, chunk_ids: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Stored vectors of the given chunks; returns (chunk IDs found, their vectors in that order)"""
+        found = [chunk_id for chunk_id in chunk_ids if chunk_id in self.chunk_to_id]
+        ids = np.array([self.chunk_to_id[chunk_id] for chunk_id in found], dtype=np.int64)
+        return found, self.vectors[ids]
+    
+    def search_batch(self, query_embeddings, top_k: int = TOP_K_RESULTS,
+                     exclude: Optional[Set[str]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Exact cosine k-NN for many queries at once.
+        
+        Queries are scored in blocks of SEMANTIC_BLOCK_SIZE rows, so memory
+        stays at block x n. Chunk IDs in exclude (e.g. the querying
+        document's own chunks) are never returned.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if len(self.vectors) == 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        
+        unit_vectors = self._normalize(self.vectors)
+        unit_queries = self._normalize(queries)
+        
+        masked = set(self.tombstones)
+        if exclude:
+            masked.update(self.chunk_to_id[cid] for cid in exclude if cid in self.chunk_to_id)
+        masked = np.fromiter(masked, dtype=np.int64, count=len(masked))
+        k = min(top_k, len(self.vectors) - len(masked))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        
+        results = []
+        for start in range(0, len(unit_queries), SEMANTIC_BLOCK_SIZE):
+            similarities = np.dot(unit_queries[start:start + SEMANTIC_BLOCK_SIZE], unit_vectors.T)
+            if len(masked):
+                similarities[:, masked] = -np.inf
+            
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            
+            for row_ids, row_scores in zip(top.tolist(), top_scores.tolist()):
+                results.append([(self.id_to_chunk[i], score) for i, score in zip(row_ids, row_scores)
+                                if i in self.id_to_chunk])
+        return results
+    
+    def remove(self, chunk_ids: List[str]) -> int:
+        """
+        Tombstone the vectors of removed chunks.
+        Rows stay in the matrix (hidden from search) until compact().
+        """
+        removed = 0
+        for chunk_id in chunk_ids:
+            internal_id = self.chunk_to_id.pop(chunk_id, None)
+            if internal_id is None:
+                continue
+            self.id_to_chunk.pop(internal_id, None)
+            self.tombstones.add(internal_id)
+            removed += 1
+        self.dirty_ops += removed
+        
+        if len(self.tombstones) > TOMBSTONE_COMPACT_RATIO * len(self.vectors):
+            self.compact()
+        return removed
+    
+    def compact(self):
+        """Drop tombstoned rows and renumber internal IDs"""
+        if not self.tombstones:
+            return
+        
+        keep = np.array([i for i in range(len(self.vectors)) if i not in self.tombstones], dtype=np.int64)
+        chunk_ids = [self.id_to_chunk[i] for i in keep.tolist()]
+        
+        self.vectors = self.vectors[keep] if len(keep) else np.empty((0, self.vectors.shape[1]), dtype=np.float32)
+        if self.reduced_vectors is not None:
+            self.reduced_vectors = self.reduced_vectors[keep]
+        
+        self.id_to_chunk = dict(enumerate(chunk_ids))
+        self.chunk_to_id = {chunk_id: i for i, chunk_id in self.id_to_chunk.items()}
+        self.current_id = len(chunk_ids)
+        self.tombstones = set()
+        self.dirty_ops += 1
+    
+    # Reduced-dimension tier
+    def fit_projection(self, dimension: int = REDUCED_DIMENSION,
+                       sample_size: int = PROJECTION_SAMPLE_SIZE) -> Optional[int]:
+        """
+        Fit a PCA projection on the stored vectors and build the reduced matrix.
+        
+        Vectors are unit-normalized before fitting, so dot products in the
+        reduced space approximate cosine similarity up to a per-query constant
+        (the mean term), which does not change the ranking.
+        
+        Returns the fitted dimension, or None if there are too few vectors.
+        """
+        if len(self.vectors) <= dimension:
+            return None
+        
+        sample = self.vectors
+        if len(sample) > sample_size:
+            rng = np.random.default_rng(0)
+            sample = sample[rng.choice(len(sample), sample_size, replace=False)]
+        
+        sample = self._normalize(sample)
+        mean = sample.mean(axis=0)
+        centered = sample - mean
+        
+        # Eigenvectors of the covariance matrix, largest eigenvalues first
+        covariance = np.dot(centered.T, centered) / len(centered)
+        _, eigenvectors = np.linalg.eigh(covariance)
+        components = eigenvectors[:, ::-1][:, :dimension].T
+        
+        self.projection_mean = mean.astype(np.float32)
+        self.projection_components = np.ascontiguousarray(components, dtype=np.float32)
+        self.reduced_vectors = self._project(self.vectors)
+        self.dirty_ops += 1
+        return dimension
+    
+    def drop_projection(self):
+        """Disable the reduced tier and fall back to exact search"""
+        self.projection_mean = None
+        self.projection_components = None
+        self.reduced_vectors = None
+        self.dirty_ops += 1
+    
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """Project full-dimension vectors onto the fitted components"""
+        reduced = np.dot(self._normalize(vectors) - self.projection_mean, self.projection_components.T)
+        return reduced.astype(np.float32)
+    
+    def _append_reduced(self, vectors: np.ndarray):
+        """Keep the reduced matrix aligned with newly added vectors"""
+        if self.reduced_vectors is not None:
+            self.reduced_vectors = np.vstack([self.reduced_vectors, self._project(vectors)])
+    
+    def _reduced_candidates(self, unit_query: np.ndarray, num_candidates: int) -> np.ndarray:
+        """Top candidate row indices from the reduced matrix, never tombstoned rows"""
+        reduced_query = np.dot(self.projection_components, unit_query)
+        scores = np.dot(self.reduced_vectors, reduced_query)
+        if self.tombstones:
+            scores[list(self.tombstones)] = -np.inf
+        return np.argpartition(scores, -num_candidates)[-num_candidates:]
+    
     def save(self):
-        """Persist vectors and mappings"""
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        np.save(self.index_path, self.vectors)
+        """
+        Persist vectors and mappings (each file via atomic rename). The map
+        is written first, with the checksum of the vectors it indexes; the
+        map of the vectors still on disk is kept until they are replaced
+        (see _matching_id_map).
+        """
+        pending = self.dirty_ops
+        
+        id_map = pickle.dumps({
+            'id_to_chunk': self.id_to_chunk,
+            'chunk_to_id': self.chunk_to_id,
+            'current_id': self.current_id,
+            'tombstones': self.tombstones,
+            'vectors_checksum': self._checksum(self.vectors)
+        })
+        if os.path.exists(self.id_map_path) and os.path.exists(self.index_path):
+            os.replace(self.id_map_path, self.previous_id_map_path)
+        atomic_write_bytes(self.id_map_path, id_map)
+        atomic_write(self.index_path, lambda path: np.save(path, self.vectors))
+        
+        if self.projection_components is not None:
+            atomic_write(self.projection_path, lambda path: np.savez(
+                path, mean=self.projection_mean, components=self.projection_components))
+            atomic_write(self.reduced_path, lambda path: np.save(path, self.reduced_vectors))
+        else:
+            for path in (self.projection_path, self.reduced_path):
+                if os.path.exists(path):
+                    os.remove(path)
         
-        with open(self.id_map_path, 'wb') as f:
-            pickle.dump({
-                'id_to_chunk': self.id_to_chunk,
-                'chunk_to_id': self.chunk_to_id,
-                'current_id': self.current_id
-            }, f)
+        self.dirty_ops -= pending
     
     def count(self) -> int:
-        return len(self.vectors)
+        return len(self.vectors) - len(self.tombstones)
 
 # Singleton instance
 _store = None
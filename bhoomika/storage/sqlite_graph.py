@@ -0,0 +1,269 @@
+"""
+SQLite Edge Table Storage for the Knowledge Graph
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Iterable, Dict
+import sys
+sys.path.append('..')
+from config import SQLITE_DB_PATH, GRAPH_SQLITE_CACHE_ROWS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS graph_nodes (
+    id TEXT PRIMARY KEY,
+    document_id TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_graph_nodes_document ON graph_nodes (document_id);
+CREATE TABLE IF NOT EXISTS edges (
+    src TEXT NOT NULL,
+    dst TEXT NOT NULL,
+    weight REAL NOT NULL,
+    rel TEXT NOT NULL,
+    PRIMARY KEY (src, dst)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS graph_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('version', 0), ('nodes', 0), ('edges', 0);
+"""
+
+
+class SQLiteGraph:
+    """
+    Graph in the edges(src, dst, weight, rel) table of the SQLite database,
+    shared by every worker process that opens it.
+    
+    Every edge is stored in both directions. The table is WITHOUT ROWID with
+    primary key (src, dst), so the primary key b-tree is the covering index:
+    a chunk's neighbors, weights and relationships are one range scan.
+    Node documents are in graph_nodes.
+    
+    Each mutating call is one committed transaction that also bumps the
+    version counter in graph_meta. Reads are served from a per-process LRU
+    of adjacency rows (GRAPH_SQLITE_CACHE_ROWS), cleared whenever the
+    version has moved, so a worker sees edges written by the others on
+    its next read. Inside traversal() the version is checked once, on
+    entry, instead of before every read. refresh() tells KnowledgeGraph to
+    drop its own caches.
+    """
+    
+    def __init__(self, db_path: str = SQLITE_DB_PATH, cache_rows: int = GRAPH_SQLITE_CACHE_ROWS):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Readers in other workers never block on a writer
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.RLock()
+        self.cache_rows = cache_rows
+        self.rows: "OrderedDict[str, List[Tuple[str, float, str]]]" = OrderedDict()
+        self.version = self._meta('version')
+        self.external_change = False
+        self.traversals = threading.local()  # Depth of nested traversal() blocks in this thread
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.last_save = None
+    
+    # Version counter and row cache
+    def _meta(self, key: str) -> int:
+        return self.conn.execute("SELECT value FROM graph_meta WHERE key = ?", (key,)).fetchone()[0]
+    
+    def _check_version(self):
+        """Drop cached rows if any process has written since they were read"""
+        version = self._meta('version')
+        if version != self.version:
+            self.rows.clear()
+            self.version = version
+            self.external_change = True
+    
+    def _check_fresh(self):
+        """Version check before a read, skipped inside traversal() (checked on entry)"""
+        if not getattr(self.traversals, 'depth', 0):
+            self._check_version()
+    
+    @contextmanager
+    def traversal(self):
+        """Check the version once for a whole traversal; its reads then skip the graph_meta lookup"""
+        with self.lock:
+            self._check_fresh()
+        depth = getattr(self.traversals, 'depth', 0)
+        self.traversals.depth = depth + 1
+        try:
+            yield
+        finally:
+            self.traversals.depth = depth
+    
+    def refresh(self) -> bool:
+        """True if another process has written since the last refresh (derived caches are stale)"""
+        with self.lock:
+            self._check_fresh()
+            changed, self.external_change = self.external_change, False
+            return changed
+    
+    def _row(self, chunk_id: str) -> List[Tuple[str, float, str]]:
+        row = self.rows.get(chunk_id)
+        if row is not None:
+            self.rows.move_to_end(chunk_id)
+            self.cache_hits += 1
+            return row
+        self.cache_misses += 1
+        row = self.conn.execute("SELECT dst, weight, rel FROM edges WHERE src = ?", (chunk_id,)).fetchall()
+        self.rows[chunk_id] = row
+        if len(self.rows) > self.cache_rows:
+            self.rows.popitem(last=False)
+        return row
+    
+    def _write(self, apply) -> int:
+        """Run apply(cursor) -> (result, node delta, edge delta) in one transaction that bumps the version"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta('version') != self.version:
+                    self.external_change = True
+                result, nodes, edges = apply(cursor)
+                cursor.execute("UPDATE graph_meta SET value = value + 1 WHERE key = 'version'")
+                cursor.execute("UPDATE graph_meta SET value = value + ? WHERE key = 'nodes'", (nodes,))
+                cursor.execute("UPDATE graph_meta SET value = value + ? WHERE key = 'edges'", (edges,))
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            # Our own write: the cache is stale too
+            self.rows.clear()
+            self.version = self._meta('version')
+            return result
+    
+    def save(self):
+        """Every write is already committed; nothing to flush"""
+        self.last_save = {"mode": "sqlite", "bytes": 0, "seconds": 0.0}
+    
+    def get_stats(self) -> Dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "version": self.version,
+            "cached_rows": len(self.rows),
+            "row_cache_hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "last_save": self.last_save
+        }
+    
+    # Nodes
+    def _insert_node(self, cursor, chunk_id: str, document_id: Optional[str] = None) -> int:
+        """Returns 1 if the node is new"""
+        cursor.execute("INSERT OR IGNORE INTO graph_nodes (id, document_id) VALUES (?, ?)", (chunk_id, document_id))
+        if cursor.rowcount:
+            return 1
+        if document_id is not None:
+            cursor.execute("UPDATE graph_nodes SET document_id = ? WHERE id = ?", (document_id, chunk_id))
+        return 0
+    
+    def has_node(self, chunk_id: str) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM graph_nodes WHERE id = ?", (chunk_id,)).fetchone() is not None
+    
+    def add_node(self, chunk_id: str, document_id: Optional[str] = None):
+        self._write(lambda cursor: (None, self._insert_node(cursor, chunk_id, document_id), 0))
+    
+    def set_document(self, chunk_ids: Iterable[str], document_id: str):
+        self._write(lambda cursor: (None, sum(self._insert_node(cursor, chunk_id, document_id)
+                                              for chunk_id in chunk_ids), 0))
+    
+    def node_document(self, chunk_id: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT document_id FROM graph_nodes WHERE id = ?", (chunk_id,)).fetchone()
+        return row[0] if row else None
+    
+    def document_nodes(self, document_id: str) -> List[str]:
+        with self.lock:
+            return [chunk_id for chunk_id, in self.conn.execute(
+                "SELECT id FROM graph_nodes WHERE document_id = ? ORDER BY rowid", (document_id,))]
+    
+    def nodes_with_documents(self) -> List[Tuple[str, Optional[str]]]:
+        """(chunk_id, document_id) of every node, in insertion order"""
+        with self.lock:
+            return self.conn.execute("SELECT id, document_id FROM graph_nodes ORDER BY rowid").fetchall()
+    
+    def remove_nodes(self, chunk_ids: Iterable[str]) -> int:
+        def apply(cursor):
+            removed = edges = 0
+            for chunk_id in chunk_ids:
+                neighbors = [dst for dst, in cursor.execute("SELECT dst FROM edges WHERE src = ?", (chunk_id,))]
+                cursor.executemany("DELETE FROM edges WHERE src = ? AND dst = ?",
+                                   [(neighbor, chunk_id) for neighbor in neighbors])
+                cursor.execute("DELETE FROM edges WHERE src = ?", (chunk_id,))
+                edges += len(neighbors)
+                cursor.execute("DELETE FROM graph_nodes WHERE id = ?", (chunk_id,))
+                removed += cursor.rowcount
+            return removed, -removed, -edges
+        return self._write(apply)
+    
+    def number_of_nodes(self) -> int:
+        with self.lock:
+            return self._meta('nodes')
+    
+    # Edges
+    def add_edges(self, edges: Iterable[Tuple[str, str, float, str]]) -> int:
+        """Add or update (chunk_id_1, chunk_id_2, weight, relationship) edges. Returns the number of new edges."""
+        def apply(cursor):
+            added = nodes = 0
+            for chunk_id_1, chunk_id_2, weight, relationship in edges:
+                nodes += self._insert_node(cursor, chunk_id_1) + self._insert_node(cursor, chunk_id_2)
+                cursor.execute("INSERT OR IGNORE INTO edges (src, dst, weight, rel) VALUES (?, ?, ?, ?)",
+                               (chunk_id_1, chunk_id_2, float(weight), relationship))
+                if cursor.rowcount:
+                    added += 1
+                    if chunk_id_1 != chunk_id_2:
+                        cursor.execute("INSERT INTO edges (src, dst, weight, rel) VALUES (?, ?, ?, ?)",
+                                       (chunk_id_2, chunk_id_1, float(weight), relationship))
+                else:
+                    cursor.executemany("UPDATE edges SET weight = ?, rel = ? WHERE src = ? AND dst = ?",
+                                       [(float(weight), relationship, chunk_id_1, chunk_id_2),
+                                        (float(weight), relationship, chunk_id_2, chunk_id_1)])
+            return added, nodes, added
+        return self._write(apply)
+    
+    def remove_edges(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        def apply(cursor):
+            removed = 0
+            for chunk_id_1, chunk_id_2 in pairs:
+                cursor.execute("DELETE FROM edges WHERE src = ? AND dst = ?", (chunk_id_1, chunk_id_2))
+                if cursor.rowcount:
+                    removed += 1
+                    cursor.execute("DELETE FROM edges WHERE src = ? AND dst = ?", (chunk_id_2, chunk_id_1))
+            return removed, 0, -removed
+        return self._write(apply)
+    
+    def number_of_edges(self) -> int:
+        with self.lock:
+            return self._meta('edges')
+    
+    # Reads
+    def neighbors(self, chunk_id: str) -> List[str]:
+        with self.lock:
+            self._check_fresh()
+            return [neighbor for neighbor, _, _ in self._row(chunk_id)]
+    
+    def weighted_neighbors(self, chunk_id: str) -> List[Tuple[str, float]]:
+        """(neighbor, weight) for every edge of a chunk"""
+        with self.lock:
+            self._check_fresh()
+            return [(neighbor, weight) for neighbor, weight, _ in self._row(chunk_id)]
+    
+    def edges_of(self, chunk_id: str) -> List[Tuple[str, float, str]]:
+        """(neighbor, weight, relationship) for every edge of a chunk"""
+        with self.lock:
+            self._check_fresh()
+            return list(self._row(chunk_id))
+    
+    def edges_among(self, chunk_ids: Iterable[str]) -> List[Tuple[str, str, str]]:
+        """(chunk_id_1, chunk_id_2, relationship) for edges with both ends in chunk_ids"""
+        chunk_ids = set(chunk_ids)
+        with self.lock:
+            self._check_fresh()
+            return [(chunk_id, neighbor, relationship) for chunk_id in chunk_ids
+                    for neighbor, _, relationship in self._row(chunk_id)
+                    if neighbor in chunk_ids and chunk_id <= neighbor]
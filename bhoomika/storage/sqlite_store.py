@@ -2,30 +2,111 @@
 SQLite Store for Document and Chunk Metadata
 """
 import os
-from sqlalchemy import create_engine, Column, String, Text, Integer, DateTime, ForeignKey
+import re
+import zlib
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Iterable, Optional, Tuple
+from sqlalchemy import (create_engine, event, text, func, Column, String, Text, Integer, DateTime, ForeignKey,
+                        Boolean, LargeBinary, Index, bindparam)
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, scoped_session
 from datetime import datetime
 import sys
 sys.path.append('..')
-from config import SQLITE_DB_PATH
+from config import (SQLITE_DB_PATH, DOCUMENT_TEXT_BLOCK_SIZE, DOCUMENT_TEXT_COMPRESSION_LEVEL, SQLITE_POOL_SIZE,
+                    SQLITE_POOL_OVERFLOW, SQLITE_BUSY_TIMEOUT_SECONDS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB,
+                    LEXICAL_CANDIDATES, LEXICAL_MAX_TERM_MATCHES)
 
 Base = declarative_base()
 
+# Full-text index of chunk text (LARGE chunks excluded: they repeat their document).
+# Its rowids are chunks.search_rowid; chunk_id is stored so matches need no join.
+# chunks_fts_vocab reads the number of chunks containing a term off the index.
+_CREATE_SEARCH_INDEX = text(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+    "content, chunk_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+)
+_CREATE_SEARCH_VOCABULARY = text(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts_vocab USING fts5vocab(chunks_fts, 'row')"
+)
+
+_SEARCH_TOKEN_RE = re.compile(r'\w+')
+_SEARCH_STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how', 'i', 'in',
+    'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the', 'this', 'to', 'what', 'when', 'where', 'which', 'who',
+    'why', 'with'
+})
+
+
+def search_terms(query: str) -> List[str]:
+    """Distinct words of a free-text query, stopwords dropped: "the 7/12 extract" -> ["7", "12", "extract"]"""
+    return list(dict.fromkeys(token for token in _SEARCH_TOKEN_RE.findall(query.lower())
+                              if token not in _SEARCH_STOPWORDS))
+
+_engines: Dict[Tuple[str, int], Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run alongside the single writer; synchronous=NORMAL
+    syncs at checkpoints instead of every commit (still safe in WAL mode).
+    Reads go through the memory map and a larger page cache.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+
+def get_engine(db_path: str = SQLITE_DB_PATH) -> Engine:
+    """
+    The process's pooled engine for a database file, shared by every store on it.
+    Keyed by process ID too, so a forked worker never reuses its parent's connections.
+    """
+    key = (os.path.abspath(db_path), os.getpid())
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                f'sqlite:///{db_path}',
+                pool_size=SQLITE_POOL_SIZE,
+                max_overflow=SQLITE_POOL_OVERFLOW,
+                connect_args={'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT_SECONDS}
+            )
+            event.listen(engine, 'connect', _set_pragmas)
+            _engines[key] = engine
+        return engine
+
 
 class Document(Base):
     """Document table for storing source documents"""
     __tablename__ = 'documents'
     
     id = Column(String(50), primary_key=True)
-    filename = Column(String(255), nullable=False)
+    filename = Column(String(255), nullable=False, index=True)
     filepath = Column(String(500))
     doc_type = Column(String(50))  # pdf, txt, md, etc.
     title = Column(String(500))
     description = Column(Text)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the full text
     created_at = Column(DateTime, default=datetime.utcnow)
     
     chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
+    text_blocks = relationship("DocumentTextBlock", cascade="all, delete-orphan")
+
+
+class DocumentTextBlock(Base):
+    """Full document text, split into zlib-compressed blocks of DOCUMENT_TEXT_BLOCK_SIZE characters"""
+    __tablename__ = 'document_text_blocks'
+    
+    document_id = Column(String(50), ForeignKey('documents.id'), primary_key=True)
+    block_index = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
 
 
 class Chunk(Base):
@@ -34,31 +115,137 @@ class Chunk(Base):
     
     id = Column(String(100), primary_key=True)
     document_id = Column(String(50), ForeignKey('documents.id'), nullable=False)
-    content = Column(Text, nullable=False)
+    content = Column(Text)  # NULL: a reference to the document text span [start_char, end_char)
     chunk_index = Column(Integer)
     chunk_type = Column(String(10), default='M')  # S, M, or L for multi-granularity
     start_char = Column(Integer)
     end_char = Column(Integer)
     chunk_metadata = Column(Text)  # JSON string for additional metadata (renamed from 'metadata')
+    content_hash = Column(String(64))  # SHA-1 of chunk type + text
+    tombstoned = Column(Boolean, default=False, nullable=False, server_default='0')  # Removed by a re-ingest
+    act_key = Column(String(200))  # Normalized act of the enclosing statute section (see pipeline.statutes.act_key)
+    section = Column(String(20))  # Section number, e.g. "17"
+    search_rowid = Column(Integer)  # Row of the chunk's text in chunks_fts (NULL: not indexed)
     
     document = relationship("Document", back_populates="chunks")
+    
+    __table_args__ = (
+        Index('ix_chunks_act_section', 'act_key', 'section'),  # Exact citation lookup
+        Index('ix_chunks_document_index', 'document_id', 'chunk_index'),  # A document's chunks, in order
+        Index('ix_chunks_type', 'chunk_type'),
+    )
+
+
+class StoreCounter(Base):
+    """Row counts kept by SQLiteStore writes, so stats never scan the tables"""
+    __tablename__ = 'store_counters'
+    
+    name = Column(String(20), primary_key=True)  # 'documents', or 'chunks' (live ones)
+    value = Column(Integer, nullable=False)
 
 
 class SQLiteStore:
     """
     SQLite store for document and chunk metadata
+    
+    Each thread (event loop, threadpool handlers, ingestion worker, stream
+    stages) gets its own session on a pooled connection of the process's
+    engine. release() ends it; call it when a request or job is done.
+    
+    The row counters and the full-text index are maintained by the store's
+    own writes; scripts that write the tables directly (ingest_standalone.py)
+    call recount() and rebuild_search_index() afterwards.
     """
     
-    def __init__(self):
-        os.makedirs(os.path.dirname(SQLITE_DB_PATH), exist_ok=True)
-        self.engine = create_engine(f'sqlite:///{SQLITE_DB_PATH}')
+    def __init__(self, db_path: str = SQLITE_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.engine = get_engine(db_path)
         Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        with self.engine.begin() as connection:
+            connection.execute(_CREATE_SEARCH_INDEX)
+            connection.execute(_CREATE_SEARCH_VOCABULARY)
+            if connection.execute(text("SELECT COUNT(*) FROM store_counters")).scalar() < 2:
+                self._recount(connection)
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+        self._local = threading.local()
+    
+    @property
+    def _in_transaction(self) -> bool:
+        return getattr(self._local, 'in_transaction', False)
+    
+    @_in_transaction.setter
+    def _in_transaction(self, value: bool):
+        self._local.in_transaction = value
+    
+    def release(self):
+        """Close this thread's session and return its connection to the pool"""
+        self.session.remove()
+    
+    @contextmanager
+    def session_scope(self):
+        """Release this thread's session when the block ends"""
+        try:
+            yield
+        finally:
+            self.release()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into one transaction: store methods called inside the
+        block do not commit; the block commits once at the end, or rolls
+        everything back if it raises.
+        """
+        if self._in_transaction:
+            yield
+            return
+        
+        self._in_transaction = True
+        try:
+            yield
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        finally:
+            self._in_transaction = False
+    
+    def _commit(self):
+        if not self._in_transaction:
+            self.session.commit()
+    
+    # Row counters (written in the same transaction as the rows they count)
+    def _count(self, name: str, delta: int):
+        if delta:
+            self.session.execute(text("UPDATE store_counters SET value = value + :delta WHERE name = :name"),
+                                 {'delta': delta, 'name': name})
+    
+    @staticmethod
+    def _recount(connection):
+        connection.execute(text(
+            "INSERT OR REPLACE INTO store_counters (name, value) "
+            "SELECT 'documents', COUNT(*) FROM documents "
+            "UNION ALL SELECT 'chunks', COUNT(*) FROM chunks WHERE tombstoned = 0"
+        ))
+    
+    def recount(self) -> Dict[str, int]:
+        """Reset the counters with full COUNT(*) scans, e.g. after rows were written outside SQLiteStore"""
+        self._recount(self.session)
+        self._commit()
+        return self.get_counters()
+    
+    def get_counters(self) -> Dict[str, int]:
+        """{'documents': n, 'chunks': live chunks}"""
+        return dict(self.session.execute(text("SELECT name, value FROM store_counters")).all())
+    
+    def _counter(self, name: str) -> int:
+        return self.session.execute(text("SELECT value FROM store_counters WHERE name = :name"),
+                                    {'name': name}).scalar() or 0
     
     # Document operations
     def add_document(self, doc_id: str, filename: str, filepath: str = None, 
-                     doc_type: str = None, title: str = None, description: str = None) -> Document:
+                     doc_type: str = None, title: str = None, description: str = None,
+                     content_hash: str = None) -> Document:
         """Add a new document"""
         doc = Document(
             id=doc_id,
@@ -66,16 +253,32 @@ class SQLiteStore:
             filepath=filepath,
             doc_type=doc_type,
             title=title or filename,
-            description=description
+            description=description,
+            content_hash=content_hash
         )
         self.session.add(doc)
-        self.session.commit()
+        self._count('documents', 1)
+        self._commit()
         return doc
     
     def get_document(self, doc_id: str) -> Document:
         """Get document by ID"""
         return self.session.query(Document).filter_by(id=doc_id).first()
     
+    def get_document_by_hash(self, content_hash: str) -> Document:
+        """Get the document whose full text has this hash (indexed lookup)"""
+        return self.session.query(Document).filter_by(content_hash=content_hash).first()
+    
+    def get_document_by_filename(self, filename: str) -> Document:
+        """Get the most recent document ingested under a filename"""
+        return (self.session.query(Document).filter_by(filename=filename)
+                .order_by(Document.created_at.desc()).first())
+    
+    def update_document(self, doc_id: str, **fields):
+        """Update document columns (e.g. content_hash after a re-ingest)"""
+        self.session.query(Document).filter_by(id=doc_id).update(fields)
+        self._commit()
+    
     def get_all_documents(self):
         """Get all documents"""
         return self.session.query(Document).all()
@@ -84,8 +287,95 @@ class SQLiteStore:
         """Delete document and its chunks"""
         doc = self.get_document(doc_id)
         if doc:
+            self.session.execute(text(
+                "DELETE FROM chunks_fts WHERE rowid IN (SELECT search_rowid FROM chunks WHERE document_id = :doc_id)"
+            ), {'doc_id': doc_id})
+            live_chunks = (self.session.query(func.count(Chunk.id))
+                           .filter(Chunk.document_id == doc_id, Chunk.tombstoned == False).scalar())
             self.session.delete(doc)
-            self.session.commit()
+            self._count('documents', -1)
+            self._count('chunks', -live_chunks)
+            self._commit()
+    
+    # Document text operations
+    def set_document_text(self, doc_id: str, text: str) -> int:
+        """
+        Store a document's full text (replacing any previous version) as
+        compressed blocks. Chunks stored as references are resolved against it.
+        
+        Returns the number of blocks written.
+        """
+        self.session.query(DocumentTextBlock).filter_by(document_id=doc_id).delete(synchronize_session=False)
+        rows = [{
+            'document_id': doc_id,
+            'block_index': index,
+            'data': zlib.compress(text[start:start + DOCUMENT_TEXT_BLOCK_SIZE].encode('utf-8'),
+                                  DOCUMENT_TEXT_COMPRESSION_LEVEL)
+        } for index, start in enumerate(range(0, len(text), DOCUMENT_TEXT_BLOCK_SIZE))]
+        if rows:
+            self.session.execute(DocumentTextBlock.__table__.insert(), rows)
+        self._commit()
+        return len(rows)
+    
+    def get_document_text(self, doc_id: str, start: int = 0, end: Optional[int] = None) -> str:
+        """Get a span of a document's text, decompressing only the blocks it covers"""
+        if end is None:
+            last = (self.session.query(DocumentTextBlock.block_index).filter_by(document_id=doc_id)
+                    .order_by(DocumentTextBlock.block_index.desc()).first())
+            if last is None:
+                return ""
+            end = (last[0] + 1) * DOCUMENT_TEXT_BLOCK_SIZE
+        blocks = self._load_text_blocks(doc_id, self._block_range(start, end))
+        return self._slice_blocks(blocks, start, end)
+    
+    def _block_range(self, start: int, end: int) -> range:
+        if end <= start:
+            return range(0)
+        return range(start // DOCUMENT_TEXT_BLOCK_SIZE, (end - 1) // DOCUMENT_TEXT_BLOCK_SIZE + 1)
+    
+    def _load_text_blocks(self, doc_id: str, block_indices: Iterable[int]) -> Dict[int, str]:
+        block_indices = sorted(set(block_indices))
+        if not block_indices:
+            return {}
+        rows = (self.session.query(DocumentTextBlock.block_index, DocumentTextBlock.data)
+                .filter(DocumentTextBlock.document_id == doc_id,
+                        DocumentTextBlock.block_index.in_(block_indices)).all())
+        return {index: zlib.decompress(data).decode('utf-8') for index, data in rows}
+    
+    def _slice_blocks(self, blocks: Dict[int, str], start: int, end: int) -> str:
+        span = self._block_range(start, end)
+        if not span:
+            return ""
+        text = ''.join(blocks.get(index, '') for index in span)
+        offset = span.start * DOCUMENT_TEXT_BLOCK_SIZE
+        return text[start - offset:end - offset]
+    
+    def resolve_chunk_contents(self, chunks: Iterable[Chunk]) -> Dict[str, str]:
+        """
+        Map chunk ID -> text. Inline contents are returned as stored;
+        references are sliced from their document's text, loading each
+        needed block once per document.
+        """
+        contents = {}
+        references = {}
+        for chunk in chunks:
+            if chunk.content is not None:
+                contents[chunk.id] = chunk.content
+            elif chunk.tombstoned:
+                # Its span refers to a document text that has since been replaced
+                contents[chunk.id] = ""
+            else:
+                references.setdefault(chunk.document_id, []).append(chunk)
+        
+        for doc_id, doc_chunks in references.items():
+            needed = set()
+            for chunk in doc_chunks:
+                needed.update(self._block_range(chunk.start_char, chunk.end_char))
+            blocks = self._load_text_blocks(doc_id, needed)
+            for chunk in doc_chunks:
+                contents[chunk.id] = self._slice_blocks(blocks, chunk.start_char, chunk.end_char)
+        
+        return contents
     
     # Chunk operations
     def add_chunk(self, chunk_id: str, document_id: str, content: str, 
@@ -103,39 +393,228 @@ class SQLiteStore:
             end_char=end_char,
             chunk_metadata=chunk_metadata
         )
+        if chunk_type != 'L':
+            chunk.search_rowid = self._index_texts([(chunk_id, content)])[0]
         self.session.add(chunk)
-        self.session.commit()
+        self._count('chunks', 1)
+        self._commit()
         return chunk
     
+    def add_chunks_bulk(self, rows: List[dict]) -> int:
+        """
+        Insert many chunks in a single transaction.
+        
+        Each row is a dict with the Chunk column names (id, document_id, content,
+        chunk_index, chunk_type, start_char, end_char, chunk_metadata). Rows may
+        belong to several documents. Uses a Core executemany insert, so the
+        whole batch costs one commit instead of one per chunk.
+        
+        Rows with content_ref set are stored as references: content is left
+        NULL and read back from the document text (see set_document_text).
+        The text of every non-LARGE row is added to the full-text index in
+        the same transaction. Tombstoned rows with the same IDs (a chunk that
+        comes back when a document is re-ingested A -> B -> A) are replaced.
+        
+        Returns the number of rows inserted.
+        """
+        if not rows:
+            return 0
+        
+        self.session.query(Chunk).filter(Chunk.id.in_([row['id'] for row in rows]), Chunk.tombstoned == True) \
+            .delete(synchronize_session=False)
+        searchable = [row for row in rows if row.get('chunk_type', 'M') != 'L']
+        search_rowids = dict(zip((row['id'] for row in searchable),
+                                 self._index_texts([(row['id'], row['content']) for row in searchable])))
+        stored = []
+        for row in rows:
+            row = dict(row)
+            if row.pop('content_ref', False):
+                row['content'] = None
+            row['search_rowid'] = search_rowids.get(row['id'])
+            stored.append(row)
+        self.session.execute(Chunk.__table__.insert(), stored)
+        self._count('chunks', len(rows))
+        self._commit()
+        return len(rows)
+    
+    def update_chunks_bulk(self, rows: List[dict]) -> int:
+        """
+        Update position columns of existing chunks in a single transaction.
+        
+        Each row needs id, chunk_index, start_char, end_char and chunk_metadata,
+        and may carry act_key and section.
+        """
+        if not rows:
+            return 0
+        
+        table = Chunk.__table__
+        statement = table.update().where(table.c.id == bindparam('chunk_id')).values(
+            chunk_index=bindparam('new_chunk_index'),
+            start_char=bindparam('new_start_char'),
+            end_char=bindparam('new_end_char'),
+            chunk_metadata=bindparam('new_chunk_metadata'),
+            act_key=bindparam('new_act_key'),
+            section=bindparam('new_section')
+        )
+        self.session.execute(statement, [{
+            'chunk_id': row['id'],
+            'new_chunk_index': row['chunk_index'],
+            'new_start_char': row['start_char'],
+            'new_end_char': row['end_char'],
+            'new_chunk_metadata': row.get('chunk_metadata'),
+            'new_act_key': row.get('act_key'),
+            'new_section': row.get('section')
+        } for row in rows])
+        self._commit()
+        return len(rows)
+    
+    def tombstone_chunks(self, chunk_ids: List[str]) -> int:
+        """Mark chunks removed by a re-ingest; they are hidden from all reads"""
+        if not chunk_ids:
+            return 0
+        
+        self.session.execute(text(
+            "DELETE FROM chunks_fts WHERE rowid IN (SELECT search_rowid FROM chunks WHERE id IN :chunk_ids)"
+        ).bindparams(bindparam('chunk_ids', expanding=True)), {'chunk_ids': list(chunk_ids)})
+        count = (self.session.query(Chunk).filter(Chunk.id.in_(chunk_ids), Chunk.tombstoned == False)
+                 .update({Chunk.tombstoned: True, Chunk.search_rowid: None}, synchronize_session=False))
+        self._count('chunks', -count)
+        self._commit()
+        return count
+    
+    def get_live_chunk_ids(self, document_id: str) -> List[str]:
+        """IDs of a document's chunks that are not tombstoned"""
+        rows = (self.session.query(Chunk.id)
+                .filter(Chunk.document_id == document_id, Chunk.tombstoned == False).all())
+        return [row[0] for row in rows]
+    
     def get_chunk(self, chunk_id: str) -> Chunk:
         """Get chunk by ID"""
         return self.session.query(Chunk).filter_by(id=chunk_id).first()
     
     def get_chunks_by_document(self, document_id: str):
         """Get all chunks for a document"""
-        return self.session.query(Chunk).filter_by(document_id=document_id).order_by(Chunk.chunk_index).all()
+        return (self.session.query(Chunk).filter_by(document_id=document_id, tombstoned=False)
+                .order_by(Chunk.chunk_index).all())
     
     def get_chunks_by_type(self, chunk_type: str):
         """Get all chunks of a specific type (S, M, or L)"""
-        return self.session.query(Chunk).filter_by(chunk_type=chunk_type).all()
+        return self.session.query(Chunk).filter_by(chunk_type=chunk_type, tombstoned=False).all()
+    
+    def get_section_chunks(self, act_keys: List[str], section: str) -> List[Chunk]:
+        """
+        Live S/M chunks of a statute section (indexed on act_key, section).
+        act_keys are alternatives; only the longest one that matches is used.
+        Section chunks (M) come first, then their paragraphs (S).
+        """
+        chunks = (self.session.query(Chunk)
+                  .filter(Chunk.act_key.in_(act_keys), Chunk.section == section,
+                          Chunk.tombstoned == False, Chunk.chunk_type != 'L').all())
+        if not chunks:
+            return []
+        
+        act_key = max((chunk.act_key for chunk in chunks), key=len)
+        chunks = [chunk for chunk in chunks if chunk.act_key == act_key]
+        return sorted(chunks, key=lambda chunk: (chunk.chunk_type != 'M', chunk.chunk_index))
     
     def get_chunk_content(self, chunk_id: str) -> str:
         """Get chunk content by ID"""
         chunk = self.get_chunk(chunk_id)
-        return chunk.content if chunk else ""
+        return self.resolve_chunk_contents([chunk])[chunk.id] if chunk else ""
     
     def get_multiple_chunk_contents(self, chunk_ids: list) -> dict:
         """Get multiple chunk contents"""
-        chunks = self.session.query(Chunk).filter(Chunk.id.in_(chunk_ids)).all()
-        return {chunk.id: chunk.content for chunk in chunks}
+        chunks = self.session.query(Chunk).filter(Chunk.id.in_(chunk_ids), Chunk.tombstoned == False).all()
+        return self.resolve_chunk_contents(chunks)
+    
+    # Full-text search
+    def _index_texts(self, entries: List[Tuple[str, str]]) -> List[int]:
+        """Add (chunk_id, text) entries to chunks_fts; returns their rowids (for chunks.search_rowid)"""
+        if not entries:
+            return []
+        first = self.session.execute(text("SELECT COALESCE(MAX(rowid), 0) + 1 FROM chunks_fts")).scalar()
+        rowids = list(range(first, first + len(entries)))
+        self.session.execute(
+            text("INSERT INTO chunks_fts (rowid, content, chunk_id) VALUES (:rowid, :content, :chunk_id)"),
+            [{'rowid': rowid, 'content': content or '', 'chunk_id': chunk_id}
+             for rowid, (chunk_id, content) in zip(rowids, entries)]
+        )
+        return rowids
+    
+    def search_chunks(self, query: str, limit: int = LEXICAL_CANDIDATES,
+                      max_term_matches: int = LEXICAL_MAX_TERM_MATCHES) -> List[Tuple[str, float]]:
+        """
+        Lexical search over live chunk text: (chunk_id, score) of the best
+        bm25 matches for any of the query's words, best first. Scores are
+        FTS5 bm25 negated, so higher is better; they are only comparable
+        within one query.
+        
+        Ranking computes bm25 for every matching chunk, so words found in
+        more than max_term_matches chunks are left out: they cost the most
+        and, being in most chunks, barely move bm25. A query of only such
+        words returns [].
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        frequencies = dict(self.session.execute(
+            text("SELECT term, doc FROM chunks_fts_vocab WHERE term IN :terms")
+            .bindparams(bindparam('terms', expanding=True)), {'terms': terms}
+        ).all())
+        terms = [term for term in terms if 0 < frequencies.get(term, 0) <= max_term_matches]
+        if not terms:
+            return []
+        
+        rows = self.session.execute(text(
+            "SELECT chunk_id, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit"
+        ), {'match': " OR ".join(f'"{term}"' for term in terms), 'limit': limit}).all()
+        return [(chunk_id, -score) for chunk_id, score in rows]
+    
+    def rebuild_search_index(self, documents_per_batch: int = 200) -> int:
+        """
+        Recreate chunks_fts from the live non-LARGE chunks, resolving
+        referenced text from the document blocks. For databases created
+        before the index, or after a crash between a write and its index
+        update. Reads and commits documents_per_batch documents at a time.
+        
+        Returns the number of chunks indexed.
+        """
+        self.session.execute(text("DROP TABLE IF EXISTS chunks_fts"))
+        self.session.execute(_CREATE_SEARCH_INDEX)
+        self.session.query(Chunk).update({Chunk.search_rowid: None}, synchronize_session=False)
+        self.session.commit()
+        
+        table = Chunk.__table__
+        document_ids = [row[0] for row in self.session.query(Document.id).order_by(Document.id).all()]
+        indexed = 0
+        for start in range(0, len(document_ids), documents_per_batch):
+            chunks = (self.session.query(Chunk)
+                      .filter(Chunk.document_id.in_(document_ids[start:start + documents_per_batch]),
+                              Chunk.tombstoned == False, Chunk.chunk_type != 'L')
+                      .order_by(Chunk.document_id, Chunk.chunk_index).all())
+            contents = self.resolve_chunk_contents(chunks)
+            rowids = self._index_texts([(chunk.id, contents[chunk.id]) for chunk in chunks])
+            if rowids:
+                self.session.execute(
+                    table.update().where(table.c.id == bindparam('chunk_id')).values(search_rowid=bindparam('rowid')),
+                    [{'chunk_id': chunk.id, 'rowid': rowid} for chunk, rowid in zip(chunks, rowids)]
+                )
+            indexed += len(rowids)
+            self.session.commit()
+            self.session.expunge_all()
+        
+        self.session.execute(text("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')"))
+        self.session.commit()
+        return indexed
     
     def count_chunks(self) -> int:
-        """Count total chunks"""
-        return self.session.query(Chunk).count()
+        """Count live chunks (maintained counter)"""
+        return self._counter('chunks')
     
     def count_documents(self) -> int:
-        """Count total documents"""
-        return self.session.query(Document).count()
+        """Count documents (maintained counter)"""
+        return self._counter('documents')
 
 
 # Singleton instance
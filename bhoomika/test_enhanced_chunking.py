@@ -8,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from pipeline.chunking import EnhancedChunker, chunk_document_multi_granularity
 from models.chunk_types import ChunkType
+from pipeline.statutes import find_statute_sections, section_for_span, parse_citations, act_key
 
 
 def test_multi_granularity_chunking():
@@ -156,6 +157,80 @@ def test_convenience_function():
     print("\n✅ Test 4 PASSED: Convenience function works correctly")
 
 
+def test_exact_offsets():
+    """Test that chunk offsets slice the original text exactly"""
+    
+    print("\n" + "="*60)
+    print("TEST 5: Exact Chunk Offsets")
+    print("="*60)
+    
+    test_text = "\n  Short heading.\n\nThe registration of land records shall be maintained by the Tehsildar for every village in the district.  \n\n\n  continued on the next line\nof the same paragraph.\n\nHowever, mutation entries follow.\n"
+    
+    result = chunk_document_multi_granularity(test_text)
+    
+    for chunk_type, chunks in result.items():
+        for chunk_text, start, end in chunks:
+            assert test_text[start:end] == chunk_text, f"{chunk_type.value} offsets should be exact"
+            assert chunk_text == chunk_text.strip(), "Chunks should not carry surrounding whitespace"
+    
+    assert len(result[ChunkType.SMALL]) == 4, "Should find 4 paragraphs"
+    assert result[ChunkType.LARGE][0][0] == test_text.strip(), "LARGE chunk should be the stripped document"
+    
+    print(f"\n✓ {sum(len(c) for c in result.values())} chunks slice the input exactly")
+    
+    print("\n✅ Test 5 PASSED: Chunk offsets are exact")
+
+
+def test_statute_sections():
+    """Test heading-aware chunking and citation parsing"""
+    
+    print("\n" + "="*60)
+    print("TEST 6: Statute Sections")
+    print("="*60)
+    
+    test_text = """# Registration Act, 1908
+
+## Section 17: Documents of which registration is compulsory
+(1) The following documents shall be registered.
+## Section 18: Documents of which registration is optional
+Instruments other than those in section 17 may be registered.
+"""
+    
+    sections = find_statute_sections(test_text)
+    assert [section.section for section in sections] == [None, "17", "18"], "Should find both sections"
+    assert sections[1].headings == ["Registration Act, 1908", "Section 17: Documents of which registration is compulsory"]
+    assert act_key(sections[1].act) == "registration act"
+    
+    medium = [chunk for chunk, _, _ in EnhancedChunker(structure_aware=True).generate_multi_granularity_chunks(test_text)[ChunkType.MEDIUM]]
+    assert medium[1].startswith("## Section 17") and "Section 18" not in medium[1], "MEDIUM chunks should not cross headings"
+    
+    nested_text = """# Registration Act, 1908
+## Section 17: Documents of which registration is compulsory
+(1) The following documents shall be registered.
+### Explanation
+A document purporting to transfer property is a document of transfer.
+## Section 18: Documents of which registration is optional
+Instruments other than those in section 17 may be registered."""
+    
+    sections = find_statute_sections(nested_text)
+    starts = [section.start for section in sections]
+    explanation = nested_text.index("A document purporting")
+    assert sections[1].end == nested_text.index("\n## Section 18"), "Section 17 should include its Explanation"
+    assert sections[0].end == len(nested_text), "The act heading should span every section"
+    assert sections[2].section == "17" and sections[2].headings[-1] == "Explanation", "Subsections inherit the section number"
+    assert section_for_span(sections, starts, explanation, explanation + 10) is sections[2]
+    assert section_for_span(sections, starts, nested_text.index("(1)"), explanation + 10) is sections[1], \
+        "A span across a subheading belongs to the enclosing section"
+    
+    citations = parse_citations("What does Section 17 of the Registration Act, 1908 say?")
+    assert citations and citations[0][1] == "17" and "registration act" in citations[0][0]
+    assert parse_citations("How do I register property?") == []
+    
+    print(f"\n✓ {len(sections)} sections, {len(medium)} MEDIUM chunks")
+    
+    print("\n✅ Test 6 PASSED: Statute sections and citations work correctly")
+
+
 if __name__ == "__main__":
     print("\n" + "#"*60)
     print("# Enhanced RAG System - Multi-Granularity Chunking Tests")
@@ -166,6 +241,8 @@ if __name__ == "__main__":
         test_semantic_merging()
         test_keyword_extraction()
         test_convenience_function()
+        test_exact_offsets()
+        test_statute_sections()
         
         print("\n" + "="*60)
         print("🎉 ALL TESTS PASSED!")
@@ -175,6 +252,8 @@ if __name__ == "__main__":
         print("  ✓ Semantic paragraph merging")
         print("  ✓ Keyword-based knowledge graph relations")
         print("  ✓ Convenience functions")
+        print("  ✓ Exact chunk offsets")
+        print("  ✓ Statute sections and citations")
         print("\n")
         
     except AssertionError as e:
@@ -0,0 +1,482 @@
+"""
+Test Script: Knowledge Graph Storage Backends
+Verifies the CSR backend against the networkx backend under random mutations
+"""
+import sys
+import os
+import random
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import storage.csr_graph as csr_graph
+from storage.csr_graph import CSRGraph
+from storage.graph_backends import NetworkXGraph, open_graph
+from storage.sqlite_graph import SQLiteGraph
+from storage.graph_analytics import GraphAnalytics
+import storage.knowledge_graph as graph_module
+from storage.knowledge_graph import KnowledgeGraph
+
+RELATIONSHIPS = ["sequential", "semantic", "shared_concept:Tehsildar", "shared_concept:RTC"]
+
+
+def _snapshot(graph, nodes):
+    """Every edge as {(u, v): (weight, relationship)} plus node documents"""
+    edges = {}
+    for node in nodes:
+        if graph.has_node(node):
+            for neighbor, weight, relationship in graph.edges_of(node):
+                edges[tuple(sorted((node, neighbor)))] = (round(weight, 2), relationship)
+            assert sorted(graph.weighted_neighbors(node)) == sorted((n, w) for n, w, _ in graph.edges_of(node))
+    documents = {node: graph.node_document(node) for node in nodes if graph.has_node(node)}
+    return edges, documents
+
+
+def _mutate(graphs, nodes, rng, steps):
+    for _ in range(steps):
+        action = rng.random()
+        if action < 0.6:
+            edges = [(rng.choice(nodes), rng.choice(nodes), rng.choice([0.75, 0.8, 0.9]), rng.choice(RELATIONSHIPS))
+                     for _ in range(5)]
+            edges = [edge for edge in edges if edge[0] != edge[1]]
+            added = {graph.add_edges(edges) for graph in graphs}
+            assert len(added) == 1, "Backends should agree on the number of new edges"
+        elif action < 0.75:
+            pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(5)]
+            assert len({graph.remove_edges(pairs) for graph in graphs}) == 1
+        elif action < 0.85:
+            removed = rng.sample(nodes, 2)
+            assert len({graph.remove_nodes(removed) for graph in graphs}) == 1
+        else:
+            chunk_ids = rng.sample(nodes, 3)
+            document_id = f"doc_{rng.randint(0, 3)}"
+            for graph in graphs:
+                graph.set_document(chunk_ids, document_id)
+
+
+def test_csr_matches_networkx():
+    """Random adds, updates and removals give identical graphs, across merges and reloads"""
+    rng = random.Random(11)
+    nodes = [f"doc_chunk_{i}" for i in range(60)]
+    original_limit = csr_graph.GRAPH_DELTA_MAX_EDGES
+    csr_graph.GRAPH_DELTA_MAX_EDGES = 40  # Force frequent merges
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            reference = NetworkXGraph(os.path.join(tmp, "graph.gpickle"))
+            csr = CSRGraph(os.path.join(tmp, "graph_csr"))
+            
+            for _ in range(5):
+                _mutate([reference, csr], nodes, rng, steps=80)
+                assert csr.number_of_nodes() == reference.number_of_nodes()
+                assert csr.number_of_edges() == reference.number_of_edges()
+                assert _snapshot(csr, nodes) == _snapshot(reference, nodes)
+                
+                csr.save()
+                csr = CSRGraph(os.path.join(tmp, "graph_csr"))
+                assert _snapshot(csr, nodes) == _snapshot(reference, nodes), "Reload should keep the graph"
+            
+            document_nodes = sorted(reference.document_nodes("doc_1"))
+            assert sorted(csr.document_nodes("doc_1")) == document_nodes
+            among = [sorted(tuple(sorted(edge[:2])) + (edge[2],) for edge in graph.edges_among(nodes[:20]))
+                     for graph in (csr, reference)]
+            assert among[0] == among[1]
+            assert len(os.listdir(os.path.join(tmp, "graph_csr"))) == 2, "Old versions should be removed"
+    finally:
+        csr_graph.GRAPH_DELTA_MAX_EDGES = original_limit
+    
+    print("\n✅ CSR backend matches networkx under random mutations")
+
+
+def test_sqlite_matches_networkx():
+    """The sqlite edge table matches networkx, and a second connection sees writes through the version counter"""
+    rng = random.Random(23)
+    nodes = [f"doc_chunk_{i}" for i in range(60)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "graph.db")
+        reference = NetworkXGraph(os.path.join(tmp, "graph.gpickle"))
+        writer = SQLiteGraph(db_path)
+        reader = SQLiteGraph(db_path)  # Stands in for another worker
+        
+        for _ in range(3):
+            _mutate([reference, writer], nodes, rng, steps=80)
+            assert writer.number_of_edges() == reference.number_of_edges()
+            assert reader.number_of_nodes() == reference.number_of_nodes()
+            assert _snapshot(reader, nodes) == _snapshot(reference, nodes), "Reader should see committed writes"
+        
+        assert sorted(reader.document_nodes("doc_1")) == sorted(reference.document_nodes("doc_1"))
+        among = [sorted(tuple(sorted(edge[:2])) + (edge[2],) for edge in graph.edges_among(nodes[:20]))
+                 for graph in (reader, reference)]
+        assert among[0] == among[1]
+        
+        reader.neighbors(nodes[0])
+        hits = reader.cache_hits
+        reader.neighbors(nodes[0])
+        assert reader.cache_hits == hits + 1, "Unchanged graph should be served from the row cache"
+        writer.add_edges([(nodes[0], "new_chunk", 0.9, "semantic")])
+        assert "new_chunk" in reader.neighbors(nodes[0]), "Version bump should drop the stale row"
+        assert reader.refresh() and not reader.refresh(), "Reader should report the other connection's write once"
+        assert not writer.refresh(), "Own writes are not external changes"
+
+        # A traversal checks the version once, on entry, not before each read
+        statements = []
+        reader.conn.set_trace_callback(statements.append)
+        with reader.traversal():
+            for chunk_id in nodes[:10]:
+                reader.edges_of(chunk_id)
+            writer.add_edges([(nodes[1], "later_chunk", 0.9, "semantic")])
+            assert "later_chunk" not in reader.neighbors(nodes[1]) and not reader.refresh()
+        assert sum("graph_meta" in statement for statement in statements) == 1
+        assert "later_chunk" in reader.neighbors(nodes[1]), "The next read outside the traversal sees the write"
+        reader.conn.set_trace_callback(None)
+
+    
+    print("\n✅ SQLite backend matches networkx and shares writes across connections")
+
+
+def test_legacy_pickle_conversion():
+    """A networkx pickle is converted when the csr or sqlite backend opens it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "knowledge_graph.gpickle")
+        legacy = NetworkXGraph(path)
+        legacy.add_edges([("a", "b", 0.8, "sequential"), ("b", "c", 0.9, "shared_concept:Mutation")])
+        legacy.set_document(["a", "b", "c"], "doc")
+        legacy.save()
+        
+        for backend in ("csr", "sqlite"):
+            graph = open_graph(backend, path)
+            assert graph.number_of_edges() == 2
+            assert sorted(graph.neighbors("b")) == ["a", "c"]
+            assert graph.node_document("c") == "doc"
+            assert ("c", 0.9, "shared_concept:Mutation") in [(n, round(w, 2), r) for n, w, r in graph.edges_of("b")]
+        assert KnowledgeGraph(path).get_document_chunks("doc") == ["a", "b", "c"], "Document index rebuilt from nodes"
+    
+    print("\n✅ Legacy networkx pickle converted to CSR and sqlite")
+
+
+def test_edge_log():
+    """Saves append small log frames; reload replays them; a torn frame is dropped; large logs compact"""
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "graph_csr")
+        graph = CSRGraph(directory)
+        graph.add_edges([(f"n{i}", f"n{i + 1}", 0.8, "sequential") for i in range(500)])
+        graph.save()
+        assert graph.last_save["mode"] == "snapshot"
+        snapshot_version = graph._current_version()
+        
+        graph.add_edges([("n0", "n7", 0.9, "shared_concept:Khata"), ("n3", "new", 0.75, "semantic")])
+        buffered = graph.edges_of("n0")
+        graph.remove_edges([("n1", "n2")])
+        graph.remove_nodes(["n9"])
+        graph.save()
+        assert graph.last_save["mode"] == "append"
+        assert graph.last_save["bytes"] < 200, "Only the new mutations should be written"
+        assert graph._current_version() == snapshot_version
+        expected = _snapshot(graph, [f"n{i}" for i in range(501)] + ["new"])
+        
+        reloaded = CSRGraph(directory)
+        assert _snapshot(reloaded, [f"n{i}" for i in range(501)] + ["new"]) == expected
+        assert reloaded.number_of_edges() == graph.number_of_edges()
+        assert not reloaded.has_node("n9")
+        reloaded.merge()
+        assert sorted(reloaded.edges_of("n0")) == sorted(buffered), "Buffered weights already have float16 precision"
+        
+        # A crash in the middle of an append leaves a torn frame: it is ignored and truncated
+        reloaded.add_edges([("n20", "n40", 0.9, "semantic")])
+        log_path = os.path.join(directory, snapshot_version, "edges.log")
+        complete = os.path.getsize(log_path)
+        with open(log_path, 'ab') as f:
+            f.write(bytes(reloaded.pending)[:-3])
+        recovered = CSRGraph(directory)
+        assert _snapshot(recovered, [f"n{i}" for i in range(501)] + ["new"]) == expected
+        assert os.path.getsize(log_path) == complete
+        
+        # Past the compaction threshold the next save writes a new snapshot
+        original = csr_graph.GRAPH_LOG_MIN_COMPACT_BYTES, csr_graph.GRAPH_LOG_COMPACT_RATIO
+        csr_graph.GRAPH_LOG_MIN_COMPACT_BYTES, csr_graph.GRAPH_LOG_COMPACT_RATIO = 0, 0.0
+        try:
+            recovered.add_edges([("n20", "n40", 0.9, "semantic")])
+            recovered.save()
+        finally:
+            csr_graph.GRAPH_LOG_MIN_COMPACT_BYTES, csr_graph.GRAPH_LOG_COMPACT_RATIO = original
+        assert recovered.last_save["mode"] == "snapshot"
+        assert recovered._current_version() != snapshot_version
+        assert CSRGraph(directory).number_of_edges() == recovered.number_of_edges()
+    
+    print("\n✅ Edge log appends, replays, recovers from torn frames and compacts")
+
+
+def test_document_index():
+    """Document chunk lists stay ordered through re-ingestion, deletion and reloads"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "knowledge_graph.gpickle")
+        graph = KnowledgeGraph(path)
+        first = [f"a_chunk_{i}_S" for i in range(4)] + ["a_chunk_9_L"]
+        graph.add_sequential_edges(first, "a")
+        graph.add_sequential_edges(["b_chunk_0_S", "b_chunk_1_L"], "b")
+        
+        assert graph.get_document_chunks("a") == first
+        assert graph.get_chunk_document("b_chunk_0_S") == "b"
+        assert graph.graph.node_document("b_chunk_0_S") == "b", "Backend nodes carry their document"
+        assert graph.graph.document_nodes("b") == ["b_chunk_0_S", "b_chunk_1_L"]
+        graph.add_sequential_edges(["c_chunk_0_L"], "c")
+        assert graph.graph.has_node("c_chunk_0_L"), "A one-chunk document still gets its node"
+        assert graph.get_document_chunks("c") == ["c_chunk_0_L"]
+        assert graph.get_large_context(["a_chunk_2_S", "b_chunk_0_S", "a_chunk_0_S"]) == ["a_chunk_9_L", "b_chunk_1_L"]
+        
+        # Re-ingestion: removed chunks leave the index, the new order replaces the old one
+        graph.remove_chunks(["a_chunk_1_S"])
+        second = ["a_chunk_5_S", "a_chunk_0_S", "a_chunk_3_S", "a_chunk_9_L"]
+        graph.add_sequential_edges(second, "a")
+        assert graph.get_document_chunks("a") == second
+        assert graph.get_chunk_document("a_chunk_1_S") is None
+        assert graph.get_chunk_document("a_chunk_2_S") is None
+        
+        graph.save()
+        graph = KnowledgeGraph(path)
+        assert graph.get_document_chunks("a") == second, "Index should be persisted with the graph"
+        
+        assert sorted(graph.remove_document("b")) == ["b_chunk_0_S", "b_chunk_1_L"]
+        assert not graph.graph.has_node("b_chunk_0_S")
+        assert graph.get_document_chunks("b") == []
+        assert graph.get_large_context(["b_chunk_0_S"]) == []
+    
+    print("\n✅ Document index maintained across re-ingestion, deletion and reload")
+
+
+def test_personalized_pagerank():
+    """Local PageRank matches a dense power iteration and respects its budgets"""
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+        nodes = [f"c{i}" for i in range(40)]
+        edges = {}
+        for _ in range(90):
+            u, v = rng.sample(nodes, 2)
+            edges[tuple(sorted((u, v)))] = (round(rng.uniform(0.75, 1.0), 2), rng.choice(RELATIONSHIPS))
+        graph.graph.add_edges((u, v, weight, relationship) for (u, v), (weight, relationship) in edges.items())
+        graph.add_node("isolated")
+        seeds = {"c0": 0.9, "c5": 0.6, "isolated": 0.3}
+        
+        # Dense reference over every node
+        everything = nodes + ["isolated"]
+        index = {node: i for i, node in enumerate(everything)}
+        transitions = np.zeros((len(everything), len(everything)))
+        for (u, v), (weight, relationship) in edges.items():
+            weight = float(np.float16(weight))  # Stored precision
+            weight *= graph_module.GRAPH_RELATIONSHIP_WEIGHTS.get(relationship.split(':')[0], 1.0)
+            transitions[index[u], index[v]] += weight
+            transitions[index[v], index[u]] += weight
+        row_totals = transitions.sum(axis=1)
+        transitions[row_totals > 0] /= row_totals[row_totals > 0, None]
+        personalization = np.zeros(len(everything))
+        for node, mass in seeds.items():
+            personalization[index[node]] = mass / sum(seeds.values())
+        expected = personalization.copy()
+        for _ in range(300):
+            dangling = expected[row_totals == 0].sum()
+            expected = 0.15 * personalization + 0.85 * (transitions.T @ expected + dangling * personalization)
+        
+        scores = graph.personalized_pagerank(seeds, restart=0.15, max_iterations=300, time_budget_ms=10 ** 6,
+                                             tolerance=0.0, min_mass=0.0)
+        assert abs(sum(scores.values()) - 1.0) < 1e-9
+        for node, score in scores.items():
+            assert abs(score - expected[index[node]]) < 1e-9, node
+        
+        # A spent budget stops after one iteration, having expanded at least the heaviest seed
+        scores = graph.personalized_pagerank(seeds, time_budget_ms=0.0)
+        assert graph.last_pagerank["iterations"] == 1
+        reachable = set(seeds) | {neighbor for seed in seeds for neighbor in graph.graph.neighbors(seed)}
+        assert set(graph.graph.neighbors("c0")) <= set(scores) <= reachable
+        
+        propagated = graph.personalized_pagerank(seeds, exclude_restart=True)
+        assert propagated["isolated"] == 0.0, "An isolated seed gets no graph support"
+        assert graph.personalized_pagerank({"missing": 1.0}) == {}
+    
+    print("\n✅ Personalized PageRank matches the dense reference within its budgets")
+
+
+def test_multi_source_expansion():
+    """One BFS over all seeds: minimal hop distances, fan-out caps by weight, relationship filters"""
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+        # A chain a0 - a1 - ... - a5, and a hub (LARGE chunk) linked to everything
+        graph.graph.add_edges([(f"a{i}", f"a{i + 1}", 0.8, "sequential") for i in range(5)])
+        graph.graph.add_edges([("hub_L", f"leaf{i}", 0.5 + i / 100, "semantic") for i in range(30)])
+        graph.graph.add_edges([("a2", "hub_L", 0.9, "shared_concept:Khata"), ("a0", "leaf0", 0.95, "semantic")])
+        
+        hops = graph.expand(["a0", "a5", "missing"], depth=2, fanout=None)
+        assert hops["a0"] == 0 and hops["a5"] == 0 and "missing" not in hops
+        assert hops["a1"] == 1 and hops["a4"] == 1 and hops["a2"] == 2 and hops["a3"] == 2
+        assert hops["leaf0"] == 1 and hops["hub_L"] == 2
+        
+        # Same nodes as separate uncapped BFS runs per seed
+        separate = set().union(*(graph.get_neighbors(seed, depth=3) | {seed} for seed in ("a0", "a5")))
+        assert set(graph.expand(["a0", "a5"], depth=3, fanout=None)) == separate
+        
+        # The hub contributes only its heaviest neighbors
+        capped = graph.expand(["hub_L"], depth=1, fanout=(3,))
+        assert sorted(chunk_id for chunk_id, hop in capped.items() if hop == 1) == ["a2", "leaf28", "leaf29"]
+        
+        filtered = graph.expand(["a2"], depth=2, fanout=None, relationships=["shared_concept:*"])
+        assert filtered == {"a2": 0, "hub_L": 1}
+        assert graph.get_related_chunks(["a2"], depth=1, relationships=["sequential"]) == {"a1", "a3"}
+    
+    print("\n✅ Multi-source expansion with fan-out caps and relationship filters")
+
+
+def test_neighborhood_cache():
+    """Cached expansions and PageRank rows hit, are invalidated by touching edges, and can be precomputed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+        graph.add_sequential_edges([f"a{i}" for i in range(6)], "a")
+        graph.add_sequential_edges([f"b{i}" for i in range(4)], "b")
+        cache = graph.neighborhood_cache
+        
+        first = graph.expand_cached(["a0"], depth=2)
+        assert first == graph.expand(["a0"], depth=2) == {"a0": 0, "a1": 1, "a2": 2}
+        assert graph.expand_cached(["a0"], depth=2) == first
+        assert cache.hits == 1 and cache.misses == 1
+        
+        # Several seeds: one joint BFS, cached for the seed set in any order
+        joint = graph.expand(["a0", "b0"], depth=2, fanout=(1,))
+        assert graph.expand_cached(["b0", "a0"], depth=2, fanout=(1,)) == joint
+        assert graph.expand_cached(["a0", "b0", "a0"], depth=2, fanout=(1,)) == joint
+        assert cache.hits == 2 and cache.misses == 2
+        cache.invalidate(["b0"])
+        
+        # Edges elsewhere keep the entry; an edge touching a member drops it
+        graph.add_sequential_edges(["b3", "c0"], "c")
+        assert len(cache) == 1
+        graph.add_semantic_edges([("a2", "b0", 0.9)])
+        assert len(cache) == 0
+        assert graph.expand_cached(["a0"], depth=2) == {"a0": 0, "a1": 1, "a2": 2}
+        
+        # PageRank rows: cached results match a cold run, removals drop the rows around them
+        cold = graph.personalized_pagerank({"a0": 1.0})
+        hits = cache.hits
+        assert graph.personalized_pagerank({"a0": 1.0}) == cold
+        assert cache.hits > hits
+        graph.remove_chunks(["a1"])
+        assert "a1" not in graph.personalized_pagerank({"a0": 1.0}), "Row of a0 should not keep the removed chunk"
+        
+        # Precompute warms the most-retrieved chunks; retrieval counts are saved with the graph
+        graph.save()
+        graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+        assert graph.neighborhood_cache.most_retrieved(1) == ["a0"]
+        assert graph.precompute_neighborhoods(top_n=1) == 1
+        assert graph.neighborhood_cache.hits == graph.neighborhood_cache.misses == 0, "Precompute is not counted"
+        graph.expand_cached(["a0"], depth=2)
+        graph.personalized_pagerank({"a0": 1.0}, max_iterations=1)
+        assert graph.neighborhood_cache.get_stats()["hit_rate"] == 1.0
+        
+        # LRU bound
+        graph.neighborhood_cache.max_entries = 2
+        graph.expand_cached(["b0", "b1", "b2"], depth=1)
+        assert len(graph.neighborhood_cache) == 2 and graph.neighborhood_cache.evictions > 0
+    
+    print("\n✅ Neighborhood cache hits, invalidates on touching edges and precomputes hot chunks")
+
+
+def test_graph_analytics():
+    """Incrementally maintained graph statistics match a fresh scan after adds and removals"""
+    rng = random.Random(31)
+    
+    def structure(stats):
+        return {key: value for key, value in stats.items() if key != "traversals"}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+        graph.analytics.hub_min_degree = 4
+        graph.add_sequential_edges([f"a{i}" for i in range(10)], "a")
+        graph.add_node("lonely", "z")
+        
+        stats = graph.get_graph_stats()
+        assert stats["edges_by_relationship"] == {"sequential": 9}
+        assert stats["components"] == {"count": 2, "isolated_nodes": 1, "largest": [10]}
+        assert stats["degree"]["histogram"] == [{"degree": "0", "nodes": 1}, {"degree": "1", "nodes": 2},
+                                                {"degree": "2-3", "nodes": 8}]
+        
+        nodes = [f"{prefix}{i}" for prefix in "abc" for i in range(10)]
+        for step in range(60):
+            action = rng.random()
+            if action < 0.5:
+                graph.add_keyword_relations(rng.sample(nodes, 4), ["Tehsildar RTC"] * 4, f"doc_{step}")
+            elif action < 0.7:
+                graph.add_semantic_edges([(rng.choice(nodes), rng.choice(nodes), 0.8) for _ in range(3)])
+            elif action < 0.85:
+                graph.remove_edges_among(rng.sample(nodes, 6), keep_relationships=())
+            else:
+                graph.remove_chunks(rng.sample(nodes, 2))
+            expected = GraphAnalytics(hub_min_degree=4).get_stats(graph.graph)
+            assert structure(graph.get_graph_stats()) == structure(expected), f"Stats drifted at step {step}"
+        
+        assert stats["hubs"] == [] and expected["hubs"], "Hubs appear as degrees grow"
+        
+        graph.get_related_chunks(["a0", "b0"], depth=2)
+        graph.personalized_pagerank({"c0": 1.0})
+        traversals = graph.get_graph_stats()["traversals"]
+        assert traversals["expansion"]["queries"] == 1 and traversals["pagerank"]["queries"] == 1
+        assert traversals["expansion"]["max_nodes"] >= 2
+    
+    print("\n✅ Graph statistics maintained incrementally and traversals recorded")
+
+
+def _concept_edges(graph, chunk_ids):
+    """{(u, v): keyword} of the shared_concept edges touching chunk_ids"""
+    return {tuple(sorted((chunk_id, neighbor))): relationship.split(":", 1)[1]
+            for chunk_id in chunk_ids for neighbor, _, relationship in graph.graph.edges_of(chunk_id)
+            if relationship.startswith("shared_concept:")}
+
+
+def test_keyword_relations():
+    """Over-common keywords produce no edges; the cross-document pass only links across documents"""
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+        # 50 chunks: the cap is max(KEYWORD_MIN_DF_CAP, 0.2 * 50) = 10 chunks
+        chunks = [f"a{i}" for i in range(50)]
+        texts = []
+        for i in range(50):
+            words = ["Tehsildar"]  # Every chunk: a hub
+            words += ["Mutation"] if i < 3 else []
+            words += ["Collector"] if i < 10 else []  # At the cap
+            words += ["Registrar"] if 20 <= i < 31 else []  # One over the cap
+            texts.append(" ".join(words) + " records.")
+        graph.add_keyword_relations(chunks, texts, "a", cross_document=False)
+
+        edges = _concept_edges(graph, chunks)
+        keywords = set(edges.values())
+        assert "Tehsildar" not in keywords and "Registrar" not in keywords, "Keywords over the cap are hubs"
+        assert sum(keyword == "Collector" for keyword in edges.values()) == 45 - 3
+        assert [pair for pair, keyword in edges.items() if keyword == "Mutation"] == \
+            [("a0", "a1"), ("a0", "a2"), ("a1", "a2")], "Pairs are labelled with their rarest shared keyword"
+
+        # Without the cross-document pass another document's chunks stay unlinked
+        graph.add_keyword_relations(["b0", "b1"], ["Mutation Survey", "Registrar Survey"], "b", cross_document=False)
+        assert set(_concept_edges(graph, ["b0", "b1"])) == {("b0", "b1")}
+
+        graph.add_keyword_relations(["c0", "c1"], ["Mutation Settlement", "Tehsildar Settlement"], "c",
+                                    cross_document=True)
+        linked = _concept_edges(graph, ["c0", "c1"])
+        assert linked.pop(("c0", "c1")) == "Settlement"
+        assert all(u[0] != v[0] for u, v in linked), "Cross-document pass only links across documents"
+        assert set(linked) == {("a0", "c0"), ("a1", "c0"), ("a2", "c0"), ("b0", "c0")}
+        assert set(linked.values()) == {"Mutation"}, "Tehsildar is in more than KEYWORD_GLOBAL_MAX_DF chunks"
+        assert _concept_edges(graph, chunks + ["b0", "b1"]).keys() - linked.keys() == edges.keys() | {("b0", "b1")}, \
+            "No new edges among the other documents' chunks"
+
+    print("\n✅ Keyword relations capped by document frequency; cross-document links only across documents")
+
+
+if __name__ == "__main__":
+    test_csr_matches_networkx()
+    test_sqlite_matches_networkx()
+    test_legacy_pickle_conversion()
+    test_edge_log()
+    test_document_index()
+    test_personalized_pagerank()
+    test_multi_source_expansion()
+    test_neighborhood_cache()
+    test_graph_analytics()
+    test_keyword_relations()
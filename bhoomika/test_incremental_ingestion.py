@@ -0,0 +1,231 @@
+"""
+Test Script: Incremental Re-ingestion Storage
+Verifies tombstoned chunks are hidden from SQLite reads and vector search
+"""
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import EMBEDDING_DIMENSION, DOCUMENT_TEXT_BLOCK_SIZE
+from storage.simple_store import SimpleVectorStore
+from storage.sqlite_store import SQLiteStore
+from storage.knowledge_graph import KnowledgeGraph
+from storage.persistence import PersistenceManager
+from pipeline.ingestion import DocumentIngestion
+
+
+def test_vector_tombstones_and_compact():
+    """Removed vectors are skipped by search and dropped by compact()"""
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((20, EMBEDDING_DIMENSION)).astype(np.float32)
+    chunk_ids = [f"chunk_{i}" for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        store.add_batch(chunk_ids, vectors)
+
+        assert store.remove(["chunk_5", "missing"]) == 1
+        assert store.count() == 19
+        results = store.search(vectors[5], top_k=3)
+        assert "chunk_5" not in [cid for cid, _ in results], "Tombstoned vector should not be returned"
+
+        # Tombstones survive a reload
+        store.save()
+        reloaded = SimpleVectorStore(index_dir=tmp)
+        assert reloaded.tombstones == {5}
+
+        reloaded.compact()
+        assert len(reloaded.vectors) == 19 and not reloaded.tombstones
+        assert reloaded.search(vectors[6], top_k=1)[0][0] == "chunk_6"
+
+    print("\n✅ Vector tombstones hidden from search and compacted")
+
+
+def test_sqlite_tombstones_hidden():
+    """Tombstoned chunks disappear from document reads and counts"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+        store.add_document(doc_id="doc1", filename="doc1.txt", content_hash="abc")
+        store.add_chunks_bulk([{
+            "id": f"doc1_chunk_{i}", "document_id": "doc1", "content": f"text {i}",
+            "chunk_index": i, "chunk_type": "M", "start_char": 0, "end_char": 6,
+            "chunk_metadata": None, "content_hash": None
+        } for i in range(3)])
+
+        assert store.get_document_by_hash("abc").id == "doc1"
+        assert store.tombstone_chunks(["doc1_chunk_1"]) == 1
+        assert store.count_chunks() == 2
+        assert sorted(store.get_live_chunk_ids("doc1")) == ["doc1_chunk_0", "doc1_chunk_2"]
+        assert "doc1_chunk_1" not in store.get_multiple_chunk_contents(["doc1_chunk_1"])
+
+        store.session.close()
+        store.engine.dispose()
+
+    print("\n✅ Tombstoned chunks hidden from SQLite reads")
+
+
+def test_chunk_text_references():
+    """Chunks stored as references are sliced from the compressed document text"""
+    text = "".join(f"Section {i}. The Tehsildar shall maintain the record of rights.\n\n" for i in range(3000))
+    assert len(text) > 2 * DOCUMENT_TEXT_BLOCK_SIZE
+    spans = [(0, 10), (DOCUMENT_TEXT_BLOCK_SIZE - 20, DOCUMENT_TEXT_BLOCK_SIZE + 20), (0, len(text))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+        store.add_document(doc_id="doc1", filename="doc1.txt")
+        assert store.set_document_text("doc1", text) == -(-len(text) // DOCUMENT_TEXT_BLOCK_SIZE)
+        store.add_chunks_bulk([{
+            "id": f"doc1_chunk_{i}", "document_id": "doc1", "content": text[start:end],
+            "chunk_index": i, "chunk_type": "M", "start_char": start, "end_char": end,
+            "chunk_metadata": None, "content_hash": None, "content_ref": True
+        } for i, (start, end) in enumerate(spans)])
+
+        assert all(chunk.content is None for chunk in store.get_chunks_by_document("doc1"))
+        contents = store.get_multiple_chunk_contents([f"doc1_chunk_{i}" for i in range(len(spans))])
+        for i, (start, end) in enumerate(spans):
+            assert contents[f"doc1_chunk_{i}"] == text[start:end], "Reference should resolve to its span"
+        assert store.get_document_text("doc1", 5, 15) == text[5:15]
+
+        store.session.close()
+        store.engine.dispose()
+
+    print("\n✅ Chunk references resolve across compressed text blocks")
+
+
+class _Embeddings:
+    """Deterministic vectors from the text hash; texts about mutation share one vector"""
+    def embed_batch(self, texts):
+        return [np.random.default_rng(0 if "mutation" in text else abs(hash(text)) % 2**32)
+                .standard_normal(EMBEDDING_DIMENSION).tolist() for text in texts]
+
+
+def _ingestion(tmp: str) -> DocumentIngestion:
+    ingestion = DocumentIngestion.__new__(DocumentIngestion)
+    ingestion.embeddings = _Embeddings()
+    ingestion.faiss_store = SimpleVectorStore(index_dir=tmp)
+    ingestion.sqlite_store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+    ingestion.knowledge_graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+    ingestion.persistence = PersistenceManager(interval_seconds=3600, max_dirty_ops=10**6)
+    ingestion.last_version = None
+    return ingestion
+
+
+def test_reingest_returning_chunks():
+    """A -> B -> A under one title brings the tombstoned chunks of A back"""
+    text_a = "\n\n".join(f"Section {i}. The Tehsildar shall maintain the record of rights." for i in range(6))
+    text_b = "\n\n".join(f"Section {i}. The Collector may revise any mutation order." for i in range(6))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = _ingestion(tmp)
+        store, vectors = ingestion.sqlite_store, ingestion.faiss_store
+
+        doc_id = ingestion.ingest_text(text_a, title="Land Revenue Code")
+        chunks_a = sorted(store.get_live_chunk_ids(doc_id))
+        assert ingestion.ingest_text(text_b, title="Land Revenue Code") == doc_id
+        assert ingestion.ingest_text(text_a, title="Land Revenue Code") == doc_id
+        assert ingestion.last_version.status == "updated" and ingestion.last_version.added_chunk_ids
+
+        assert sorted(store.get_live_chunk_ids(doc_id)) == chunks_a
+        assert store.count_chunks() == len(chunks_a)
+        embedded = [chunk_id for chunk_id in chunks_a if not chunk_id.endswith("_L")]
+        assert vectors.count() == len(embedded), "Returning chunks should not be added twice"
+        contents = store.get_multiple_chunk_contents(embedded)
+        query = ingestion.embeddings.embed_batch([contents[embedded[0]]])[0]
+        assert vectors.search(query, top_k=1)[0][0] == embedded[0]
+        assert {chunk_id for chunk_id, _ in store.search_chunks("tehsildar")} <= set(chunks_a)
+        assert all(ingestion.knowledge_graph.graph.has_node(chunk_id) for chunk_id in chunks_a)
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Re-ingesting an earlier version revives its chunks")
+
+
+def test_reingest_links_new_to_kept_chunks():
+    """Chunks added by a new version get semantic edges to similar unchanged chunks"""
+    paragraphs = [f"Section {i}. The Tehsildar shall maintain the record of rights." for i in range(6)]
+    paragraphs[0] = "Section 0. A mutation entry is made after registration of a sale deed."
+    text_b = "\n\n".join(paragraphs + ["Section 6. The Collector may revise any mutation order."])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = _ingestion(tmp)
+        store, graph = ingestion.sqlite_store, ingestion.knowledge_graph.graph
+
+        doc_id = ingestion.ingest_text("\n\n".join(paragraphs), title="Land Revenue Code")
+        ingestion.ingest_text(text_b, title="Land Revenue Code")
+        version = ingestion.last_version
+        contents = store.get_multiple_chunk_contents(version.added_chunk_ids + version.kept_chunk_ids)
+
+        def about_mutation(chunk_ids):
+            return {chunk_id for chunk_id in chunk_ids
+                    if not chunk_id.endswith("_L") and "mutation" in contents[chunk_id]}
+        added, kept = about_mutation(version.added_chunk_ids), about_mutation(version.kept_chunk_ids)
+        assert added and kept
+
+        linked = {(chunk_id, neighbor) for chunk_id in added
+                  for neighbor, _, relationship in graph.edges_of(chunk_id) if relationship == "semantic"}
+        assert any(neighbor in kept for _, neighbor in linked), "New chunk should link to a similar kept chunk"
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Re-ingested chunks linked to unchanged chunks by similarity")
+
+
+class _FailingEmbeddings(_Embeddings):
+    """Fails every request that contains a text about a Patwari"""
+    def embed_batch(self, texts):
+        if any("Patwari" in text for text in texts):
+            raise RuntimeError("embedding service error")
+        return super().embed_batch(texts)
+
+
+def test_batch_with_duplicate_and_failure():
+    """A repeated text is stored once; a copy of a failing document fails with it"""
+    text_a = "\n\n".join(f"Section {i}. The Tehsildar shall maintain the record of rights." for i in range(4))
+    text_b = "\n\n".join(f"Section {i}. The Patwari shall update the village map." for i in range(4))
+    text_c = "\n\n".join(f"Section {i}. The Collector may revise any order." for i in range(4))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = _ingestion(tmp)
+        ingestion.embeddings = _FailingEmbeddings()
+        store = ingestion.sqlite_store
+
+        results = ingestion.ingest_many([
+            {"text": text_b, "title": "Survey Rules"},
+            {"text": text_a, "title": "Land Revenue Code"},
+            {"text": text_b, "title": "Survey Rules (copy)"},
+            {"text": text_a, "title": "Land Revenue Code (copy)"},
+            {"text": text_c, "title": "Revision Rules"},
+        ])
+
+        assert [result["status"] for result in results] == ["failed", "created", "failed", "unchanged", "created"]
+        assert results[0]["failed_stage"] == results[2]["failed_stage"] == "embed"
+        assert results[2]["document_id"] is None, "A copy of a failed document must not point at it"
+        assert results[3]["document_id"] == results[1]["document_id"]
+        assert store.get_document(results[3]["document_id"]) is not None
+        assert store.count_documents() == 2, "Only the two good texts are stored, once each"
+        assert ingestion.faiss_store.count() == sum(
+            1 for result in (results[1], results[4]) for chunk_id in store.get_live_chunk_ids(result["document_id"])
+            if not chunk_id.endswith("_L"))
+
+        # Retried once the service recovers
+        ingestion.embeddings = _Embeddings()
+        retried = ingestion.ingest_many([{"text": text_b, "title": "Survey Rules"}])
+        assert retried[0]["status"] == "created" and store.count_documents() == 3
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Batch duplicates resolved after the write; failures isolated per document")
+
+
+if __name__ == "__main__":
+    test_vector_tombstones_and_compact()
+    test_sqlite_tombstones_hidden()
+    test_chunk_text_references()
+    test_reingest_returning_chunks()
+    test_reingest_links_new_to_kept_chunks()
+    test_batch_with_duplicate_and_failure()
@@ -0,0 +1,101 @@
+"""
+Test Script: Standalone Ingestion Checkpoints
+Verifies an interrupted bulk ingestion resumes from its journal: finished
+files and batches are skipped, and a file whose content changed is
+ingested again
+"""
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ingest_standalone as standalone
+
+
+class _Embeddings:
+    """1024-dim vectors; fails on the call numbered fail_on (1-based)"""
+    def __init__(self, fail_on: int = 0):
+        self.fail_on = fail_on
+        self.calls = 0
+        self.texts = 0
+
+    def embed_batch(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("embedding model crashed")
+        self.texts += len(texts)
+        return np.ones((len(texts), 1024), dtype=np.float32).tolist()
+
+
+def _text(subject: str, sentences: int) -> str:
+    return ". ".join(f"Rule {i}: {subject} shall keep the register of land records up to date" for i in range(sentences))
+
+
+def _run(files: dict, embedder: _Embeddings, journal_path: str) -> dict:
+    """One run over files, stopping at the first failure; returns filename -> counts"""
+    session = standalone.init_db()
+    vector_store = standalone.SimpleVectorStore()
+    journal = standalone.IngestJournal(journal_path)
+    counts = {}
+    try:
+        for filename, text in files.items():
+            counts[filename] = standalone.ingest_file(filename, text, session, standalone.TextChunker(chunk_size=100),
+                                                      embedder, vector_store, journal)
+    finally:
+        session.close()
+    return counts
+
+
+def test_resume_from_journal():
+    """Stop mid-file, re-run: done work is skipped; a changed file is re-ingested"""
+    saved = {name: getattr(standalone, name) for name in
+             ("SQLITE_DB_PATH", "FAISS_INDEX_PATH", "BATCH_SIZE", "CHECKPOINT_BATCHES")}
+    with tempfile.TemporaryDirectory() as tmp:
+        standalone.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        standalone.FAISS_INDEX_PATH = os.path.join(tmp, "faiss_index")
+        standalone.BATCH_SIZE = 2
+        standalone.CHECKPOINT_BATCHES = 1
+        journal_path = os.path.join(tmp, "ingest_journal.json")
+        files = {"a.pdf": _text("The Tehsildar", 8), "b.pdf": _text("The Patwari", 20)}
+
+        try:
+            # First run: a.pdf finishes, b.pdf stops on its third batch
+            try:
+                _run(files, _Embeddings(fail_on=4 + 3), journal_path)
+                assert False, "The run should stop on the failing batch"
+            except RuntimeError:
+                pass
+            journal = standalone.IngestJournal(journal_path)
+            chunks_a, chunks_b = journal.files["a.pdf"]["num_chunks"], journal.files["b.pdf"]["num_chunks"]
+            assert journal.files["a.pdf"]["status"] == "done" and chunks_a == 8
+            assert journal.files["b.pdf"]["status"] == "in_progress" and journal.files["b.pdf"]["batches_done"] == 2
+
+            # Second run: only b.pdf's remaining chunks are embedded and stored
+            embedder = _Embeddings()
+            counts = _run(files, embedder, journal_path)
+            assert counts["a.pdf"] == {"embedded": 0, "rows_added": 0, "reconciled": 0}, "Finished file is skipped"
+            assert counts["b.pdf"]["embedded"] == counts["b.pdf"]["rows_added"] == chunks_b - 4
+            assert embedder.texts == chunks_b - 4
+            journal = standalone.IngestJournal(journal_path)
+            assert all(entry["status"] == "done" for entry in journal.files.values())
+
+            vector_store = standalone.SimpleVectorStore()
+            assert len(vector_store.vectors) == len(vector_store.chunk_ids) == chunks_a + chunks_b
+
+            # a.pdf changed: new content hash, so a new document is ingested in full
+            old_doc = journal.files["a.pdf"]["doc_id"]
+            files["a.pdf"] = _text("The Collector", 6)
+            counts = _run({"a.pdf": files["a.pdf"]}, _Embeddings(), journal_path)
+            journal = standalone.IngestJournal(journal_path)
+            assert journal.files["a.pdf"]["doc_id"] != old_doc and journal.files["a.pdf"]["status"] == "done"
+            assert counts["a.pdf"]["embedded"] == counts["a.pdf"]["rows_added"] == journal.files["a.pdf"]["num_chunks"] == 6
+        finally:
+            for name, value in saved.items():
+                setattr(standalone, name, value)
+
+    print("\n✅ Interrupted ingestion resumes from the journal; changed files are re-ingested")
+
+
+if __name__ == "__main__":
+    test_resume_from_journal()
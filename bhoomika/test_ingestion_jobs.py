@@ -0,0 +1,110 @@
+"""
+Test Script: Ingestion Job Queue
+Verifies each queued job is claimed by exactly one worker and that only
+jobs of workers whose heartbeat went stale are re-queued
+"""
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.job_store import JobStore, IngestionJob
+from pipeline.jobs import IngestionWorker
+
+
+def test_claims_are_exclusive():
+    """Workers of two processes racing for the queue never claim the same job"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        stores = [JobStore(db_path=db_path), JobStore(db_path=db_path)]
+        assert stores[0].owner != stores[1].owner
+        job_ids = {stores[0].create_job(f"doc{i}.txt", f"/uploads/doc{i}.txt").id for i in range(40)}
+
+        claimed = {store.owner: [] for store in stores}
+
+        def work(store):
+            while True:
+                job = store.claim_next()
+                if job is None:
+                    return
+                claimed[store.owner].append(job.id)
+
+        threads = [threading.Thread(target=work, args=(store,)) for store in stores for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_claims = [job_id for job_ids_of_owner in claimed.values() for job_id in job_ids_of_owner]
+        assert sorted(all_claims) == sorted(job_ids), "Every job should be claimed exactly once"
+        for store in stores:
+            for job_id in claimed[store.owner]:
+                assert store.get_job(job_id).owner == store.owner
+
+        for store in stores:
+            store.session.remove()
+        stores[0].engine.dispose()
+
+    print("\n✅ Each queued job claimed by exactly one worker")
+
+
+def test_requeue_only_stale_jobs():
+    """A running job is re-queued once its owner stops sending heartbeats"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        live, other = JobStore(db_path=db_path), JobStore(db_path=db_path)
+        live.create_job("a.txt", "/uploads/a.txt")
+        job = live.claim_next()
+        assert job.status == "running" and job.heartbeat_at is not None
+
+        assert other.requeue_interrupted(stale_seconds=60) == 0, "A live worker's job should stay running"
+        assert other.heartbeat() == 0 and live.heartbeat() == 1
+
+        # The owner dies: its heartbeat ages past the limit
+        live.session.query(IngestionJob).filter_by(id=job.id).update(
+            {IngestionJob.heartbeat_at: datetime.utcnow() - timedelta(seconds=120)})
+        live.session.commit()
+        assert other.requeue_interrupted(stale_seconds=60) == 1
+        requeued = other.get_job(job.id)
+        assert requeued.status == "queued" and requeued.owner is None
+        assert other.claim_next().owner == other.owner
+
+        live.session.remove()
+        other.session.remove()
+        live.engine.dispose()
+
+    print("\n✅ Only jobs with a stale heartbeat are re-queued")
+
+
+def test_one_writing_process():
+    """A second worker on the same data directory refuses to start while the first runs"""
+    with tempfile.TemporaryDirectory() as tmp:
+        job_store = JobStore(db_path=os.path.join(tmp, "test.db"))
+        lock_path = os.path.join(tmp, "writer.lock")
+        workers = [IngestionWorker(job_store, ingestion=object(), upload_dir=tmp, poll_seconds=0.05,
+                                   lock_path=lock_path) for _ in range(2)]
+
+        workers[0].start()
+        try:
+            workers[1].start()
+            assert False, "Second writer should not start"
+        except RuntimeError as e:
+            assert "--workers 1" in str(e)
+        assert workers[1]._thread is None
+
+        workers[0].stop(timeout=5)
+        workers[1].start()  # The lock is free once the first worker stops
+        workers[1].stop(timeout=5)
+
+        job_store.session.remove()
+        job_store.engine.dispose()
+
+    print("\n✅ Only one process runs the ingestion worker")
+
+
+if __name__ == "__main__":
+    test_claims_are_exclusive()
+    test_requeue_only_stale_jobs()
+    test_one_writing_process()
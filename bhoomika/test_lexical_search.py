@@ -0,0 +1,139 @@
+"""
+Test Script: Lexical Search
+Verifies the FTS5 index follows chunk writes and feeds hybrid retrieval
+"""
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from config import EMBEDDING_DIMENSION
+from storage.simple_store import SimpleVectorStore
+from storage.sqlite_store import SQLiteStore, search_terms
+from pipeline.retrieval import HybridRetrieval
+
+PARAGRAPHS = [
+    "The Tehsildar shall maintain the record of rights for every village.",
+    "A mutation entry is made in the 7/12 extract after registration of a sale deed.",
+    "Agricultural land may not be converted to non-agricultural use without permission.",
+    "The Collector may revise any mutation order within one year.",
+]
+
+
+def _ingest(store: SQLiteStore, doc_id: str, paragraphs: list):
+    """Store the document text and reference chunks, as ingestion does"""
+    document = "\n\n".join(paragraphs)
+    store.add_document(doc_id=doc_id, filename=f"{doc_id}.txt")
+    store.set_document_text(doc_id, document)
+    rows, start = [], 0
+    for i, paragraph in enumerate(paragraphs):
+        rows.append({"id": f"{doc_id}_chunk_{i}_S", "document_id": doc_id, "content": paragraph,
+                     "chunk_index": i, "chunk_type": "S", "start_char": start, "end_char": start + len(paragraph),
+                     "chunk_metadata": None, "content_hash": None, "content_ref": True})
+        start += len(paragraph) + 2
+    rows.append({"id": f"{doc_id}_chunk_{len(paragraphs)}_L", "document_id": doc_id, "content": document,
+                 "chunk_index": len(paragraphs), "chunk_type": "L", "start_char": 0, "end_char": len(document),
+                 "chunk_metadata": None, "content_hash": None, "content_ref": True})
+    store.add_chunks_bulk(rows)
+
+
+def _index_size(store: SQLiteStore) -> int:
+    return store.session.execute(text("SELECT COUNT(*) FROM chunks_fts")).scalar()
+
+
+def test_index_follows_writes():
+    """Ingested text is searchable; tombstoned and deleted chunks are not; rebuild matches"""
+    assert search_terms("What is the 7/12 extract?") == ["7", "12", "extract"]
+    assert search_terms("what is the") == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+        _ingest(store, "doc1", PARAGRAPHS)
+        _ingest(store, "doc2", ["Mutation fees are payable to the Talathi."])
+
+        assert _index_size(store) == 5, "LARGE chunks should not be indexed"
+        results = store.search_chunks("mutation entry 7/12")
+        assert results[0][0] == "doc1_chunk_1_S", "Chunk with the most query terms should rank first"
+        assert {chunk_id for chunk_id, _ in results} == {"doc1_chunk_1_S", "doc1_chunk_3_S", "doc2_chunk_0_S"}
+        assert all(score > 0 for _, score in results)
+        assert store.search_chunks("collector revise mutation")[0][0] == "doc1_chunk_3_S"
+        assert [chunk_id for chunk_id, _ in store.search_chunks("mutation collector", max_term_matches=2)] == \
+            ["doc1_chunk_3_S"], "Words in too many chunks should be left out"
+
+        store.tombstone_chunks(["doc1_chunk_3_S"])
+        assert "doc1_chunk_3_S" not in dict(store.search_chunks("collector revise mutation"))
+        store.delete_document("doc2")
+        assert _index_size(store) == 3
+        assert [chunk_id for chunk_id, _ in store.search_chunks("mutation")] == ["doc1_chunk_1_S"]
+
+        # Rebuild indexes exactly the live chunks again
+        assert store.rebuild_search_index() == 3
+        assert _index_size(store) == 3
+        assert store.search_chunks("mutation entry 7/12")[0][0] == "doc1_chunk_1_S"
+        _ingest(store, "doc3", ["The Collector may revise any mutation order within one year."])
+        assert store.search_chunks("collector revise mutation")[0][0] == "doc3_chunk_0_S"
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Full-text index follows ingestion, tombstones, deletes and rebuild")
+
+
+class _Embeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, query):
+        return self.vector
+
+
+class _Graph:
+    def personalized_pagerank(self, seeds, exclude_restart=False):
+        return {}
+
+
+def test_lexical_retrieval_leg():
+    """bm25 matches join the fused ranking and can restrict the vector search"""
+    rng = np.random.default_rng(7)
+    paragraphs = PARAGRAPHS + [f"Unrelated paragraph number {i} about irrigation." for i in range(20)]
+    vectors = rng.standard_normal((len(paragraphs), EMBEDDING_DIMENSION)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+        _ingest(store, "doc1", paragraphs)
+        vector_store = SimpleVectorStore(index_dir=tmp)
+        chunk_ids = [f"doc1_chunk_{i}_S" for i in range(len(paragraphs))]
+        vector_store.add_batch(chunk_ids, vectors)
+
+        # The query vector is closest to an irrelevant paragraph
+        retrieval = HybridRetrieval.__new__(HybridRetrieval)
+        retrieval.embeddings = _Embeddings(vectors[10])
+        retrieval.faiss_store = vector_store
+        retrieval.sqlite_store = store
+        retrieval.knowledge_graph = _Graph()
+
+        results = retrieval.retrieve("mutation entry in the 7/12 extract", top_k=3, prefilter=False)
+        assert results[0]["chunk_id"] == "doc1_chunk_10_S" and results[0]["source"] == "vector"
+        assert "doc1_chunk_1_S" in [r["chunk_id"] for r in results], "Best bm25 match should be fused in"
+
+        among = vector_store.search_among(vectors[10], ["doc1_chunk_1_S", "doc1_chunk_10_S", "missing"], top_k=5)
+        assert [chunk_id for chunk_id, _ in among] == ["doc1_chunk_10_S", "doc1_chunk_1_S"]
+        assert abs(among[0][1] - 1.0) < 1e-5
+
+        # Prefiltered: vector scores only among chunks matching the terms
+        results = retrieval.retrieve("unrelated paragraph irrigation", top_k=3, prefilter=True)
+        assert all(r["chunk_id"] not in chunk_ids[:4] for r in results)
+        results = retrieval.retrieve("mutation entry", top_k=3, prefilter=True)
+        assert "doc1_chunk_10_S" in [r["chunk_id"] for r in results], "Too few matches: falls back to full search"
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Lexical leg fused into hybrid retrieval, with vector prefilter")
+
+
+if __name__ == "__main__":
+    test_index_follows_writes()
+    test_lexical_retrieval_leg()
@@ -0,0 +1,74 @@
+"""
+Test Script: Parallel PDF Extraction
+Verifies page-range extraction through the shared process pool, page
+order after reassembly, and mapping character offsets back to pages
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline.pdf_extraction import PDFExtractor, get_extraction_pool
+
+
+def _write_pdf(path: str, page_texts: list):
+    """Minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def test_extract_many_with_shared_pool():
+    """Page ranges of several files come back in order; the pool is reused across calls"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name, pages in (("large.pdf", 9), ("small.pdf", 2)):
+            paths.append(os.path.join(tmp, name))
+            _write_pdf(paths[-1], [f"{name} page {n}" for n in range(1, pages + 1)])
+        paths.append(os.path.join(tmp, "broken.pdf"))
+        with open(paths[-1], "wb") as f:
+            f.write(b"not a pdf")
+
+        extractor = PDFExtractor(max_workers=2, pages_per_task=2, min_parallel_pages=4)
+        results = extractor.extract_many(paths)
+        pool = get_extraction_pool(2)
+
+        large = results[paths[0]]
+        assert large.error is None and large.num_pages == 9
+        assert [page for page, _, _ in large.page_spans] == list(range(1, 10))
+        assert large.text.splitlines()[4] == "large.pdf page 5"
+        assert results[paths[1]].text == "small.pdf page 1\nsmall.pdf page 2"
+        assert results[paths[2]].error and results[paths[2]].text == "", "A bad file fails on its own"
+
+        # Offsets map back to the page they fall in
+        page, start, end = large.page_spans[6]
+        assert large.page_at(start) == large.page_at(end - 1) == page == 7
+        assert large.pages_for_span(0, end) == (1, 7)
+
+        assert extractor.extract(paths[1]).text == results[paths[1]].text
+        extractor.extract_many(paths[:2])
+        assert get_extraction_pool(2) is pool, "Calls should share one pool"
+
+    print("\n✅ PDFs extracted in page order through one long-lived pool")
+
+
+if __name__ == "__main__":
+    test_extract_many_with_shared_pool()
@@ -0,0 +1,169 @@
+"""
+Test Script: Write-behind Persistence
+Verifies dirty tracking, the flush size policy and atomic saves
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import EMBEDDING_DIMENSION
+from storage import simple_store
+from storage.simple_store import SimpleVectorStore
+from storage.persistence import PersistenceManager, ReadWriteLock
+
+
+def _vectors(n):
+    return np.random.default_rng(5).standard_normal((n, EMBEDDING_DIMENSION)).astype(np.float32)
+
+
+def test_manual_flush_clears_dirty_state():
+    """flush() saves only dirty stores and leaves no temp files behind"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        manager = PersistenceManager(interval_seconds=3600, max_dirty_ops=10 ** 6)
+        manager.register("vectors", store)
+
+        assert manager.flush() is False, "Nothing to flush yet"
+
+        store.add_batch([f"chunk_{i}" for i in range(10)], _vectors(10))
+        assert manager.dirty_ops() == 10
+
+        assert manager.flush() is True
+        assert store.dirty_ops == 0
+        assert manager.get_stats()["flushes"] == 1
+        assert not [name for name in os.listdir(tmp) if ".tmp" in name], "Temp files should be renamed"
+
+        reloaded = SimpleVectorStore(index_dir=tmp)
+        assert reloaded.count() == 10
+
+    print("\n✅ Manual flush persists dirty stores atomically")
+
+
+def test_background_flush_on_size_policy():
+    """The background thread flushes once max_dirty_ops is reached"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        manager = PersistenceManager(interval_seconds=3600, max_dirty_ops=5)
+        manager.register("vectors", store)
+        manager.start()
+
+        try:
+            with manager.lock:
+                store.add_batch([f"chunk_{i}" for i in range(5)], _vectors(5))
+            manager.notify()
+
+            deadline = time.time() + 5
+            while store.dirty_ops and time.time() < deadline:
+                time.sleep(0.05)
+            assert store.dirty_ops == 0, "Size policy should trigger a flush"
+        finally:
+            manager.close()
+
+        assert os.path.exists(os.path.join(tmp, "vectors.npy"))
+
+    print("\n✅ Background flush triggered by the size policy")
+
+
+def test_interrupted_save_recovers_matching_map():
+    """A crash between the ID map and vector writes reloads the last consistent pair"""
+    def crash(path, write):
+        raise OSError("simulated crash")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        vectors = _vectors(20)
+        store.add_batch([f"chunk_{i}" for i in range(10)], vectors[:10])
+        store.save()
+
+        # Compact (renumbers rows) and grow, then crash before the vectors are written
+        store.remove([f"chunk_{i}" for i in range(5)])
+        store.compact()
+        store.add_batch([f"chunk_{i}" for i in range(10, 20)], vectors[10:])
+        original = simple_store.atomic_write
+        simple_store.atomic_write = crash
+        try:
+            store.save()
+        except OSError:
+            pass
+        finally:
+            simple_store.atomic_write = original
+
+        reloaded = SimpleVectorStore(index_dir=tmp)
+        assert reloaded.count() == 10 and reloaded.search(vectors[3], top_k=1)[0][0] == "chunk_3"
+        assert not os.path.exists(reloaded.previous_id_map_path), "Matching map should be put back"
+
+        # Crash before the new map is written: the old map is still found
+        os.replace(reloaded.id_map_path, reloaded.previous_id_map_path)
+        assert SimpleVectorStore(index_dir=tmp).count() == 10
+
+        store.save()
+        reloaded = SimpleVectorStore(index_dir=tmp)
+        assert reloaded.count() == 15 and reloaded.search(vectors[15], top_k=1)[0][0] == "chunk_15"
+
+    print("\n✅ Interrupted vector saves reload a consistent ID map")
+
+
+def test_readers_never_see_a_write_in_progress():
+    """Readers share the lock, writers exclude them, and searches survive concurrent removes"""
+    lock = ReadWriteLock()
+    with lock.read():
+        with lock.read():
+            pass
+    with lock:
+        with lock, lock.read():
+            pass
+
+    events = []
+    with lock.read():
+        writer = threading.Thread(target=lambda: (lock.acquire(), events.append("write"), lock.release()))
+        writer.start()
+        time.sleep(0.05)
+        assert events == [], "Writer should wait for the reader"
+    writer.join()
+    assert events == ["write"]
+
+    # Queries against a store that a writer keeps growing and compacting
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        manager = PersistenceManager(interval_seconds=3600, max_dirty_ops=10 ** 6)
+        vectors = _vectors(400)
+        errors, stop = [], threading.Event()
+
+        def write():
+            for batch in range(20):
+                ids = [f"chunk_{batch}_{i}" for i in range(20)]
+                with manager.lock:
+                    store.add_batch(ids, vectors[batch * 20:(batch + 1) * 20])
+                with manager.lock:
+                    store.remove(ids[:15])
+            stop.set()
+
+        def read():
+            while not stop.is_set():
+                try:
+                    with manager.lock.read():
+                        store.search(vectors[0], top_k=5)
+                except Exception as e:
+                    errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        write()
+        for thread in readers:
+            thread.join()
+        assert not errors, errors
+        assert store.count() == 100
+
+    print("\n✅ Queries and writes serialized by the read/write lock")
+
+
+if __name__ == "__main__":
+    test_manual_flush_clears_dirty_state()
+    test_background_flush_on_size_policy()
+    test_interrupted_save_recovers_matching_map()
+    test_readers_never_see_a_write_in_progress()
@@ -0,0 +1,77 @@
+"""
+Test Script: Chunk Indexes and Row Counters
+Verifies per-document and per-type reads use their indexes and that the
+maintained counters match the tables through every kind of write
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from storage.sqlite_store import SQLiteStore
+
+
+def _rows(doc_id: str, count: int) -> list:
+    return [{"id": f"{doc_id}_chunk_{i}", "document_id": doc_id, "content": f"Paragraph {i}",
+             "chunk_index": i, "chunk_type": "L" if i == 0 else "S", "start_char": 0, "end_char": 0}
+            for i in range(count)]
+
+
+def _plan(store: SQLiteStore, sql: str) -> str:
+    return "; ".join(row[-1] for row in store.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def _scanned(store: SQLiteStore) -> dict:
+    return {
+        "documents": store.session.execute(text("SELECT COUNT(*) FROM documents")).scalar(),
+        "chunks": store.session.execute(text("SELECT COUNT(*) FROM chunks WHERE tombstoned = 0")).scalar()
+    }
+
+
+def test_indexes_and_counters():
+    """Index plans, and counters equal to COUNT(*) after adds, tombstones, deletes and rollbacks"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+
+        plan = _plan(store, "SELECT * FROM chunks WHERE document_id = 'd' AND tombstoned = 0 ORDER BY chunk_index")
+        assert "ix_chunks_document_index" in plan and "TEMP B-TREE" not in plan, plan
+        assert "ix_chunks_type" in _plan(store, "SELECT * FROM chunks WHERE chunk_type = 'L' AND tombstoned = 0")
+
+        store.add_document(doc_id="doc1", filename="doc1.txt")
+        store.add_chunks_bulk(_rows("doc1", 5))
+        store.add_document(doc_id="doc2", filename="doc2.txt")
+        store.add_chunk("doc2_chunk_0", "doc2", "Whole text", chunk_type="L")
+        store.add_chunks_bulk(_rows("doc2", 4)[1:])
+        assert store.get_counters() == _scanned(store) == {"documents": 2, "chunks": 9}
+
+        assert store.tombstone_chunks(["doc1_chunk_1", "doc1_chunk_2"]) == 2
+        assert store.tombstone_chunks(["doc1_chunk_1"]) == 0, "Already tombstoned chunks are not counted again"
+        assert store.count_chunks() == 7
+        store.delete_document("doc1")
+        assert store.get_counters() == _scanned(store) == {"documents": 1, "chunks": 4}
+        assert [chunk.id for chunk in store.get_chunks_by_type("L")] == ["doc2_chunk_0"]
+
+        # A rolled-back write leaves the counters as they were
+        try:
+            with store.transaction():
+                store.add_document(doc_id="doc3", filename="doc3.txt")
+                store.add_chunks_bulk(_rows("doc3", 3))
+                raise RuntimeError("fail the ingest")
+        except RuntimeError:
+            pass
+        assert store.count_documents() == 1 and store.count_chunks() == 4
+
+        # Rows written behind the store's back are picked up by recount()
+        store.session.execute(text("DELETE FROM chunks WHERE id = 'doc2_chunk_3'"))
+        store.session.commit()
+        assert store.recount() == _scanned(store) == {"documents": 1, "chunks": 3}
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Chunk reads use their indexes; counters match the tables")
+
+
+if __name__ == "__main__":
+    test_indexes_and_counters()
@@ -0,0 +1,65 @@
+"""
+Test Script: SQLite Engine and Sessions
+Verifies the shared pooled engine, its pragmas and per-thread sessions
+"""
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from storage.sqlite_store import SQLiteStore, get_engine
+from storage.job_store import JobStore
+
+
+def _rows(doc_id: str, count: int) -> list:
+    return [{"id": f"{doc_id}_chunk_{i}_S", "document_id": doc_id, "content": f"Paragraph {i}",
+             "chunk_index": i, "chunk_type": "S", "start_char": 0, "end_char": 0} for i in range(count)]
+
+
+def test_engine_and_sessions():
+    """One engine per database, WAL pragmas, and a session (and transaction) per thread"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        store = SQLiteStore(db_path=db_path)
+        assert JobStore(db_path=db_path).engine is store.engine is get_engine(db_path)
+
+        with store.engine.connect() as connection:
+            assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert connection.execute(text("PRAGMA mmap_size")).scalar() > 0
+
+        store.add_document(doc_id="seed", filename="seed.txt")
+        store.add_chunks_bulk(_rows("seed", 5))
+
+        # A reader thread is not blocked by, and does not see, an open write transaction
+        opened, checked = threading.Event(), threading.Event()
+        seen = {}
+
+        def read():
+            opened.wait()
+            seen["during"] = store.count_chunks()
+            seen["session"] = store.session()
+            store.release()
+            checked.set()
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        with store.transaction():
+            store.add_document(doc_id="new", filename="new.txt")
+            store.add_chunks_bulk(_rows("new", 3))
+            opened.set()
+            assert checked.wait(10), "Reader should not wait for the writer"
+        reader.join()
+
+        assert seen["during"] == 5, "Uncommitted rows should be invisible to other threads"
+        assert seen["session"] is not store.session(), "Each thread should have its own session"
+        assert store.count_chunks() == 8
+        store.release()
+
+    print("\n✅ Shared WAL engine with per-thread sessions")
+
+
+if __name__ == "__main__":
+    test_engine_and_sessions()
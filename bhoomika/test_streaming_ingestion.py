@@ -0,0 +1,128 @@
+"""
+Test Script: Streaming Staged Ingestion
+Verifies documents come out of the staged pipeline stored and linked, that
+stage counters add up, that a failing stage only fails its own document,
+and that versions of one file are applied in order
+"""
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import EMBEDDING_DIMENSION
+from storage.simple_store import SimpleVectorStore
+from storage.sqlite_store import SQLiteStore
+from storage.knowledge_graph import KnowledgeGraph
+from storage.persistence import PersistenceManager
+from pipeline.ingestion import DocumentIngestion
+from pipeline.streaming import StreamingIngestion, StreamItem
+
+
+class _Embeddings:
+    """Deterministic vectors from the text hash; requests about a Patwari fail"""
+    def embed_batch(self, texts):
+        if any("Patwari" in text for text in texts):
+            raise RuntimeError("embedding service error")
+        return [np.random.default_rng(abs(hash(text)) % 2**32).standard_normal(EMBEDDING_DIMENSION).tolist()
+                for text in texts]
+
+
+def _ingestion(tmp: str) -> DocumentIngestion:
+    ingestion = DocumentIngestion.__new__(DocumentIngestion)
+    ingestion.embeddings = _Embeddings()
+    ingestion.faiss_store = SimpleVectorStore(index_dir=tmp)
+    ingestion.sqlite_store = SQLiteStore(db_path=os.path.join(tmp, "test.db"))
+    ingestion.knowledge_graph = KnowledgeGraph(os.path.join(tmp, "knowledge_graph.gpickle"))
+    ingestion.persistence = PersistenceManager(interval_seconds=3600, max_dirty_ops=10**6)
+    ingestion.last_version = None
+    return ingestion
+
+
+def _text(subject: str, sections: int = 4) -> str:
+    return "\n\n".join(f"Section {i}. {subject} shall maintain the record of rights." for i in range(sections))
+
+
+def _embedded_live_chunks(store: SQLiteStore, doc_ids) -> int:
+    return sum(1 for doc_id in doc_ids for chunk_id in store.get_live_chunk_ids(doc_id)
+               if not chunk_id.endswith("_L"))
+
+
+def test_stream_results_and_stats():
+    """Every document is stored and linked; stage counters and failures add up"""
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = _ingestion(tmp)
+        store = ingestion.sqlite_store
+        path = os.path.join(tmp, "rules.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_text("The Collector"))
+
+        pipeline = StreamingIngestion(ingestion, queue_size=1, extract_workers=2, embed_workers=2)
+        items = [
+            StreamItem(text=_text("The Tehsildar"), title="Land Revenue Code"),
+            StreamItem(filepath=path, title="rules.md"),
+            StreamItem(text=_text("The Patwari"), title="Survey Rules"),
+            StreamItem(filepath=os.path.join(tmp, "missing.txt"), title="missing.txt"),
+            StreamItem(text=_text("The Tehsildar"), title="Land Revenue Code (copy)"),
+            StreamItem(text="   ", title="Empty"),
+        ]
+        results = {result["source"]: result for result in pipeline.run(iter(items))}
+
+        assert len(results) == len(items)
+        stored = [results["Land Revenue Code"], results[path]]
+        assert all(result["status"] == "created" and result["error"] is None for result in stored)
+        assert results["Land Revenue Code (copy)"]["status"] == "unchanged"
+        assert results["Land Revenue Code (copy)"]["document_id"] == results["Land Revenue Code"]["document_id"]
+        assert results["Survey Rules"]["failed_stage"] == "embed" and results["Survey Rules"]["document_id"] is None
+        assert results[os.path.join(tmp, "missing.txt")]["failed_stage"] == "extract"
+        assert results["Empty"]["failed_stage"] == "extract"
+
+        doc_ids = [result["document_id"] for result in stored]
+        assert store.count_documents() == 2, "Failed documents are not stored"
+        assert ingestion.faiss_store.count() == _embedded_live_chunks(store, doc_ids)
+        graph = ingestion.knowledge_graph
+        assert all(graph.get_document_chunks(doc_id) for doc_id in doc_ids), "Stored documents are linked"
+
+        stages = pipeline.get_stats()["stages"]
+        assert [stages[name]["items"] for name in ("extract", "chunk", "embed", "persist", "graph")] == [6] * 5
+        assert {name: stages[name]["errors"] for name in stages} == \
+            {"extract": 2, "chunk": 0, "embed": 1, "persist": 0, "graph": 0}
+        assert stages["embed"]["workers"] == 2
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Streamed documents stored, counted per stage, failures isolated")
+
+
+def test_versions_of_one_file_in_order():
+    """Two versions of one file in a stream: the second replaces the first, not the stored one"""
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = _ingestion(tmp)
+        store = ingestion.sqlite_store
+        doc_id = ingestion.ingest_text(_text("The Tehsildar", 6), title="Land Revenue Code")
+
+        pipeline = StreamingIngestion(ingestion, queue_size=2, extract_workers=2, embed_workers=2)
+        results = pipeline.run([
+            StreamItem(text=_text("The Collector", 5), title="Land Revenue Code"),
+            StreamItem(text=_text("The Commissioner", 3), title="Land Revenue Code"),
+        ])
+
+        assert [result["status"] for result in results] == ["updated", "updated"]
+        assert all(result["document_id"] == doc_id for result in results)
+        final = ingestion._prepare_chunks(doc_id, _text("The Commissioner", 3))
+        assert sorted(store.get_live_chunk_ids(doc_id)) == sorted(final.chunk_ids), \
+            "Only the last version's chunks stay live"
+        assert store.count_documents() == 1
+        assert ingestion.faiss_store.count() == _embedded_live_chunks(store, [doc_id])
+        assert ingestion.knowledge_graph.get_document_chunks(doc_id) == final.chunk_ids
+
+        store.release()
+        store.engine.dispose()
+
+    print("\n✅ Versions of one file applied in stream order")
+
+
+if __name__ == "__main__":
+    test_stream_results_and_stats()
+    test_versions_of_one_file_in_order()
@@ -0,0 +1,101 @@
+"""
+Test Script: Reduced-Dimension Vector Tier
+Verifies PCA projection fitting, two-pass search and persistence
+"""
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import EMBEDDING_DIMENSION
+from storage.simple_store import SimpleVectorStore
+
+
+def _corpus(n=600, latent_dim=16, seed=1):
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((latent_dim, EMBEDDING_DIMENSION))
+    return (np.dot(rng.standard_normal((n, latent_dim)), basis)).astype(np.float32)
+
+
+def test_projection_search_matches_exact():
+    """Two-pass search should return the exact top results on low-rank data"""
+    vectors = _corpus()
+    chunk_ids = [f"chunk_{i}" for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        store.add_batch(chunk_ids, vectors)
+
+        query = vectors[42] + 0.01
+        exact = store.search(query, top_k=5)
+
+        assert store.fit_projection(32) == 32, "Projection should be fitted"
+        assert store.reduced_vectors.shape == (len(vectors), 32)
+
+        approx = store.search(query, top_k=5)
+        assert [cid for cid, _ in approx] == [cid for cid, _ in exact], "Top-5 should match exact search"
+        assert approx[0][0] == "chunk_42"
+
+    print("\n✅ Projection search matches exact search")
+
+
+def test_projection_persistence():
+    """Projection and reduced matrix should round-trip through save/load"""
+    vectors = _corpus(n=300)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        store.add_batch([f"chunk_{i}" for i in range(len(vectors))], vectors)
+        store.fit_projection(16)
+        store.save()
+
+        reloaded = SimpleVectorStore(index_dir=tmp)
+        assert reloaded.reduced_vectors is not None, "Reduced tier should be loaded"
+        assert np.allclose(reloaded.reduced_vectors, store.reduced_vectors)
+
+        # Vectors added after fitting are projected too
+        reloaded.add("chunk_new", vectors[0])
+        assert len(reloaded.reduced_vectors) == len(reloaded.vectors)
+
+        reloaded.drop_projection()
+        reloaded.save()
+        assert not os.path.exists(reloaded.projection_path), "Dropped tier should be removed from disk"
+
+    print("\n✅ Projection persistence works correctly")
+
+
+def test_projection_search_skips_tombstones():
+    """Tombstoned rows never take reduced-tier candidate slots, so top_k live hits come back"""
+    vectors = _corpus()
+    chunk_ids = [f"chunk_{i}" for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SimpleVectorStore(index_dir=tmp)
+        store.add_batch(chunk_ids, vectors)
+        store.fit_projection(32)
+
+        # Remove the query's 40 nearest rows: as many as the candidate pool of a top-5 search
+        query = vectors[42] + 0.01
+        nearest = [cid for cid, _ in store.search(query, top_k=40)]
+        assert store.remove(nearest) == 40 and store.tombstones, "Removed rows stay tombstoned (no compaction)"
+
+        results = store.search(query, top_k=5)
+        assert len(results) == 5, "Search should still fill top_k"
+        assert not set(cid for cid, _ in results) & set(nearest)
+
+        store.drop_projection()
+        assert [cid for cid, _ in store.search(query, top_k=5)] == [cid for cid, _ in results]
+
+    print("\n✅ Projection search skips tombstoned rows")
+
+
+if __name__ == "__main__":
+    try:
+        test_projection_search_matches_exact()
+        test_projection_persistence()
+        test_projection_search_skips_tombstones()
+        print("\n🎉 ALL TESTS PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        sys.exit(1)